@@ -0,0 +1,121 @@
+# Bar feeds for the intraday live scanner
+# A feed yields closed 1m/5m bars grouped by timestamp; a replay file stands in for a live source
+
+import time
+import logging
+import pandas as pd
+from datetime import datetime
+from indicators import PRICE_FIELDS
+
+# Minutes per bar for the supported live intervals
+INTERVAL_MINUTES = {"1m": 1, "5m": 5}
+
+# Column names accepted for the bar timestamp in replay files
+TIMESTAMP_COLUMNS = ("Timestamp", "Datetime", "Date")
+
+
+class BarFeed:
+    """Source of closed bars for live scanning
+
+    batches() yields (timestamp, {symbol: (open, high, low, close, volume)}) in time order,
+    one batch per bar close. Any object with this method can drive the live scanner.
+    """
+
+    def batches(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the feed"""
+
+
+def read_replay_file(path):
+    """Load a replay file (CSV or JSON lines) as one long frame sorted by timestamp"""
+    if path.lower().endswith((".jsonl", ".json")):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+    column = next((c for c in TIMESTAMP_COLUMNS if c in df.columns), None)
+    if column is None or "Symbol" not in df.columns:
+        raise ValueError(f"Replay file {path} needs Symbol and {'/'.join(TIMESTAMP_COLUMNS)} columns")
+    df["Timestamp"] = pd.to_datetime(df[column])
+    return df.sort_values(["Timestamp", "Symbol"], kind="stable")[["Symbol", "Timestamp"] + PRICE_FIELDS]
+
+
+def write_replay_file(frames, path):
+    """Save {symbol: DataFrame} bars as a replay CSV, e.g. from the bar store"""
+    rows = pd.concat({symbol: df[PRICE_FIELDS] for symbol, df in frames.items() if not df.empty},
+                     names=["Symbol", "Timestamp"]).reset_index()
+    rows.sort_values(["Timestamp", "Symbol"], kind="stable").to_csv(path, index=False)
+    return len(rows)
+
+
+class ReplayFeed(BarFeed):
+    """Replays recorded bars from a file, optionally paced at a multiple of real time
+
+    speed=0 replays as fast as the scanner can consume; speed=60 plays an hour of bars
+    in a minute.
+    """
+
+    def __init__(self, path, speed=0):
+        self.path = path
+        self.speed = speed
+        self.bars = read_replay_file(path)
+
+    def batches(self):
+        previous = None
+        for timestamp, group in self.bars.groupby("Timestamp", sort=True):
+            if self.speed and previous is not None:
+                time.sleep(max(0.0, (timestamp - previous).total_seconds() / self.speed))
+            previous = timestamp
+            values = group[PRICE_FIELDS].to_numpy(dtype=float)
+            yield timestamp, dict(zip(group["Symbol"], map(tuple, values)))
+
+
+class YahooPollingFeed(BarFeed):
+    """Polls Yahoo Finance after every bar boundary and yields the bars that have closed
+
+    Yahoo has no push API, so each poll downloads the session's intraday bars for all
+    symbols in bulk and emits only bars newer than the last one seen per symbol.
+    """
+
+    def __init__(self, market_data, symbols, interval="5m", poll_delay=3.0, stop_at=None):
+        if interval not in INTERVAL_MINUTES:
+            raise ValueError(f"Unsupported live interval: {interval}")
+        self.market_data = market_data
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.poll_delay = poll_delay
+        self.stop_at = stop_at
+        self.bar_length = pd.Timedelta(minutes=INTERVAL_MINUTES[interval])
+        self.last_seen = {}
+
+    def _sleep_until_next_close(self):
+        now = pd.Timestamp.now()
+        next_close = now.floor(self.bar_length) + self.bar_length
+        time.sleep((next_close - now).total_seconds() + self.poll_delay)
+
+    def batches(self):
+        while self.stop_at is None or datetime.now().time() < self.stop_at:
+            self._sleep_until_next_close()
+            frames = self.market_data.download_frames(self.symbols, period="1d", interval=self.interval)
+
+            batches = {}
+            for symbol, df in frames.items():
+                if df.empty:
+                    continue
+                # A bar is closed once its full length has elapsed
+                now = pd.Timestamp.now(tz=df.index.tz)
+                closed = df[(df.index + self.bar_length) <= now]
+                last = self.last_seen.get(symbol)
+                if last is not None:
+                    closed = closed[closed.index > last]
+                if closed.empty:
+                    continue
+                self.last_seen[symbol] = closed.index[-1]
+                for timestamp, values in zip(closed.index, closed[PRICE_FIELDS].to_numpy(dtype=float)):
+                    batches.setdefault(timestamp, {})[symbol] = tuple(values)
+
+            if not batches:
+                logging.info(f"Live feed: no new {self.interval} bars this poll")
+            for timestamp in sorted(batches):
+                yield timestamp, batches[timestamp]
@@ -0,0 +1,211 @@
+# Persistent local OHLCV bar store
+# Keeps bars in SQLite keyed by (symbol, interval, timestamp) so each run only fetches the missing tail
+
+import logging
+import pandas as pd
+from screenerdb import get_db
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _split_symbols(df):
+    """Turn a long Symbol/Timestamp query result into {symbol: DataFrame}"""
+    frames = {}
+    for symbol, group in df.groupby("Symbol", sort=False):
+        bars = group.drop(columns="Symbol").set_index("Timestamp")
+        bars.index = pd.to_datetime(bars.index)
+        frames[symbol] = bars
+    return frames
+
+
+class BarStore:
+    """SQLite-backed store of OHLCV bars with incremental append"""
+
+    def __init__(self, db_path="intraday_data.db"):
+        self.db_path = db_path
+        self.db = get_db(db_path)
+        self.init_database()
+
+    def init_database(self):
+        """Create the bars table if it does not exist"""
+        try:
+            self.db.execute('''
+            CREATE TABLE IF NOT EXISTS bars (
+                Symbol TEXT,
+                Interval TEXT,
+                Timestamp TEXT,
+                Open REAL,
+                High REAL,
+                Low REAL,
+                Close REAL,
+                Volume REAL,
+                PRIMARY KEY (Symbol, Interval, Timestamp)
+            )
+            ''')
+
+            # Sessions already requested, so empty answers (holidays, no data) are not re-fetched
+            self.db.execute('''
+            CREATE TABLE IF NOT EXISTS fetched_sessions (
+                Symbol TEXT,
+                Interval TEXT,
+                Session TEXT,
+                PRIMARY KEY (Symbol, Interval, Session)
+            )
+            ''')
+        except Exception as e:
+            logging.error(f"Bar store initialization error: {e}")
+
+    def last_timestamps(self, symbols, interval):
+        """Return {symbol: last stored timestamp} for symbols that have bars"""
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            _, rows = self.db.query(f'''
+            SELECT Symbol, MAX(Timestamp) FROM bars
+            WHERE Interval = ? AND Symbol IN ({placeholders})
+            GROUP BY Symbol
+            ''', (interval, *symbols))
+            return {symbol: pd.Timestamp(ts) for symbol, ts in rows if ts}
+        except Exception as e:
+            logging.error(f"Error reading last bar timestamps: {e}")
+            return {}
+
+    def load(self, symbols, interval):
+        """Load stored bars as {symbol: DataFrame} indexed by timestamp"""
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            df = self.db.read_frame(f'''
+            SELECT Symbol, Timestamp, Open, High, Low, Close, Volume FROM bars
+            WHERE Interval = ? AND Symbol IN ({placeholders})
+            ORDER BY Symbol, Timestamp
+            ''', (interval, *symbols))
+        except Exception as e:
+            logging.error(f"Error loading bars from store: {e}")
+            return {}
+
+        return _split_symbols(df)
+
+    def load_tail(self, symbols, interval, count):
+        """Load only the last count stored bars of each symbol as {symbol: DataFrame}"""
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            df = self.db.read_frame(f'''
+            SELECT Symbol, Timestamp, Open, High, Low, Close, Volume FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY Symbol ORDER BY Timestamp DESC) AS Age FROM bars
+                WHERE Interval = ? AND Symbol IN ({placeholders})
+            ) WHERE Age <= ?
+            ORDER BY Symbol, Timestamp
+            ''', (interval, *symbols, count))
+        except Exception as e:
+            logging.error(f"Error loading recent bars from store: {e}")
+            return {}
+
+        return _split_symbols(df)
+
+    def load_session(self, symbols, interval, session, next_session):
+        """Load stored bars for one session as {symbol: DataFrame}"""
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            df = self.db.read_frame(f'''
+            SELECT Symbol, Timestamp, Open, High, Low, Close, Volume FROM bars
+            WHERE Interval = ? AND Timestamp >= ? AND Timestamp < ? AND Symbol IN ({placeholders})
+            ORDER BY Symbol, Timestamp
+            ''', (interval, session, next_session, *symbols))
+        except Exception as e:
+            logging.error(f"Error loading {session} bars from store: {e}")
+            return {}
+
+        return _split_symbols(df)
+
+    def fetched_symbols(self, interval, session):
+        """Return the set of symbols already requested for a session"""
+        try:
+            _, rows = self.db.query('''
+            SELECT Symbol FROM fetched_sessions WHERE Interval = ? AND Session = ?
+            ''', (interval, session))
+            return {row[0] for row in rows}
+        except Exception as e:
+            logging.error(f"Error reading fetched sessions: {e}")
+            return set()
+
+    def missing_sessions(self, symbols, interval, sessions):
+        """Return {symbol: sessions without complete bars} for a list of calendar sessions
+
+        A session is complete when it was fetched after its close, or when it has bars and
+        is not the symbol's last stored session, which may have been stored mid-session.
+        sessions come from the trading calendar, so holidays are never reported missing
+        and no download is needed to find the gaps.
+        """
+        sessions = [str(session) for session in sessions]
+        if not symbols or not sessions:
+            return {}
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            _, fetched_rows = self.db.query(f'''
+            SELECT Symbol, Session FROM fetched_sessions
+            WHERE Interval = ? AND Session >= ? AND Session <= ? AND Symbol IN ({placeholders})
+            ''', (interval, sessions[0], sessions[-1], *symbols))
+            _, bar_rows = self.db.query(f'''
+            SELECT Symbol, substr(Timestamp, 1, 10) AS Session FROM bars
+            WHERE Interval = ? AND Timestamp >= ? AND Symbol IN ({placeholders})
+            GROUP BY Symbol, Session
+            ''', (interval, sessions[0], *symbols))
+        except Exception as e:
+            logging.error(f"Error reading stored sessions: {e}")
+            return {symbol: sessions for symbol in symbols}
+
+        complete = {}
+        for symbol, session in fetched_rows:
+            complete.setdefault(symbol, set()).add(session)
+        stored = {}
+        for symbol, session in bar_rows:
+            stored.setdefault(symbol, set()).add(session)
+        for symbol, bar_sessions in stored.items():
+            complete.setdefault(symbol, set()).update(bar_sessions - {max(bar_sessions)})
+
+        missing = {}
+        for symbol in symbols:
+            gaps = [session for session in sessions if session not in complete.get(symbol, ())]
+            if gaps:
+                missing[symbol] = gaps
+        return missing
+
+    def mark_fetched(self, symbols, interval, session):
+        """Record that a session was requested for these symbols"""
+        try:
+            self.db.executemany('''
+            INSERT OR IGNORE INTO fetched_sessions (Symbol, Interval, Session) VALUES (?, ?, ?)
+            ''', [(symbol, interval, session) for symbol in symbols])
+        except Exception as e:
+            logging.error(f"Error recording fetched sessions: {e}")
+
+    def replace(self, frames, interval):
+        """Drop each symbol's stored bars and store the given frame instead, e.g. after re-adjustment"""
+        frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+        try:
+            self.db.executemany('''
+            DELETE FROM bars WHERE Symbol = ? AND Interval = ?
+            ''', [(symbol, interval) for symbol in frames])
+        except Exception as e:
+            logging.error(f"Error clearing bars before replacing them: {e}")
+            return 0
+        return self.append(frames, interval)
+
+    def append(self, frames, interval):
+        """Insert or replace bars for each symbol frame"""
+        rows = []
+        for symbol, df in frames.items():
+            if df is None or df.empty:
+                continue
+            bars = df[BAR_COLUMNS].dropna(subset=["Close"])
+            for ts, values in zip(bars.index, bars.itertuples(index=False, name=None)):
+                rows.append((symbol, interval, ts.isoformat(), *map(float, values)))
+
+        try:
+            return self.db.executemany('''
+            INSERT OR REPLACE INTO bars
+            (Symbol, Interval, Timestamp, Open, High, Low, Close, Volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        except Exception as e:
+            logging.error(f"Error appending bars to store: {e}")
+            return 0
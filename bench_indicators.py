@@ -0,0 +1,56 @@
+# Micro-benchmark for the intraday indicator stage
+# Checks that compute_panel_indicators scales linearly with the number of bars
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from indicators import build_panel, compute_panel_indicators
+
+BAR_COUNTS = [250, 1000, 4000, 16000]
+REPEATS = 3
+# Allowed growth in per-bar cost between the smallest and largest history
+MAX_PER_BAR_GROWTH = 2.0
+
+
+def synthetic_bars(n, seed=42):
+    """Generate a random-walk daily OHLCV frame with n bars"""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))
+    volume = rng.integers(100_000, 5_000_000, n).astype(float)
+    index = pd.bdate_range(end="2025-04-17", periods=n)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+
+def time_indicators(bars):
+    """Best-of-N wall time for one indicator pass, panel build included"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        compute_panel_indicators(build_panel({"SYM": bars}))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    per_bar = []
+    for n in BAR_COUNTS:
+        elapsed = time_indicators(synthetic_bars(n))
+        per_bar.append(elapsed / n)
+        print(f"{n:>6} bars: {elapsed * 1000:8.2f} ms  ({elapsed / n * 1e6:.2f} us/bar)")
+
+    growth = per_bar[-1] / per_bar[0]
+    print(f"Per-bar cost growth from {BAR_COUNTS[0]} to {BAR_COUNTS[-1]} bars: {growth:.2f}x")
+
+    if growth > MAX_PER_BAR_GROWTH:
+        print("FAIL: indicator stage is scaling worse than linearly")
+        return 1
+    print("OK: indicator stage scales linearly")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+# Chart rendering stage for the intraday screener
+# Draws setup charts in worker processes, each reusing a single matplotlib figure per thread
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend
+from matplotlib.figure import Figure
+
+# Only these columns are sent to the workers
+CHART_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "SMA20", "EMA9", "EMA21",
+                 "BB_Upper", "BB_Lower", "VolSMA20"]
+
+# Overlay fields taken from the setup that is drawn on the chart
+PATTERN_FIELDS = ["Entry", "Stop_Loss", "Target1", "Signal", "Confidence", "Risk_Reward"]
+
+# Bump when the chart layout changes so cached PNGs are redrawn
+CHART_VERSION = 1
+
+# Content hashes of the PNGs in a charts directory, keyed by file name
+MANIFEST_NAME = "chart_cache.json"
+
+# Figure template owned by the current thread; threaded callers such as intraday2 each draw on their own
+_local = threading.local()
+
+# Serializes manifest read-modify-write between threads of one process
+_manifest_lock = threading.Lock()
+
+
+def _get_template():
+    """Create this thread's figure template on first use
+
+    The figure is built without pyplot, whose global figure registry is not thread-safe.
+    """
+    template = getattr(_local, "template", None)
+    if template is None:
+        fig = Figure(figsize=(12, 8))
+        ax1, ax2 = fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]})
+        template = _local.template = (fig, ax1, ax2)
+    return template
+
+
+def chart_job(symbol, data, pattern, chart_path):
+    """Package one chart for a worker with only the columns and fields it draws"""
+    overlay = {field: pattern[field] for field in PATTERN_FIELDS} if pattern else None
+    return symbol, data[CHART_COLUMNS].copy(), overlay, chart_path
+
+
+def render_chart(job):
+    """Draw one chart on the reused figure and save it, returning the path or False"""
+    symbol, df, pattern, chart_path = job
+    if df is None or df.empty:
+        return False
+
+    try:
+        fig, ax1, ax2 = _get_template()
+        ax1.cla()
+        ax2.cla()
+        for text in list(fig.texts):
+            text.remove()
+        fig.suptitle(f"{symbol} - Technical Analysis Chart", fontsize=14)
+
+        # Plot candlesticks
+        width = 0.6
+        width2 = 0.05
+        up = df[df['Close'] >= df['Open']]
+        down = df[df['Close'] < df['Open']]
+
+        # Plot up candles
+        ax1.bar(up.index, up['Close'] - up['Open'], width, bottom=up['Open'], color='green', alpha=0.6)
+        ax1.bar(up.index, up['High'] - up['Close'], width2, bottom=up['Close'], color='green', alpha=0.6)
+        ax1.bar(up.index, up['Open'] - up['Low'], width2, bottom=up['Low'], color='green', alpha=0.6)
+
+        # Plot down candles
+        ax1.bar(down.index, down['Open'] - down['Close'], width, bottom=down['Close'], color='red', alpha=0.6)
+        ax1.bar(down.index, down['High'] - down['Open'], width2, bottom=down['Open'], color='red', alpha=0.6)
+        ax1.bar(down.index, down['Close'] - down['Low'], width2, bottom=down['Low'], color='red', alpha=0.6)
+
+        # Plot moving averages
+        ax1.plot(df.index, df['SMA20'], color='blue', linestyle='-', linewidth=1.0, label='SMA20')
+        ax1.plot(df.index, df['EMA9'], color='red', linestyle='-', linewidth=1.0, label='EMA9')
+        ax1.plot(df.index, df['EMA21'], color='green', linestyle='--', linewidth=1.0, label='EMA21')
+
+        # Plot bollinger bands
+        ax1.plot(df.index, df['BB_Upper'], color='gray', linestyle='--', linewidth=0.5)
+        ax1.plot(df.index, df['BB_Lower'], color='gray', linestyle='--', linewidth=0.5)
+
+        # Plot Volume
+        ax2.bar(up.index, up['Volume'], width, color='green', alpha=0.6)
+        ax2.bar(down.index, down['Volume'], width, color='red', alpha=0.6)
+        ax2.plot(df.index, df['VolSMA20'], color='blue', linestyle='-', label='Volume SMA20')
+
+        # Mark entry, stop and target levels for the setup
+        if pattern:
+            label_x = df.index[-int(len(df) * 0.1)]
+            ax1.axhline(y=pattern['Entry'], color='blue', linestyle='-', alpha=0.7, linewidth=1)
+            ax1.axhline(y=pattern['Stop_Loss'], color='red', linestyle='-', alpha=0.7, linewidth=1)
+            ax1.axhline(y=pattern['Target1'], color='green', linestyle='--', alpha=0.7, linewidth=1)
+
+            ax1.text(label_x, pattern['Entry'], 'Entry', fontsize=8, color='blue')
+            ax1.text(label_x, pattern['Stop_Loss'], 'Stop', fontsize=8, color='red')
+            ax1.text(label_x, pattern['Target1'], 'Target', fontsize=8, color='green')
+
+            fig.text(0.02, 0.02, f"Setup: {pattern['Signal']} ({pattern['Confidence']}) - R:R {pattern['Risk_Reward']}", fontsize=10)
+
+        # Add legends and labels
+        ax1.legend(loc='upper left', fontsize=8)
+        ax1.set_ylabel('Price')
+        ax1.grid(True, alpha=0.3)
+
+        ax2.set_ylabel('Volume')
+        ax2.grid(True, alpha=0.3)
+
+        # Format dates on x-axis
+        if len(df) > 30:
+            ax2.tick_params(axis='x', labelrotation=45)
+
+        fig.tight_layout()
+        fig.savefig(chart_path)
+
+        return chart_path
+    except Exception as e:
+        logging.error(f"Error creating chart for {symbol}: {e}")
+        return False
+
+
+def chart_hash(job):
+    """Hash of everything that ends up on a chart: the plotted bars and the setup levels"""
+    symbol, df, pattern, _ = job
+    digest = hashlib.sha256(f"{CHART_VERSION}|{symbol}|".encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(json.dumps(pattern, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(charts_dir):
+    """Read the chart hash manifest for a directory"""
+    try:
+        with open(os.path.join(charts_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(charts_dir, manifest):
+    """Write the chart hash manifest atomically so concurrent runs never see a partial file"""
+    path = os.path.join(charts_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error(f"Error saving chart cache manifest: {e}")
+
+
+def _split_cached(jobs):
+    """Separate jobs whose PNG already matches its content hash from jobs that need drawing"""
+    manifests = {}
+    cached, stale = {}, []
+    for job in jobs:
+        chart_path = job[3]
+        charts_dir, filename = os.path.split(chart_path)
+        if charts_dir not in manifests:
+            manifests[charts_dir] = load_manifest(charts_dir)
+        manifest = manifests[charts_dir]
+        key = chart_hash(job)
+        if manifest.get(filename) == key and os.path.exists(chart_path):
+            cached[job[0]] = chart_path
+        else:
+            stale.append((job, key))
+    return cached, stale
+
+
+def _record_rendered(rendered):
+    """Store the hashes of freshly drawn charts, re-reading each manifest so other runs' entries survive"""
+    updates = {}
+    for (job, key), path in rendered:
+        charts_dir, filename = os.path.split(job[3])
+        updates.setdefault(charts_dir, {})[filename] = key if path else None
+    with _manifest_lock:
+        for charts_dir, entries in updates.items():
+            manifest = load_manifest(charts_dir)
+            for filename, key in entries.items():
+                if key:
+                    manifest[filename] = key
+                else:
+                    manifest.pop(filename, None)
+            save_manifest(charts_dir, manifest)
+
+
+def render_cached_chart(job):
+    """Render one chart in this process unless the cached PNG is current
+
+    Safe to call from several threads at once. Returns (path or False, reused).
+    """
+    cached, stale = _split_cached([job])
+    if cached:
+        return cached[job[0]], True
+    path = render_chart(job)
+    _record_rendered([(stale[0], path)])
+    return path, False
+
+
+def render_charts(jobs, max_workers=4):
+    """Render chart jobs in a process pool, skipping charts whose PNG is unchanged
+
+    Returns ({symbol: path or False}, number of reused charts).
+    """
+    if not jobs:
+        return {}, 0
+
+    paths, stale = _split_cached(jobs)
+    reused = len(paths)
+    if stale:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(stale))) as executor:
+            rendered = list(zip(stale, executor.map(render_chart, [job for job, _ in stale])))
+        _record_rendered(rendered)
+        paths.update({job[0]: path for (job, _), path in rendered})
+
+    logging.info(f"Charts: {len(stale)} rendered, {reused} reused from cache")
+    return paths, reused
@@ -0,0 +1,203 @@
+# Panel indicator engine for the NSE screeners
+# Computes the intraday screener's indicator set for a whole universe (timestamps x symbols) in one pass
+
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Flag columns that the per-symbol engine stores as integers
+FLAG_COLUMNS = ["Engulfing", "InsideBar", "OutsideBar"]
+
+# Symbols need this many bars before ta's ADX is defined
+ADX_WINDOW = 14
+MIN_ADX_BARS = 2 * ADX_WINDOW
+
+
+def build_panel(frames):
+    """Align per-symbol OHLCV frames into wide {field: DataFrame(timestamps x symbols)} panels"""
+    symbols = [symbol for symbol, df in frames.items() if df is not None and not df.empty]
+    panel = {}
+    for field in PRICE_FIELDS:
+        panel[field] = pd.concat({symbol: frames[symbol][field] for symbol in symbols}, axis=1).sort_index()
+    return panel
+
+
+def _compact(values, order):
+    """Move each symbol's valid rows to the top so every column starts at row 0 with no gaps"""
+    return np.take_along_axis(values, order, axis=0)
+
+
+def _seed(values, start, stop, how):
+    """Per-symbol sum or mean over rows [start, stop), reduced column by column like ta does"""
+    block = np.ascontiguousarray(values[start:stop].T)
+    return np.array([getattr(column, how)() for column in block])
+
+
+def _wilder_atr(tr, window):
+    """ta's AverageTrueRange recursion, advanced one row at a time for all symbols"""
+    atr = np.zeros_like(tr)
+    if len(tr) < window:
+        return atr
+    atr[window - 1] = _seed(tr, 0, window, "mean")
+    for i in range(window, len(tr)):
+        atr[i] = (atr[i - 1] * (window - 1) + tr[i]) / float(window)
+    return atr
+
+
+def _wilder_sum(values, window):
+    """ta's ADX running-sum smoothing, indexed from the first complete window"""
+    smoothed = np.zeros((len(values) - (window - 1), values.shape[1]))
+    smoothed[0] = _seed(values, 1, window + 1, "sum")
+    for i in range(1, len(smoothed) - 1):
+        smoothed[i] = smoothed[i - 1] - (smoothed[i - 1] / float(window)) + values[window + i]
+    return smoothed
+
+
+def _adx(high, low, close, window):
+    """ta's ADXIndicator.adx() for compacted (T x S) arrays"""
+    rows = len(close)
+    if rows < 2 * window:
+        return np.full_like(close, np.nan)
+
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    directional_movement = np.fmax(high, prev_close) - np.fmin(low, prev_close)
+    directional_movement[0] = np.nan
+
+    diff_up = np.vstack([np.full((1, high.shape[1]), np.nan), high[1:] - high[:-1]])
+    diff_down = np.vstack([np.full((1, low.shape[1]), np.nan), low[:-1] - low[1:]])
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    trs = _wilder_sum(directional_movement, window)
+    dip = _wilder_sum(pos, window)
+    din = _wilder_sum(neg, window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di_pos = np.where(trs != 0, 100 * (dip / trs), 0.0)
+        di_neg = np.where(trs != 0, 100 * (din / trs), 0.0)
+        di_sum = di_pos + di_neg
+        directional_index = np.where(di_sum != 0, 100 * np.abs((di_pos - di_neg) / di_sum), 0.0)
+
+    adx = np.zeros_like(trs)
+    adx[window] = _seed(directional_index, 0, window, "mean")
+    for i in range(window + 1, len(adx)):
+        adx[i] = ((adx[i - 1] * (window - 1)) + directional_index[i - 1]) / float(window)
+
+    return np.vstack([np.zeros((window - 1, close.shape[1])), adx])
+
+
+def compute_panel_indicators(panel):
+    """Compute the full indicator set for every symbol in one vectorized pass
+
+    Takes {field: DataFrame(timestamps x symbols)} and returns {column: DataFrame} with the
+    same indicator columns for every symbol, ready for panel_to_frames. Symbols with
+    different history lengths are handled by computing on compacted columns and scattering
+    the results back to their timestamps.
+    """
+    index = panel["Close"].index
+    symbols = panel["Close"].columns
+    raw = {field: panel[field][symbols].to_numpy(dtype=float) for field in PRICE_FIELDS}
+
+    valid = ~np.isnan(raw["Close"])
+    order = np.argsort(~valid, axis=0, kind="stable")
+    counts = valid.sum(axis=0)
+
+    o, h, l, c, v = (_compact(raw[field], order) for field in PRICE_FIELDS)
+    open_, high, low, close, volume = (pd.DataFrame(values, columns=symbols) for values in (o, h, l, c, v))
+
+    out = {}
+
+    # Candle anatomy
+    out['BodySize'] = np.abs(c - o)
+    out['CandleSize'] = h - l
+    out['BodyToCandle'] = out['BodySize'] / out['CandleSize']
+    out['UpperWick'] = h - np.maximum(o, c)
+    out['LowerWick'] = np.minimum(o, c) - l
+
+    # Moving averages
+    sma20 = close.rolling(window=20).mean()
+    out['SMA5'] = close.rolling(window=5).mean().to_numpy()
+    out['SMA20'] = sma20.to_numpy()
+    out['SMA50'] = close.rolling(window=50).mean().to_numpy()
+    out['EMA9'] = close.ewm(span=9, min_periods=9, adjust=False).mean().to_numpy()
+    out['EMA21'] = close.ewm(span=21, min_periods=21, adjust=False).mean().to_numpy()
+
+    # Volume analysis
+    vol_sma = volume.rolling(window=20).mean()
+    out['VolSMA20'] = vol_sma.to_numpy()
+    out['VolRatio'] = (volume / vol_sma).to_numpy()
+
+    # Trend and volatility
+    adx = _adx(h, l, c, ADX_WINDOW)
+    adx[:, counts < MIN_ADX_BARS] = np.nan
+    out['ADX'] = adx
+    prev_c = np.vstack([np.full((1, c.shape[1]), np.nan), c[:-1]])
+    true_range = np.fmax(np.fmax(h - l, np.abs(h - prev_c)), np.abs(l - prev_c))
+    out['ATR'] = _wilder_atr(true_range, 14)
+    out['ATR%'] = out['ATR'] / c * 100
+
+    # Momentum
+    diff = close.diff(1)
+    up = diff.where(diff > 0, 0.0)
+    down = -diff.where(diff < 0, 0.0)
+    ema_up = up.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    ema_down = down.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    out['RSI'] = np.where(ema_down == 0, 100, 100 - (100 / (1 + ema_up / ema_down)))
+
+    ema_fast = close.ewm(span=12, min_periods=12, adjust=False).mean()
+    ema_slow = close.ewm(span=26, min_periods=26, adjust=False).mean()
+    macd = ema_fast - ema_slow
+    macd_signal = macd.ewm(span=9, min_periods=9, adjust=False).mean()
+    out['MACD'] = macd.to_numpy()
+    out['MACD_Signal'] = macd_signal.to_numpy()
+    out['MACD_Hist'] = (macd - macd_signal).to_numpy()
+
+    # Bollinger bands
+    bb_std = close.rolling(20, min_periods=20).std(ddof=0)
+    bb_mid = close.rolling(20, min_periods=20).mean()
+    out['BB_Upper'] = (bb_mid + 2 * bb_std).to_numpy()
+    out['BB_Lower'] = (bb_mid - 2 * bb_std).to_numpy()
+    out['BB_Width'] = (out['BB_Upper'] - out['BB_Lower']) / out['SMA20']
+
+    # Support/Resistance
+    out['PrevHigh'] = high.rolling(window=10).max().shift(1).to_numpy()
+    out['PrevLow'] = low.rolling(window=10).min().shift(1).to_numpy()
+
+    # Candle patterns
+    out['Engulfing'] = ((close > open_) & (open_.shift(1) > close.shift(1)) &
+                        (open_ < close.shift(1)) & (close > open_.shift(1))).to_numpy()
+    out['InsideBar'] = ((high < high.shift(1)) & (low > low.shift(1))).to_numpy()
+    out['OutsideBar'] = ((high > high.shift(1)) & (low < low.shift(1))).to_numpy()
+
+    # Breakout levels and gaps
+    out['BreakoutLevel'] = high.rolling(window=5).max().shift(1).to_numpy()
+    out['BreakdownLevel'] = low.rolling(window=5).min().shift(1).to_numpy()
+    gap = open_ - close.shift(1)
+    out['Gap'] = gap.to_numpy()
+    out['GapPercent'] = (gap / close.shift(1) * 100).to_numpy()
+
+    # Scatter compacted rows back to their timestamps
+    results = {field: panel[field][symbols] for field in PRICE_FIELDS}
+    for column, values in out.items():
+        values = np.asarray(values, dtype=float)
+        scattered = np.full(values.shape, np.nan)
+        np.put_along_axis(scattered, order, values, axis=0)
+        scattered[~valid] = np.nan
+        results[column] = pd.DataFrame(scattered, index=index, columns=symbols)
+
+    return results
+
+
+def panel_to_frames(indicators):
+    """Split panel indicator output into per-symbol indicator frames indexed by timestamp"""
+    close = indicators["Close"]
+    frames = {}
+    for symbol in close.columns:
+        rows = close[symbol].notna().to_numpy()
+        df = pd.DataFrame({column: values[symbol].to_numpy()[rows] for column, values in indicators.items()},
+                          index=close.index[rows])
+        for column in FLAG_COLUMNS:
+            df[column] = df[column].astype(int)
+        frames[symbol] = df
+    return frames
@@ -0,0 +1,438 @@
+# Incremental indicator engine for the intraday screener
+# Advances each symbol's indicators by one bar from persisted state instead of recomputing the full history
+
+import json
+import logging
+import numpy as np
+import pandas as pd
+from collections import deque
+from screenerdb import get_db
+from indicators import PRICE_FIELDS, FLAG_COLUMNS, ADX_WINDOW, MIN_ADX_BARS
+from patterns import MIN_BARS
+
+# Indicator columns in the order compute_panel_indicators returns them
+INDICATOR_COLUMNS = PRICE_FIELDS + [
+    "BodySize", "CandleSize", "BodyToCandle", "UpperWick", "LowerWick", "SMA5", "SMA20", "SMA50", "EMA9",
+    "EMA21", "VolSMA20", "VolRatio", "ADX", "ATR", "ATR%", "RSI", "MACD", "MACD_Signal", "MACD_Hist",
+    "BB_Upper", "BB_Lower", "BB_Width", "PrevHigh", "PrevLow", "Engulfing", "InsideBar", "OutsideBar",
+    "BreakoutLevel", "BreakdownLevel", "Gap", "GapPercent"
+]
+
+EMA_SPANS = (9, 12, 21, 26)
+ATR_WINDOW = 14
+RSI_WINDOW = 14
+MACD_SIGNAL_SPAN = 9
+
+NAN = float("nan")
+
+# Relative difference between a state's last close and the bars' close at that timestamp
+# above which the bars are taken to have been re-adjusted (split, dividend)
+ADJUSTMENT_TOLERANCE = 1e-6
+
+
+def _ewm_step(previous, value, alpha):
+    """One step of pandas' ewm(adjust=False) recursion, started at the first value"""
+    if previous is None:
+        return value
+    return ((1 - alpha) * previous + alpha * value) / ((1 - alpha) + alpha)
+
+
+def _divide(numerator, denominator):
+    """Float division with numpy semantics (inf / NaN instead of ZeroDivisionError), like the panel engine"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(numerator) / denominator)
+
+
+def _window_mean(values, window):
+    return float(np.mean(values[-window:])) if len(values) >= window else NAN
+
+
+class IndicatorState:
+    """Running indicator state for one symbol, advanced one bar at a time
+
+    Holds EMA values, Wilder-smoothed averages and the short rolling buffers the
+    indicators need, plus the last MIN_BARS indicator rows so the vectorized pattern
+    rules and chart windows can run without the full history. Every update costs the
+    same regardless of how many bars the symbol has seen.
+    """
+
+    def __init__(self):
+        self.bars = 0
+        self.last_timestamp = None  # nanoseconds since the epoch, comparable with DatetimeIndex.asi8
+        self.tz = None
+        self.prev = None  # previous bar as [open, high, low, close]
+        self.closes = deque(maxlen=50)
+        self.volumes = deque(maxlen=20)
+        self.prior_highs = deque(maxlen=10)
+        self.prior_lows = deque(maxlen=10)
+        self.ema = {str(span): None for span in EMA_SPANS}
+        self.macd_signal = None
+        self.macd_count = 0
+        self.rsi_up = None
+        self.rsi_down = None
+        self.atr = None
+        self.atr_seed = []
+        self.adx_seed = [[], [], []]  # directional movement, +DM, -DM over the first window
+        self.adx_smoothed = None
+        self.dx_seed = []
+        self.adx = None
+        self.rows = deque(maxlen=MIN_BARS)
+        self.row_timestamps = deque(maxlen=MIN_BARS)
+
+    def update(self, timestamp, open_, high, low, close, volume):
+        """Advance the state by one completed bar and return its indicator row"""
+        t = self.bars
+        o, h, l, c, v = (float(x) for x in (open_, high, low, close, volume))
+        prev = self.prev
+        row = {"Open": o, "High": h, "Low": l, "Close": c, "Volume": v}
+
+        # Candle anatomy
+        row["BodySize"] = abs(c - o)
+        row["CandleSize"] = h - l
+        row["BodyToCandle"] = _divide(row["BodySize"], row["CandleSize"])
+        row["UpperWick"] = h - max(o, c)
+        row["LowerWick"] = min(o, c) - l
+
+        # Moving averages
+        self.closes.append(c)
+        closes = list(self.closes)
+        row["SMA5"] = _window_mean(closes, 5)
+        row["SMA20"] = _window_mean(closes, 20)
+        row["SMA50"] = _window_mean(closes, 50)
+        for span in EMA_SPANS:
+            self.ema[str(span)] = _ewm_step(self.ema[str(span)], c, 2.0 / (span + 1))
+        row["EMA9"] = self.ema["9"] if t + 1 >= 9 else NAN
+        row["EMA21"] = self.ema["21"] if t + 1 >= 21 else NAN
+
+        # Volume analysis
+        self.volumes.append(v)
+        row["VolSMA20"] = _window_mean(list(self.volumes), 20)
+        row["VolRatio"] = _divide(v, row["VolSMA20"])
+
+        # Trend and volatility
+        row["ADX"] = self._update_adx(t, h, l, prev)
+        true_range = h - l if prev is None else max(h - l, abs(h - prev[3]), abs(l - prev[3]))
+        if t < ATR_WINDOW - 1:
+            self.atr_seed.append(true_range)
+            row["ATR"] = 0.0
+        elif t == ATR_WINDOW - 1:
+            self.atr_seed.append(true_range)
+            self.atr = float(np.array(self.atr_seed).mean())
+            self.atr_seed = []
+            row["ATR"] = self.atr
+        else:
+            self.atr = (self.atr * (ATR_WINDOW - 1) + true_range) / float(ATR_WINDOW)
+            row["ATR"] = self.atr
+        row["ATR%"] = _divide(row["ATR"], c) * 100
+
+        # Momentum
+        diff = 0.0 if prev is None else c - prev[3]
+        self.rsi_up = _ewm_step(self.rsi_up, diff if diff > 0 else 0.0, 1.0 / RSI_WINDOW)
+        self.rsi_down = _ewm_step(self.rsi_down, -diff if diff < 0 else 0.0, 1.0 / RSI_WINDOW)
+        if t + 1 < RSI_WINDOW:
+            row["RSI"] = NAN
+        else:
+            row["RSI"] = 100.0 if self.rsi_down == 0 else 100 - (100 / (1 + self.rsi_up / self.rsi_down))
+
+        row["MACD"] = row["MACD_Signal"] = row["MACD_Hist"] = NAN
+        if t + 1 >= 26:
+            macd = self.ema["12"] - self.ema["26"]
+            self.macd_signal = _ewm_step(self.macd_signal, macd, 2.0 / (MACD_SIGNAL_SPAN + 1))
+            self.macd_count += 1
+            row["MACD"] = macd
+            if self.macd_count >= MACD_SIGNAL_SPAN:
+                row["MACD_Signal"] = self.macd_signal
+                row["MACD_Hist"] = macd - self.macd_signal
+
+        # Bollinger bands
+        if len(closes) >= 20:
+            window = np.array(closes[-20:])
+            bb_std, bb_mid = float(window.std()), float(window.mean())
+            row["BB_Upper"], row["BB_Lower"] = bb_mid + 2 * bb_std, bb_mid - 2 * bb_std
+            row["BB_Width"] = _divide(row["BB_Upper"] - row["BB_Lower"], row["SMA20"])
+        else:
+            row["BB_Upper"] = row["BB_Lower"] = row["BB_Width"] = NAN
+
+        # Support/Resistance and breakout levels from the bars before this one
+        highs, lows = list(self.prior_highs), list(self.prior_lows)
+        row["PrevHigh"] = max(highs) if len(highs) == 10 else NAN
+        row["PrevLow"] = min(lows) if len(lows) == 10 else NAN
+        row["BreakoutLevel"] = max(highs[-5:]) if len(highs) >= 5 else NAN
+        row["BreakdownLevel"] = min(lows[-5:]) if len(lows) >= 5 else NAN
+        self.prior_highs.append(h)
+        self.prior_lows.append(l)
+
+        # Candle patterns and gaps
+        if prev is None:
+            row["Engulfing"] = row["InsideBar"] = row["OutsideBar"] = 0.0
+            row["Gap"] = row["GapPercent"] = NAN
+        else:
+            p_open, p_high, p_low, p_close = prev
+            row["Engulfing"] = float(c > o and p_open > p_close and o < p_close and c > p_open)
+            row["InsideBar"] = float(h < p_high and l > p_low)
+            row["OutsideBar"] = float(h > p_high and l < p_low)
+            row["Gap"] = o - p_close
+            row["GapPercent"] = _divide(row["Gap"], p_close) * 100
+
+        self.prev = [o, h, l, c]
+        self.bars += 1
+        timestamp = pd.Timestamp(timestamp)
+        self.tz = str(timestamp.tz) if timestamp.tz else None
+        self.last_timestamp = timestamp.value
+        self.rows.append([row[column] for column in INDICATOR_COLUMNS])
+        self.row_timestamps.append(timestamp.value)
+
+        # ta leaves ADX undefined for the whole history until MIN_ADX_BARS bars exist
+        if self.bars < MIN_ADX_BARS:
+            row["ADX"] = NAN
+        return row
+
+    def _update_adx(self, t, high, low, prev):
+        """ta's ADX recursion advanced by one bar, 0 before its first full window like ta"""
+        if prev is None:
+            return 0.0
+        w = ADX_WINDOW
+        movement = max(high, prev[3]) - min(low, prev[3])
+        up, down = high - prev[1], prev[2] - low
+        values = (movement, up if up > down and up > 0 else 0.0, down if down > up and down > 0 else 0.0)
+
+        if t <= w:
+            for seed, value in zip(self.adx_seed, values):
+                seed.append(value)
+            if t < w:
+                return 0.0
+            self.adx_smoothed = [float(np.array(seed).sum()) for seed in self.adx_seed]
+            self.adx_seed = [[], [], []]
+        else:
+            self.adx_smoothed = [s - (s / float(w)) + value for s, value in zip(self.adx_smoothed, values)]
+
+        trs, dip, din = self.adx_smoothed
+        di_pos = 100 * (dip / trs) if trs != 0 else 0.0
+        di_neg = 100 * (din / trs) if trs != 0 else 0.0
+        di_sum = di_pos + di_neg
+        dx = 100 * abs((di_pos - di_neg) / di_sum) if di_sum != 0 else 0.0
+
+        if t < 2 * w - 1:
+            self.dx_seed.append(dx)
+            return 0.0
+        if t == 2 * w - 1:
+            self.dx_seed.append(dx)
+            self.adx = float(np.array(self.dx_seed).mean())
+            self.dx_seed = []
+        else:
+            self.adx = ((self.adx * (w - 1)) + dx) / float(w)
+        return self.adx
+
+    def copy(self):
+        """Independent copy of the state, cheap enough to take per forming bar"""
+        clone = IndicatorState.__new__(IndicatorState)
+        for key, value in self.__dict__.items():
+            if isinstance(value, deque):
+                value = deque(value, maxlen=value.maxlen)
+            elif isinstance(value, dict):
+                value = dict(value)
+            elif isinstance(value, list):
+                value = [list(item) if isinstance(item, list) else item for item in value]
+            setattr(clone, key, value)
+        return clone
+
+    def peek(self, timestamp, open_, high, low, close, volume):
+        """State including a still-forming bar, leaving this state untouched"""
+        forming = self.copy()
+        forming.update(timestamp, open_, high, low, close, volume)
+        return forming
+
+    def index(self):
+        """Timestamps of the indicator window"""
+        index = pd.to_datetime(np.array(self.row_timestamps, dtype=np.int64), utc=self.tz is not None)
+        return index.tz_convert(self.tz) if self.tz else index
+
+    def frame(self):
+        """The last MIN_BARS indicator rows as a frame shaped like panel_to_frames output"""
+        df = pd.DataFrame(np.array(self.rows, dtype=float).reshape(-1, len(INDICATOR_COLUMNS)),
+                          index=self.index(), columns=INDICATOR_COLUMNS)
+        if self.bars < MIN_ADX_BARS:
+            df["ADX"] = NAN
+        for column in FLAG_COLUMNS:
+            df[column] = df[column].astype(int)
+        return df
+
+    def dumps(self):
+        """Serialize as (JSON scalars and buffers, indicator window bytes, window timestamp bytes)"""
+        state = {key: list(value) if isinstance(value, deque) else value
+                 for key, value in self.__dict__.items() if key not in ("rows", "row_timestamps")}
+        return (json.dumps(state), np.array(self.rows, dtype=np.float64).tobytes(),
+                np.array(self.row_timestamps, dtype=np.int64).tobytes())
+
+    @classmethod
+    def loads(cls, text, rows, row_timestamps):
+        """Rebuild a state saved with dumps"""
+        state = cls()
+        for key, value in json.loads(text).items():
+            current = getattr(state, key, None)
+            setattr(state, key, deque(value, maxlen=current.maxlen) if isinstance(current, deque) else value)
+        state.rows.extend(np.frombuffer(rows, dtype=np.float64).reshape(-1, len(INDICATOR_COLUMNS)).tolist())
+        state.row_timestamps.extend(np.frombuffer(row_timestamps, dtype=np.int64).tolist())
+        return state
+
+
+def states_to_long(states):
+    """Stack the indicator windows of many states into one (Symbol, Date) frame for detect_patterns"""
+    states = {symbol: state for symbol, state in states.items() if state.rows}
+    if not states:
+        return pd.DataFrame(columns=INDICATOR_COLUMNS)
+    values = np.concatenate([np.array(state.rows, dtype=float) for state in states.values()])
+    symbols = np.repeat(list(states), [len(state.rows) for state in states.values()])
+    # Timestamps are stored as UTC nanoseconds, so one conversion covers every symbol
+    tz = next(iter(states.values())).tz
+    dates = pd.to_datetime(np.concatenate([np.array(state.row_timestamps, dtype=np.int64) for state in states.values()]),
+                           utc=tz is not None)
+    if tz:
+        dates = dates.tz_convert(tz)
+    long_df = pd.DataFrame(values, index=pd.MultiIndex.from_arrays([symbols, dates], names=["Symbol", "Date"]),
+                           columns=INDICATOR_COLUMNS)
+    short_history = np.repeat([state.bars < MIN_ADX_BARS for state in states.values()],
+                              [len(state.rows) for state in states.values()])
+    long_df.loc[short_history, "ADX"] = NAN
+    for column in FLAG_COLUMNS:
+        long_df[column] = long_df[column].astype(int)
+    return long_df
+
+
+class IndicatorStateStore:
+    """Per-symbol indicator state persisted in SQLite, so each run only applies new bars"""
+
+    def __init__(self, db_path="intraday_data.db"):
+        self.db = get_db(db_path)
+        self.init_database()
+
+    def init_database(self):
+        """Create the indicator state table if it does not exist"""
+        try:
+            self.db.execute('''
+            CREATE TABLE IF NOT EXISTS indicator_state (
+                Symbol TEXT,
+                Interval TEXT,
+                Last_Timestamp INTEGER,
+                Bars INTEGER,
+                State TEXT,
+                Window BLOB,
+                Window_Timestamps BLOB,
+                PRIMARY KEY (Symbol, Interval)
+            )
+            ''')
+        except Exception as e:
+            logging.error(f"Indicator state database initialization error: {e}")
+
+    def load(self, symbols, interval):
+        """Load saved states as {symbol: IndicatorState}"""
+        symbols = list(symbols)
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            _, rows = self.db.query(f'''
+            SELECT Symbol, State, Window, Window_Timestamps FROM indicator_state
+            WHERE Interval = ? AND Symbol IN ({placeholders})
+            ''', (interval, *symbols))
+        except Exception as e:
+            logging.error(f"Error loading indicator state: {e}")
+            return {}
+        states = {}
+        for symbol, text, window, window_timestamps in rows:
+            try:
+                states[symbol] = IndicatorState.loads(text, window, window_timestamps)
+            except Exception as e:
+                logging.error(f"Discarding unreadable indicator state for {symbol}: {e}")
+        return states
+
+    def save(self, states, interval):
+        """Upsert states, returning how many were written"""
+        try:
+            return self.db.executemany('''
+            INSERT OR REPLACE INTO indicator_state
+            (Symbol, Interval, Last_Timestamp, Bars, State, Window, Window_Timestamps)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(symbol, interval, state.last_timestamp, state.bars, *state.dumps())
+                  for symbol, state in states.items()])
+        except Exception as e:
+            logging.error(f"Error saving indicator state: {e}")
+            return 0
+
+    def reset(self, symbols, interval):
+        """Drop saved states, e.g. after the stored bars were corrected"""
+        try:
+            self.db.executemany('''
+            DELETE FROM indicator_state WHERE Symbol = ? AND Interval = ?
+            ''', [(symbol, interval) for symbol in symbols])
+        except Exception as e:
+            logging.error(f"Error resetting indicator state: {e}")
+
+    @staticmethod
+    def stale_reason(state, timestamps, closes):
+        """Why a saved state no longer continues the given bars, None if it does
+
+        The state is stale when the bars start after it (the bars in between were never
+        applied) or when their close at the state's last timestamp differs from the one
+        the state saw, which is how a split or dividend re-adjustment of the history shows.
+        """
+        if state.last_timestamp is None:
+            return None
+        if timestamps[0] > state.last_timestamp:
+            return "bars start after the saved state"
+        position = int(np.searchsorted(timestamps, state.last_timestamp))
+        if position == len(timestamps):
+            # Bars that end before the state have nothing to apply
+            return None
+        if timestamps[position] != state.last_timestamp:
+            return "last state bar is missing from the bars"
+        if not np.isclose(closes[position], state.prev[3], rtol=ADJUSTMENT_TOLERANCE, atol=0):
+            return "bars were re-adjusted"
+        return None
+
+    def advance(self, frames, interval, forming=False, states=None):
+        """Apply bars newer than each symbol's state and return {symbol: IndicatorState}
+
+        Symbols without saved state are warmed up from the bars given, once; after that
+        each new bar is a constant-time update. States that no longer continue the bars
+        (see stale_reason) are reset and warmed up again. With forming, each symbol's last bar is
+        still in progress: the returned state includes it but only completed bars are
+        committed, so the next call applies the bar's final values. Pass states to reuse
+        states already held in memory (live scanning) instead of reading them back.
+        """
+        frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+        committed = dict(states) if states is not None else {}
+        missing = [symbol for symbol in frames if symbol not in committed]
+        if missing:
+            committed.update(self.load(missing, interval))
+        current, changed, rewarmed = {}, {}, []
+
+        for symbol, df in frames.items():
+            state = committed.get(symbol) or IndicatorState()
+            timestamps = df.index.as_unit("ns").asi8
+            values = df[PRICE_FIELDS].to_numpy(dtype=float)
+            reason = self.stale_reason(state, timestamps, values[:, PRICE_FIELDS.index("Close")])
+            if reason:
+                logging.info(f"Re-warming indicator state for {symbol} ({interval}): {reason}")
+                rewarmed.append(symbol)
+                state = IndicatorState()
+            start = 0 if state.last_timestamp is None else int(np.searchsorted(timestamps, state.last_timestamp, side="right"))
+            stop = len(df) - 1 if forming else len(df)
+
+            for i in range(start, stop):
+                state.update(df.index[i], *values[i])
+            if stop > start:
+                changed[symbol] = state
+            committed[symbol] = state
+
+            if forming and stop >= start:
+                current[symbol] = state.peek(df.index[-1], *values[-1])
+            elif state.bars:
+                current[symbol] = state
+
+        if rewarmed:
+            self.reset(rewarmed, interval)
+        if changed:
+            self.save(changed, interval)
+        if states is not None:
+            states.update(committed)
+        logging.info(f"Indicator state ({interval}): advanced {len(changed)} of {len(frames)} symbols")
+        return current
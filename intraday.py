@@ -4,19 +4,36 @@
 import pandas as pd
 import numpy as np
 import yfinance as yf
-import ta
-import sqlite3
 import logging
 import os
 import time
-import random
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
-from fake_useragent import UserAgent
-import warnings
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
+import threading
+import argparse
+from types import MappingProxyType
+from functools import partial
+from datetime import datetime, timedelta, time as dtime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from marketdata import MarketDataClient, MARKET_INDICES, yahoo_call
+from barstore import BarStore
+from screenerdb import get_db
+from indicators import build_panel, compute_panel_indicators, panel_to_frames
+from patterns import detect_patterns, frames_to_long, confirm_setups, score_setups, SETUP_COLUMNS, HOURLY_PERIOD, HOURLY_INTERVAL
+from charts import chart_job, render_charts
+from pipeline import run_pipeline, chunked
+from sharedbars import SharedBars
+from universe import UniverseLoader
+from prefilter import DailySummary, DEFAULT_RULES, filter_frames
+from indicatorstate import IndicatorStateStore, states_to_long
+from barfeed import ReplayFeed, YahooPollingFeed
+from livescan import LiveScanner
+from portfolio import backtest_portfolio
+from sweep import run_sweep, load_grid, DEFAULT_GRID
+from walkforward import run_walk_forward, TRAIN_SESSIONS, TEST_SESSIONS
+from tradingcalendar import get_calendar, session_label, MARKET_CLOSE
+from reportwriter import (ReportWriter, rate_class, SETUP_REPORT_HEADER, SETUP_CARD, SETUP_CHART,
+                          BACKTEST_REPORT_HEADER, BACKTEST_STATS, SETUP_TYPE_TABLE_HEADER, SETUP_TYPE_ROW,
+                          RESULT_TABLE_HEADER, RESULT_ROW, TABLE_FOOTER, DOCUMENT_FOOTER,
+                          WALK_FORWARD_STATS, WALK_FORWARD_TABLE_HEADER, WALK_FORWARD_ROW)
 
 # Set up logging
 logging.basicConfig(
@@ -42,21 +59,68 @@ NSE_SYMBOLS = [
     "ABFRL", "TATACHEM", "ADANIPOWER", "MANAPPURAM", "NMDC", "IDFC", "EXIDEIND", "JINDALSAW"
 ]
 
+# Bars the market context needs before screening starts (indices and the breadth sample)
+CONTEXT_REQUESTS = [("10d", "1d"), ("5d", "1d"), ("2d", "1d")]
+
+# Symbols per bulk download / CPU work unit in the screening pipeline
+SCREEN_CHUNK_SIZE = 25
+
+# Yahoo serves 5m bars for roughly the last 60 days, older sessions only have daily bars
+INTRADAY_HISTORY_DAYS = 58
+
+# fetched_sessions key for 5m sessions that were answered with daily bars only
+DAILY_ONLY = "5m-daily"
+
+
+def screen_frames(frames, market_sentiment=None):
+    """CPU stage of the screening pipeline: indicators and patterns for one chunk of symbols
+
+    Returns (setup records, {symbol: last 30 indicator rows}) for symbols with setups.
+    """
+    frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return [], {}
+    return screen_panel(build_panel(frames), market_sentiment)
+
+
+def screen_shared(bars, market_sentiment=None):
+    """Process worker entry point: screen a chunk attached from shared memory instead of unpickled frames"""
+    return screen_panel(bars.panel(), market_sentiment)
+
+
+def screen_panel(panel, market_sentiment=None):
+    """Indicators and patterns for a {field: DataFrame(timestamps x symbols)} panel"""
+    indicators = panel_to_frames(compute_panel_indicators(panel))
+    setups = detect_patterns(frames_to_long(indicators), market_sentiment, latest_only=True)
+    records = setups.to_dict("records")
+    chart_windows = {symbol: indicators[symbol].iloc[-30:] for symbol in setups["Symbol"].unique()}
+    return records, chart_windows
+
+
 class IntradayScreener:
     def __init__(self):
-        self.ua = UserAgent()
         self.output_dir = "/home/zero/trading/intraday_output"
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(f"{self.output_dir}/charts", exist_ok=True)
+        self.db = get_db("intraday_data.db")
         self.init_database()
+        self.calendar = get_calendar()
+        self.market_data = MarketDataClient(store=BarStore("intraday_data.db"), calendar=self.calendar)
+        self.universe = UniverseLoader("intraday_data.db")
+        self.summary = DailySummary("intraday_data.db")
+        self.indicator_state = IndicatorStateStore("intraday_data.db")
+        self._bars = {}
+        self._chart_data = {}
+        self.chart_stats = {"total": 0, "reused": 0}
+        # Run-scoped market context, fetched once and shared by all worker threads
+        self._market_context = None
+        self._market_context_loaded = False
+        self._market_context_lock = threading.Lock()
         
     def init_database(self):
         """Initialize SQLite database with schema for intraday setups"""
         try:
-            conn = sqlite3.connect("intraday_data.db")
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.db.execute('''
             CREATE TABLE IF NOT EXISTS intraday_setups (
                 Symbol TEXT,
                 Date TEXT,
@@ -81,11 +145,25 @@ class IntradayScreener:
                 Pattern TEXT,
                 Notes TEXT,
                 Timestamp TEXT,
+                Hourly_Confirmation TEXT,
+                Hourly_RSI REAL,
                 PRIMARY KEY (Symbol, Date, Setup_Type)
             )
             ''')
             
-            cursor.execute('''
+            # Databases created before hourly confirmation lack its columns
+            _, columns = self.db.query("PRAGMA table_info(intraday_setups)")
+            existing = {column[1] for column in columns}
+            for column, column_type in [("Hourly_Confirmation", "TEXT"), ("Hourly_RSI", "REAL")]:
+                if column not in existing:
+                    self.db.execute(f"ALTER TABLE intraday_setups ADD COLUMN {column} {column_type}")
+            
+            # The primary key already covers Symbol lookups; reports and backtests filter by Date
+            self.db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_intraday_setups_date ON intraday_setups (Date)
+            ''')
+            
+            self.db.execute('''
             CREATE TABLE IF NOT EXISTS market_sentiment (
                 Date TEXT PRIMARY KEY,
                 Overall_Sentiment TEXT,
@@ -100,8 +178,6 @@ class IntradayScreener:
             )
             ''')
             
-            conn.commit()
-            conn.close()
             logging.info("Intraday database initialized successfully")
         except Exception as e:
             logging.error(f"Database initialization error: {e}")
@@ -109,31 +185,20 @@ class IntradayScreener:
     def get_market_data(self):
         """Get market sentiment data for context"""
         try:
-            # Check if today is a weekend and adjust date accordingly
+            # Outside a session the latest data is from the last trading session
             today = datetime.now()
-            days_to_subtract = 0
-            
-            # If today is Sunday, get Friday's data (subtract 2 days)
-            if today.weekday() == 6:  # Sunday
-                days_to_subtract = 2
-            # If today is Saturday, get Friday's data (subtract 1 day)
-            elif today.weekday() == 5:  # Saturday
-                days_to_subtract = 1
-                
-            if days_to_subtract > 0:
-                logging.info(f"Weekend detected ({today.strftime('%A')}). Getting data from {days_to_subtract} day(s) ago.")
+            latest_session = self.calendar.latest_session(today)
+            if latest_session != today.date():
+                logging.info(f"No session yet today ({today.strftime('%A')}). Getting data from {latest_session}.")
             
             # Get Nifty index data
-            nifty = yf.Ticker("^NSEI")
-            nifty_data = nifty.history(period="10d")
+            nifty_data = self.get_bars("^NSEI", "10d", "1d")
             
             # Get India VIX data
-            india_vix = yf.Ticker("^INDIAVIX")
-            vix_data = india_vix.history(period="5d")
+            vix_data = self.get_bars("^INDIAVIX", "5d", "1d")
             
             # Get Bank Nifty data for sector strength
-            bank_nifty = yf.Ticker("^NSEBANK")
-            bank_nifty_data = bank_nifty.history(period="5d")
+            bank_nifty_data = self.get_bars("^NSEBANK", "5d", "1d")
             
             # Check if we have data
             if nifty_data.empty or vix_data.empty:
@@ -150,8 +215,8 @@ class IntradayScreener:
             vix_change = ((vix_data['Close'].iloc[-1] / vix_data['Close'].iloc[-2]) - 1) * 100
             
             # Simple trend analysis
-            short_ma = nifty_data['Close'].rolling(5).mean()[-1]
-            long_ma = nifty_data['Close'].rolling(10).mean()[-1]
+            short_ma = nifty_data['Close'].rolling(5).mean().iloc[-1]
+            long_ma = nifty_data['Close'].rolling(10).mean().iloc[-1]
             trend = "Bullish" if short_ma > long_ma else "Bearish"
             
             # Volume analysis
@@ -160,11 +225,11 @@ class IntradayScreener:
             # Simulate advancing/declining stocks (would need proper NSE data)
             adv_count = 0
             dec_count = 0
+            breadth_data = self._bars.get(("2d", "1d")) or self.market_data.fetch(NSE_SYMBOLS[:20], period="2d")
             for symbol in NSE_SYMBOLS[:20]:  # Use subset for speed
                 try:
-                    stock = yf.Ticker(f"{symbol}.NS")
-                    data = stock.history(period="2d")
-                    if len(data) >= 2:
+                    data = breadth_data.get(symbol)
+                    if data is not None and len(data) >= 2:
                         if data['Close'].iloc[-1] > data['Close'].iloc[-2]:
                             adv_count += 1
                         else:
@@ -196,16 +261,34 @@ class IntradayScreener:
             logging.error(f"Error getting market data: {e}")
             return None
 
+    def get_market_context(self):
+        """Return the run-scoped market snapshot, fetching it only on first use"""
+        with self._market_context_lock:
+            if self._market_context_loaded:
+                logging.info("Market context cache hit")
+                return self._market_context
+                
+            logging.info("Market context cache miss, fetching market data")
+            market_data = self.get_market_data()
+            
+            # Read-only view so worker threads cannot mutate the shared snapshot
+            self._market_context = MappingProxyType(market_data) if market_data else None
+            self._market_context_loaded = True
+            return self._market_context
+
+    def reset_market_context(self):
+        """Drop the cached market snapshot so the next run fetches a fresh one"""
+        with self._market_context_lock:
+            self._market_context = None
+            self._market_context_loaded = False
+
     def save_market_sentiment(self, data):
         """Save market sentiment data to database"""
         if not data:
             return
             
         try:
-            conn = sqlite3.connect("intraday_data.db")
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.db.execute('''
             INSERT OR REPLACE INTO market_sentiment
             (Date, Overall_Sentiment, Index_Movement, Advancing_Count, Declining_Count,
             New_High_Count, New_Low_Count, Volume_Change, VIX, Notes)
@@ -222,424 +305,56 @@ class IntradayScreener:
                 data["VIX"],
                 data["Notes"]
             ))
-            
-            conn.commit()
-            conn.close()
         except Exception as e:
             logging.error(f"Error saving market sentiment: {e}")
 
-    def get_stock_data(self, symbol, period="60d", interval="1d"):
-        """Get historical data with multiple timeframes for analysis"""
-        try:
-            # Check if today is a weekend and adjust the requested data accordingly
-            today = datetime.now()
-            is_weekend = today.weekday() >= 5  # 5 is Saturday, 6 is Sunday
-            
-            if is_weekend:
-                day_name = "Saturday" if today.weekday() == 5 else "Sunday"
-                logging.info(f"Weekend detected ({day_name}). Ensuring we get the last trading day's data.")
-                
-                # Use a period parameter to make sure we get the latest available data
-                # No need to specify dates, Yahoo Finance will return the latest available data
-                ticker = yf.Ticker(f"{symbol}.NS")
-                data = ticker.history(period=period, interval=interval)
-                
-                if not data.empty:
-                    last_date = data.index[-1].strftime("%Y-%m-%d")
-                    logging.info(f"Latest data for {symbol} is from: {last_date}")
-            else:
-                # Normal data fetch on weekdays
-                ticker = yf.Ticker(f"{symbol}.NS")
-                data = ticker.history(period=period, interval=interval)
-            
-            if data.empty:
-                logging.warning(f"No data returned for {symbol}")
-                return None
-                
-            # Get alternative timeframe for multi-timeframe analysis
-            if interval == "1d":
-                alt_data = ticker.history(period="10d", interval="1h")
-            else:
-                alt_data = ticker.history(period="20d", interval="1d")
-                
-            return {
-                "main_data": data,
-                "alt_data": alt_data
-            }
-        except Exception as e:
-            logging.error(f"Error fetching data for {symbol}: {e}")
-            return None
-
-    def calculate_technical_indicators(self, data):
-        """Calculate comprehensive technical indicators"""
-        if data is None or data["main_data"].empty:
-            return None
-            
-        df = data["main_data"].copy()
-        
-        # Basic price data
-        df['BodySize'] = abs(df['Close'] - df['Open'])
-        df['CandleSize'] = df['High'] - df['Low']
-        df['BodyToCandle'] = df['BodySize'] / df['CandleSize']
-        df['UpperWick'] = df.apply(lambda x: x['High'] - x['Close'] if x['Close'] > x['Open'] else x['High'] - x['Open'], axis=1)
-        df['LowerWick'] = df.apply(lambda x: x['Open'] - x['Low'] if x['Close'] > x['Open'] else x['Close'] - x['Low'], axis=1)
-        
-        # Moving Averages
-        df['SMA5'] = df['Close'].rolling(window=5).mean()
-        df['SMA20'] = df['Close'].rolling(window=20).mean()
-        df['SMA50'] = df['Close'].rolling(window=50).mean()
-        df['EMA9'] = ta.trend.ema_indicator(df['Close'], window=9)
-        df['EMA21'] = ta.trend.ema_indicator(df['Close'], window=21)
-        
-        # Volume analysis
-        df['VolSMA20'] = df['Volume'].rolling(window=20).mean()
-        df['VolRatio'] = df['Volume'] / df['VolSMA20']
-        
-        # Trend indicators
-        df['ADX'] = ta.trend.adx(df['High'], df['Low'], df['Close'], window=14)
-        df['ATR'] = ta.volatility.average_true_range(df['High'], df['Low'], df['Close'], window=14)
-        df['ATR%'] = df['ATR'] / df['Close'] * 100
-        
-        # Momentum indicators
-        df['RSI'] = ta.momentum.rsi(df['Close'], window=14)
-        macd = ta.trend.MACD(df['Close'])
-        df['MACD'] = macd.macd()
-        df['MACD_Signal'] = macd.macd_signal()
-        df['MACD_Hist'] = macd.macd_diff()
-        
-        # Volatility indicators
-        bollinger = ta.volatility.BollingerBands(df['Close'])
-        df['BB_Upper'] = bollinger.bollinger_hband()
-        df['BB_Lower'] = bollinger.bollinger_lband()
-        df['BB_Width'] = (df['BB_Upper'] - df['BB_Lower']) / df['SMA20']
-        
-        # Support/Resistance identification
-        df['PrevHigh'] = df['High'].rolling(window=10).max().shift(1)
-        df['PrevLow'] = df['Low'].rolling(window=10).min().shift(1)
-        
-        # Pattern identification
-        df['Engulfing'] = (
-            ((df['Close'] > df['Open']) & 
-             (df['Open'].shift(1) > df['Close'].shift(1)) &
-             (df['Open'] < df['Close'].shift(1)) &
-             (df['Close'] > df['Open'].shift(1)))
-        ).astype(int)
-        
-        df['InsideBar'] = (
-            (df['High'] < df['High'].shift(1)) &
-            (df['Low'] > df['Low'].shift(1))
-        ).astype(int)
-        
-        df['OutsideBar'] = (
-            (df['High'] > df['High'].shift(1)) &
-            (df['Low'] < df['Low'].shift(1))
-        ).astype(int)
-        
-        # Breakout signals
-        df['BreakoutLevel'] = df['High'].rolling(window=5).max().shift(1)
-        df['BreakdownLevel'] = df['Low'].rolling(window=5).min().shift(1)
-        
-        # Gap analysis
-        df['Gap'] = df['Open'] - df['Close'].shift(1)
-        df['GapPercent'] = df['Gap'] / df['Close'].shift(1) * 100
-                
-        return df
+    def get_bars(self, symbol, period, interval):
+        """Return prefetched bars for a symbol, falling back to a single-symbol fetch"""
+        frames = self._bars.get((period, interval))
+        if frames is None:
+            frames = self.market_data.fetch([symbol], period=period, interval=interval)
+        return frames.get(symbol, pd.DataFrame())
 
-    def identify_patterns(self, df, market_sentiment):
-        """Identify high-probability intraday patterns for next day"""
-        if df is None or len(df) < 30:
-            return None
-            
-        latest = df.iloc[-1]
-        second_last = df.iloc[-2] if len(df) > 1 else None
-        
-        # Initialize result dictionary
-        patterns = []
-        
-        # Only look at the most recent data for patterns
-        recent_df = df.iloc[-20:]
-        latest_date = recent_df.index[-1].strftime("%Y-%m-%d")
-        
-        # Market context
-        market_trend = market_sentiment.get("Overall_Sentiment", "Neutral") if market_sentiment else "Neutral"
-        
-        # 1. Bullish patterns
-        if market_trend in ["Bullish", "Neutral"]:
-            # Bullish engulfing at support
-            if (latest['Engulfing'] == 1 and 
-                latest['Low'] <= latest['PrevLow'] * 1.01 and 
-                latest['VolRatio'] > 1.0):
-                patterns.append({
-                    "Setup_Type": "Bullish",
-                    "Signal": "Engulfing at Support",
-                    "Confidence": "High" if latest['VolRatio'] > 1.5 and latest['ADX'] > 20 else "Medium",
-                    "Entry": round(latest['Close'] * 1.005, 2),  # Entry slightly above close
-                    "Stop_Loss": round(min(latest['Low'], latest['Low'] - latest['ATR'] * 0.5), 2),
-                    "Target1": round(latest['Close'] + latest['ATR'] * 1.5, 2),
-                    "Target2": round(latest['Close'] + latest['ATR'] * 2.5, 2),
-                    "Pattern": "Bullish Engulfing",
-                    "Notes": "Wait for breakout above day's high"
-                })
-                
-            # Pullback to moving average in uptrend
-            if (latest['Close'] > latest['SMA20'] > latest['SMA50'] and
-                latest['Low'] <= latest['EMA21'] * 1.01 and
-                latest['Low'] > latest['EMA21'] * 0.98 and
-                latest['RSI'] > 40):
-                patterns.append({
-                    "Setup_Type": "Bullish",
-                    "Signal": "MA Pullback",
-                    "Confidence": "High" if latest['ADX'] > 25 else "Medium",
-                    "Entry": round(latest['Close'] * 1.01, 2),
-                    "Stop_Loss": round(min(latest['Low'], latest['EMA21'] * 0.97), 2),
-                    "Target1": round(latest['Close'] + latest['ATR'] * 1.5, 2),
-                    "Target2": round(latest['Close'] + latest['ATR'] * 2.5, 2),
-                    "Pattern": "EMA21 Support Bounce",
-                    "Notes": "Strong trending setup"
-                })
-                
-            # NR4 (Narrow Range) pattern with good volume
-            if len(recent_df) >= 5:
-                last_4_ranges = [day['High'] - day['Low'] for _, day in recent_df.iloc[-5:-1].iterrows()]
-                current_range = latest['High'] - latest['Low']
-                if current_range < min(last_4_ranges) and latest['VolRatio'] > 0.8:
-                    patterns.append({
-                        "Setup_Type": "Bullish",
-                        "Signal": "NR4 Breakout",
-                        "Confidence": "Medium",
-                        "Entry": round(latest['High'] * 1.005, 2),
-                        "Stop_Loss": round(latest['Low'] * 0.995, 2),
-                        "Target1": round(latest['High'] + (latest['High'] - latest['Low']) * 1.5, 2),
-                        "Target2": round(latest['High'] + (latest['High'] - latest['Low']) * 2.5, 2),
-                        "Pattern": "Narrow Range",
-                        "Notes": "Explosive move potential"
-                    })
-        
-        # 2. Bearish patterns
-        if market_trend in ["Bearish", "Neutral"]:
-            # Bearish engulfing at resistance
-            if (latest['Close'] < latest['Open'] and
-                latest['High'] >= latest['PrevHigh'] * 0.99 and
-                latest['Open'] > latest['Close'].shift(1) and
-                latest['Close'] < latest['Open'].shift(1) and
-                latest['VolRatio'] > 1.0):
-                patterns.append({
-                    "Setup_Type": "Bearish",
-                    "Signal": "Engulfing at Resistance",
-                    "Confidence": "High" if latest['VolRatio'] > 1.5 and latest['ADX'] > 20 else "Medium",
-                    "Entry": round(latest['Close'] * 0.995, 2),  # Entry slightly below close
-                    "Stop_Loss": round(max(latest['High'], latest['High'] + latest['ATR'] * 0.5), 2),
-                    "Target1": round(latest['Close'] - latest['ATR'] * 1.5, 2),
-                    "Target2": round(latest['Close'] - latest['ATR'] * 2.5, 2),
-                    "Pattern": "Bearish Engulfing",
-                    "Notes": "Wait for breakdown below day's low"
-                })
-                
-            # Failed breakout with rejection
-            if (latest['High'] > latest['BreakoutLevel'] and
-                latest['Close'] < latest['BreakoutLevel'] and
-                latest['VolRatio'] > 1.2):
-                patterns.append({
-                    "Setup_Type": "Bearish",
-                    "Signal": "Failed Breakout",
-                    "Confidence": "High" if latest['UpperWick'] > latest['BodySize'] * 1.5 else "Medium",
-                    "Entry": round(latest['Low'] * 0.995, 2),
-                    "Stop_Loss": round(latest['High'] * 1.005, 2),
-                    "Target1": round(latest['Close'] - latest['ATR'] * 1.5, 2),
-                    "Target2": round(latest['Close'] - latest['ATR'] * 2.5, 2),
-                    "Pattern": "Failed Breakout",
-                    "Notes": "Watch for high volume rejection"
-                })
-        
-        # 3. Range-bound plays
-        # Inside bar pattern for range breakout
-        if latest['InsideBar'] == 1 and latest['VolRatio'] < 0.8:
-            # Bullish bias if close in upper half
-            if latest['Close'] > (latest['High'] + latest['Low']) / 2:
-                patterns.append({
-                    "Setup_Type": "Range",
-                    "Signal": "Inside Bar Breakout",
-                    "Confidence": "Medium",
-                    "Entry": round(latest['High'] * 1.005, 2),
-                    "Stop_Loss": round(latest['Low'] * 0.995, 2),
-                    "Target1": round(latest['High'] + (latest['High'] - latest['Low']), 2),
-                    "Target2": round(latest['High'] + (latest['High'] - latest['Low']) * 1.5, 2),
-                    "Pattern": "Inside Bar",
-                    "Notes": "Wait for mother bar high break"
-                })
-            # Bearish bias if close in lower half
-            else:
-                patterns.append({
-                    "Setup_Type": "Range",
-                    "Signal": "Inside Bar Breakdown",
-                    "Confidence": "Medium",
-                    "Entry": round(latest['Low'] * 0.995, 2),
-                    "Stop_Loss": round(latest['High'] * 1.005, 2),
-                    "Target1": round(latest['Low'] - (latest['High'] - latest['Low']), 2),
-                    "Target2": round(latest['Low'] - (latest['High'] - latest['Low']) * 1.5, 2),
-                    "Pattern": "Inside Bar",
-                    "Notes": "Wait for mother bar low break"
-                })
-        
-        # 4. Momentum plays
-        # Strong momentum continuation with pullback
-        if (latest['Close'] > latest['Open'] and
-            latest['Close'] > latest['SMA5'] > latest['SMA20'] and
-            latest['RSI'] < 70 and latest['RSI'] > 40 and
-            latest['MACD'] > latest['MACD_Signal']):
-            patterns.append({
-                "Setup_Type": "Momentum",
-                "Signal": "Bull Momentum",
-                "Confidence": "High" if latest['VolRatio'] > 1.2 and latest['ADX'] > 25 else "Medium",
-                "Entry": round(latest['Close'] * 1.01, 2),
-                "Stop_Loss": round(min(latest['Low'], latest['SMA5'] * 0.98), 2),
-                "Target1": round(latest['Close'] * 1.02, 2),
-                "Target2": round(latest['Close'] * 1.04, 2),
-                "Pattern": "Momentum Continuation",
-                "Notes": "Strong trend continuation setup"
-            })
-        
-        # Enhance patterns with additional metrics
-        for pattern in patterns:
-            pattern["Symbol"] = df.index.name if df.index.name else "Unknown"
-            pattern["Date"] = latest_date
-            pattern["Risk_Reward"] = round((pattern["Target1"] - pattern["Entry"]) / (pattern["Entry"] - pattern["Stop_Loss"]), 2)
-            pattern["Volume_Ratio"] = round(latest['VolRatio'], 2)
-            pattern["Trend_Strength"] = "Strong" if latest['ADX'] > 25 else "Moderate" if latest['ADX'] > 20 else "Weak"
-            pattern["Support"] = round(latest['PrevLow'], 2)
-            pattern["Resistance"] = round(latest['PrevHigh'], 2)
-            pattern["ADX"] = round(latest['ADX'], 2)
-            pattern["RSI"] = round(latest['RSI'], 2)
-            pattern["MACD_Signal"] = "Bullish" if latest['MACD'] > latest['MACD_Signal'] else "Bearish"
-            pattern["Volatility"] = round(latest['ATR%'], 2)
-            pattern["Risk_Factor"] = round(abs(pattern["Entry"] - pattern["Stop_Loss"]) / latest['Close'] * 100, 2)
-            pattern["Expected_Movement"] = round(latest['ATR'] * 1.5, 2)
-            pattern["Timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        return patterns
-
-    def create_chart(self, symbol, data, patterns=None):
-        """Create a chart for visual confirmation"""
-
-        if data is None or data.empty:
-            return False
-            
+    def get_hourly_data(self, symbols):
+        """Fetch hourly bars for multi-timeframe confirmation, returning {symbol: DataFrame}"""
         try:
-            df = data.copy()
-            
-            # Create figure and axis
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [3, 1]})
-            fig.suptitle(f"{symbol} - Technical Analysis Chart", fontsize=14)
-            
-            # Plot candlesticks
-            width = 0.6
-            width2 = 0.05
-            up = df[df['Close'] >= df['Open']]
-            down = df[df['Close'] < df['Open']]
-            
-            # Plot up candles
-            ax1.bar(up.index, up['Close'] - up['Open'], width, bottom=up['Open'], color='green', alpha=0.6)
-            ax1.bar(up.index, up['High'] - up['Close'], width2, bottom=up['Close'], color='green', alpha=0.6)
-            ax1.bar(up.index, up['Open'] - up['Low'], width2, bottom=up['Low'], color='green', alpha=0.6)
-            
-            # Plot down candles
-            ax1.bar(down.index, down['Open'] - down['Close'], width, bottom=down['Close'], color='red', alpha=0.6)
-            ax1.bar(down.index, down['High'] - down['Open'], width2, bottom=down['Open'], color='red', alpha=0.6)
-            ax1.bar(down.index, down['Close'] - down['Low'], width2, bottom=down['Low'], color='red', alpha=0.6)
-            
-            # Plot moving averages
-            ax1.plot(df.index, df['SMA20'], color='blue', linestyle='-', linewidth=1.0, label='SMA20')
-            ax1.plot(df.index, df['EMA9'], color='red', linestyle='-', linewidth=1.0, label='EMA9')
-            ax1.plot(df.index, df['EMA21'], color='green', linestyle='--', linewidth=1.0, label='EMA21')
-            
-            # Plot bollinger bands
-            ax1.plot(df.index, df['BB_Upper'], color='gray', linestyle='--', linewidth=0.5)
-            ax1.plot(df.index, df['BB_Lower'], color='gray', linestyle='--', linewidth=0.5)
-            
-            # Plot Volume
-            ax2.bar(up.index, up['Volume'], width, color='green', alpha=0.6)
-            ax2.bar(down.index, down['Volume'], width, color='red', alpha=0.6)
-            ax2.plot(df.index, df['VolSMA20'], color='blue', linestyle='-', label='Volume SMA20')
-            
-            # Highlight patterns if provided
-            if patterns:
-                for pattern in patterns:
-                    # Mark entry, stop and target levels
-                    last_idx = df.index[-1]
-                    ax1.axhline(y=pattern['Entry'], color='blue', linestyle='-', alpha=0.7, linewidth=1)
-                    ax1.axhline(y=pattern['Stop_Loss'], color='red', linestyle='-', alpha=0.7, linewidth=1)
-                    ax1.axhline(y=pattern['Target1'], color='green', linestyle='--', alpha=0.7, linewidth=1)
-                    
-                    # Add labels
-                    ax1.text(df.index[-int(len(df)*0.1)], pattern['Entry'], 'Entry', fontsize=8, color='blue')
-                    ax1.text(df.index[-int(len(df)*0.1)], pattern['Stop_Loss'], 'Stop', fontsize=8, color='red')
-                    ax1.text(df.index[-int(len(df)*0.1)], pattern['Target1'], 'Target', fontsize=8, color='green')
-                    
-                    # Add pattern info
-                    fig.text(0.02, 0.02, f"Setup: {pattern['Signal']} ({pattern['Confidence']}) - R:R {pattern['Risk_Reward']}", fontsize=10)
-            
-            # Add legends and labels
-            ax1.legend(loc='upper left', fontsize=8)
-            ax1.set_ylabel('Price')
-            ax1.grid(True, alpha=0.3)
-            
-            ax2.set_ylabel('Volume')
-            ax2.grid(True, alpha=0.3)
-            
-            # Format dates on x-axis
-            if len(df) > 30:
-                plt.xticks(rotation=45)
-                
-            plt.tight_layout()
-            
-            # Save chart
-            chart_path = f"{self.output_dir}/charts/{symbol}_chart.png"
-            plt.savefig(chart_path)
-            plt.close(fig)
-            plt.close()
-            
-            return chart_path
+            return self.market_data.fetch(symbols, period=HOURLY_PERIOD, interval=HOURLY_INTERVAL)
         except Exception as e:
-            logging.error(f"Error creating chart for {symbol}: {e}")
-            return False
+            logging.error(f"Error fetching hourly data for {', '.join(symbols)}: {e}")
+            return {}
 
-    def process_symbol(self, symbol):
-        """Process a single symbol for intraday setups"""
-        try:
-            logging.info(f"Processing {symbol} for intraday setups")
-            
-            # Get stock data
-            data_dict = self.get_stock_data(symbol)
-            if not data_dict:
-                return None
-                
-            # Calculate indicators
-            df = self.calculate_technical_indicators(data_dict)
-            if df is None:
-                return None
-                
-            # Set the symbol as the index name for reference
-            df.index.name = symbol
-            
-            # Get market sentiment
-            market_sentiment = self.get_market_data()
-            
-            # Identify patterns
-            patterns = self.identify_patterns(df, market_sentiment)
-            if not patterns:
-                return None
-                
-            # Create chart for visual confirmation
-            chart_path = self.create_chart(symbol, df.iloc[-30:], patterns[0] if patterns else None)
-            
-            # Return identified patterns
-            for pattern in patterns:
-                pattern["Chart"] = chart_path if chart_path else ""
-                
-            return patterns
-        except Exception as e:
-            logging.error(f"Error processing {symbol}: {e}")
-            return None
+    def confirm_hourly(self, setups):
+        """Fetch hourly bars for the symbols with daily setups and keep the setups they confirm"""
+        if not setups:
+            return setups
+        symbols = list(dict.fromkeys(setup["Symbol"] for setup in setups))
+        confirmed = confirm_setups(pd.DataFrame(setups), self.get_hourly_data(symbols)).to_dict("records")
+        if len(confirmed) < len(setups):
+            logging.info(f"Hourly confirmation rejected {len(setups) - len(confirmed)} of {len(setups)} setups")
+        return confirmed
+
+    def render_top_charts(self, ranked_setups, top_n=15, max_workers=4):
+        """Render charts in a process pool for the symbols that make the report's top setups
+        
+        Charts whose bars and setup levels are unchanged since the last run are reused.
+        """
+        jobs = []
+        for setup in ranked_setups[:top_n]:
+            symbol = setup["Symbol"]
+            if symbol not in self._chart_data or any(job[0] == symbol for job in jobs):
+                continue
+            # Overlay the symbol's first setup, as the per-symbol screen did
+            data, pattern = self._chart_data[symbol]
+            jobs.append(chart_job(symbol, data, pattern, f"{self.output_dir}/charts/{symbol}_chart.png"))
+        
+        start_time = time.time()
+        chart_paths, reused = render_charts(jobs, max_workers=max_workers)
+        self.chart_stats = {"total": len(jobs), "reused": reused}
+        logging.info(f"Prepared {sum(1 for path in chart_paths.values() if path)} charts ({reused} reused) in {time.time() - start_time:.1f}s")
+        
+        for setup in ranked_setups:
+            setup["Chart"] = chart_paths.get(setup["Symbol"]) or ""
+        return chart_paths
 
     def save_setups(self, all_setups):
         """Save identified setups to database"""
@@ -656,45 +371,16 @@ class IntradayScreener:
             return
             
         try:
-            conn = sqlite3.connect("intraday_data.db")
-            cursor = conn.cursor()
-            
-            for setup in flattened_setups:
-                cursor.execute('''
-                INSERT OR REPLACE INTO intraday_setups
-                (Symbol, Date, Setup_Type, Signal, Confidence, Entry, Stop_Loss, Target1, Target2, 
-                Risk_Reward, Volume_Ratio, Trend_Strength, Support, Resistance, ADX, RSI, 
-                MACD_Signal, Volatility, Risk_Factor, Expected_Movement, Pattern, Notes, Timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    setup["Symbol"],
-                    setup["Date"],
-                    setup["Setup_Type"],
-                    setup["Signal"],
-                    setup["Confidence"],
-                    setup["Entry"],
-                    setup["Stop_Loss"],
-                    setup["Target1"],
-                    setup["Target2"],
-                    setup["Risk_Reward"],
-                    setup["Volume_Ratio"],
-                    setup["Trend_Strength"],
-                    setup["Support"],
-                    setup["Resistance"],
-                    setup["ADX"],
-                    setup["RSI"],
-                    setup["MACD_Signal"],
-                    setup["Volatility"],
-                    setup["Risk_Factor"],
-                    setup["Expected_Movement"],
-                    setup["Pattern"],
-                    setup["Notes"],
-                    setup["Timestamp"]
-                ))
-            
-            conn.commit()
-            conn.close()
-            logging.info(f"Saved {len(flattened_setups)} intraday setups to database")
+            saved = self.db.executemany('''
+            INSERT OR REPLACE INTO intraday_setups
+            (Symbol, Date, Setup_Type, Signal, Confidence, Entry, Stop_Loss, Target1, Target2, 
+            Risk_Reward, Volume_Ratio, Trend_Strength, Support, Resistance, ADX, RSI, 
+            MACD_Signal, Volatility, Risk_Factor, Expected_Movement, Pattern, Notes, Timestamp,
+            Hourly_Confirmation, Hourly_RSI)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [tuple(setup[column] for column in SETUP_COLUMNS) for setup in flattened_setups])
+            
+            logging.info(f"Saved {saved} intraday setups to database")
         except Exception as e:
             logging.error(f"Error saving setups to database: {e}")
 
@@ -719,142 +405,42 @@ class IntradayScreener:
                                   reverse=True)
             
             # Limit to top 15 setups
-            top_setups = sorted_setups[:15]
+            top_n = 15
+            top_setups = sorted_setups[:top_n]
             
             # Create report header
             now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             today = datetime.now()
             
-            # Determine the next trading day
-            if today.weekday() == 4:  # Friday
-                next_trading_day = (today + timedelta(days=3)).strftime("%Y-%m-%d")  # Monday
-                trading_day_description = "Monday"
-            elif today.weekday() == 5:  # Saturday
-                next_trading_day = (today + timedelta(days=2)).strftime("%Y-%m-%d")  # Monday
-                trading_day_description = "Monday"
-            elif today.weekday() == 6:  # Sunday
-                next_trading_day = (today + timedelta(days=1)).strftime("%Y-%m-%d")  # Monday
-                trading_day_description = "tomorrow (Monday)"
-            else:
-                next_trading_day = (today + timedelta(days=1)).strftime("%Y-%m-%d")  # Tomorrow
-                trading_day_description = "tomorrow"
-            
-            # Determine the analyzed trading day (most recent one)
-            if today.weekday() == 5:  # Saturday
-                analyzed_trading_day = (today - timedelta(days=1)).strftime("%Y-%m-%d")  # Friday
-                analyzed_day_note = "Based on Friday's data"
-            elif today.weekday() == 6:  # Sunday
-                analyzed_trading_day = (today - timedelta(days=2)).strftime("%Y-%m-%d")  # Friday
-                analyzed_day_note = "Based on Friday's data"
-            else:
-                analyzed_trading_day = today.strftime("%Y-%m-%d")
-                analyzed_day_note = "Based on today's data"
+            # Setups are for the next session, from the data of the latest one
+            next_session = self.calendar.next_trading_session(today)
+            next_trading_day = next_session.strftime("%Y-%m-%d")
+            trading_day_description = session_label(next_session, today)
+            
+            analyzed_session = self.calendar.latest_session(today)
+            analyzed_trading_day = analyzed_session.strftime("%Y-%m-%d")
+            analyzed_day_note = f"Based on {session_label(analyzed_session, today, possessive=True)} data"
                 
-            # Get market sentiment
-            market_sentiment = self.get_market_data()
+            # Get market sentiment from the run-scoped snapshot
+            market_sentiment = self.get_market_context()
             sentiment_text = market_sentiment["Overall_Sentiment"] if market_sentiment else "Neutral"
             sentiment_date = market_sentiment["Date"] if market_sentiment else "Unknown"
             
-            html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Intraday Trading Setups for {trading_day_description} ({next_trading_day})</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .header {{ background-color: #f0f0f0; padding: 10px; border-radius: 5px; margin-bottom: 20px; }}
-                    .setup {{ border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; }}
-                    .high {{ border-left: 5px solid green; }}
-                    .medium {{ border-left: 5px solid orange; }}
-                    .bullish {{ background-color: rgba(0, 255, 0, 0.05); }}
-                    .bearish {{ background-color: rgba(255, 0, 0, 0.05); }}
-                    .range {{ background-color: rgba(0, 0, 255, 0.05); }}
-                    .momentum {{ background-color: rgba(255, 165, 0, 0.05); }}
-                    table {{ border-collapse: collapse; width: 100%; }}
-                    th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                    th {{ background-color: #f2f2f2; }}
-                    .chart {{ margin-top: 15px; text-align: center; }}
-                    .note {{ color: #666; font-style: italic; }}
-                    .rank {{ font-weight: bold; background-color: #f2f2f2; padding: 5px 10px; border-radius: 15px; margin-right: 10px; }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>Top 15 Intraday Trading Setups for {trading_day_description} ({next_trading_day})</h1>
-                    <p>Generated on: {now}</p>
-                    <p class="note">{analyzed_day_note} (Last market date: {sentiment_date})</p>
-                    <p>Market Sentiment: <strong>{sentiment_text}</strong></p>
-                    <p>Showing top 15 setups ranked by score</p>
-                </div>
-            """
-            
-            # Add each setup
-            for i, setup in enumerate(top_setups, 1):
-                confidence_class = "high" if setup["Confidence"] == "High" else "medium"
-                setup_class = setup["Setup_Type"].lower()
-                
-                html += f"""
-                <div class="setup {confidence_class} {setup_class}">
-                    <h2><span class="rank">#{i}</span> {setup["Symbol"]} - {setup["Signal"]} ({setup["Confidence"]}) - Score: {setup.get("Score", 0)}</h2>
-                    <p><strong>Pattern:</strong> {setup["Pattern"]}</p>
-                    <p><strong>Notes:</strong> {setup["Notes"]}</p>
-                    
-                    <table>
-                        <tr>
-                            <th>Entry</th>
-                            <th>Stop Loss</th>
-                            <th>Target 1</th>
-                            <th>Target 2</th>
-                            <th>Risk:Reward</th>
-                        </tr>
-                        <tr>
-                            <td>{setup["Entry"]}</td>
-                            <td>{setup["Stop_Loss"]}</td>
-                            <td>{setup["Target1"]}</td>
-                            <td>{setup["Target2"]}</td>
-                            <td>{setup["Risk_Reward"]}</td>
-                        </tr>
-                    </table>
-                    
-                    <table style="margin-top: 15px;">
-                        <tr>
-                            <th>ADX</th>
-                            <th>RSI</th>
-                            <th>Volume Ratio</th>
-                            <th>Trend Strength</th>
-                            <th>MACD Signal</th>
-                        </tr>
-                        <tr>
-                            <td>{setup["ADX"]}</td>
-                            <td>{setup["RSI"]}</td>
-                            <td>{setup["Volume_Ratio"]}</td>
-                            <td>{setup["Trend_Strength"]}</td>
-                            <td>{setup["MACD_Signal"]}</td>
-                        </tr>
-                    </table>
-                """
-                
-                # Add chart if available
-                if "Chart" in setup and setup["Chart"]:
-                    chart_filename = setup["Chart"].split("/")[-1]
-                    html += f"""
-                    <div class="chart">
-                        <img src="charts/{chart_filename}" alt="{setup["Symbol"]} Chart" style="max-width: 100%; height: auto;">
-                    </div>
-                    """
-                    
-                html += "</div>"
-                
-            # Close HTML
-            html += """
-            </body>
-            </html>
-            """
-            
-            # Save report
+            # Stream the report to disk one setup card at a time
             report_path = f"{self.output_dir}/intraday_setups_{next_trading_day.replace('-', '')}.html"
-            with open(report_path, "w") as f:
-                f.write(html)
+            with ReportWriter(report_path) as writer:
+                writer.write(SETUP_REPORT_HEADER,
+                             count=top_n,
+                             trading_day_description=trading_day_description,
+                             next_trading_day=next_trading_day,
+                             now=now,
+                             analyzed_day_note=analyzed_day_note,
+                             sentiment_date=sentiment_date,
+                             sentiment_text=sentiment_text,
+                             charts_reused=self.chart_stats["reused"],
+                             charts_total=self.chart_stats["total"])
+                writer.write_rows(SETUP_CARD, self._setup_cards(top_setups))
+                writer.write(DOCUMENT_FOOTER)
                 
             logging.info(f"Generated report saved to {report_path}")
             return report_path
@@ -862,6 +448,22 @@ class IntradayScreener:
             logging.error(f"Error generating report: {e}")
             return None
 
+    def _setup_cards(self, setups):
+        """Template fields for each ranked setup in the report"""
+        for rank, setup in enumerate(setups, 1):
+            chart_html = ""
+            if setup.get("Chart"):
+                chart_html = SETUP_CHART.render({"chart_filename": setup["Chart"].split("/")[-1],
+                                                 "Symbol": setup["Symbol"]})
+            yield {
+                **setup,
+                "rank": rank,
+                "Score": setup.get("Score", 0),
+                "confidence_class": "high" if setup["Confidence"] == "High" else "medium",
+                "setup_class": setup["Setup_Type"].lower(),
+                "chart_html": chart_html
+            }
+
     def rank_setups(self, all_setups):
         """Rank setups based on multiple factors"""
         if not all_setups:
@@ -875,98 +477,377 @@ class IntradayScreener:
         if not flattened_setups:
             return []
             
-        # Calculate score for each setup
-        for setup in flattened_setups:
-            # Base score from confidence
-            if setup["Confidence"] == "High":
-                setup["Score"] = 5
-            elif setup["Confidence"] == "Medium":
-                setup["Score"] = 3
-            else:
-                setup["Score"] = 1
-                
-            # Add points for good risk:reward
-            if setup["Risk_Reward"] >= 3:
-                setup["Score"] += 3
-            elif setup["Risk_Reward"] >= 2:
-                setup["Score"] += 2
-            elif setup["Risk_Reward"] >= 1.5:
-                setup["Score"] += 1
-                
-            # Add points for trend alignment
-            if setup["Setup_Type"] == "Bullish" and setup["Trend_Strength"] == "Strong" and setup["MACD_Signal"] == "Bullish":
-                setup["Score"] += 2
-            elif setup["Setup_Type"] == "Bearish" and setup["Trend_Strength"] == "Strong" and setup["MACD_Signal"] == "Bearish":
-                setup["Score"] += 2
-                
-            # Add points for good volume
-            if setup["Volume_Ratio"] >= 1.5:
-                setup["Score"] += 2
-            elif setup["Volume_Ratio"] >= 1.0:
-                setup["Score"] += 1
-                
-            # Adjust for extreme RSI
-            if setup["Setup_Type"] == "Bullish" and setup["RSI"] < 30:
-                setup["Score"] += 1
-            elif setup["Setup_Type"] == "Bearish" and setup["RSI"] > 70:
-                setup["Score"] += 1
-                
-            # Penalize for high risk factor
-            if setup["Risk_Factor"] > 3.0:
-                setup["Score"] -= 2
-            elif setup["Risk_Factor"] > 2.0:
-                setup["Score"] -= 1
+        # Score every setup at once: confidence, risk:reward, trend alignment, volume, RSI, risk factor
+        scores = score_setups(pd.DataFrame(flattened_setups))
+        for setup, score in zip(flattened_setups, scores):
+            setup["Score"] = int(score)
         
         # Sort by score
         return sorted(flattened_setups, key=lambda x: x["Score"], reverse=True)
 
-    def run(self):
-        """Run the screener to find next-day intraday setups"""
+    def historical_sentiment(self, frames, nifty_data):
+        """Rebuild the daily market sentiment label for every historical date"""
+        if nifty_data is None or nifty_data.empty:
+            return pd.Series(dtype=object)
+            
+        nifty_close = nifty_data['Close']
+        nifty_change = nifty_close.pct_change() * 100
+        
+        # Same breadth sample as get_market_data, counted for each date
+        breadth = {symbol: frames[symbol]['Close'] for symbol in NSE_SYMBOLS[:20] if symbol in frames}
+        closes = pd.DataFrame(breadth).reindex(nifty_close.index)
+        prev_closes = closes.shift(1)
+        both = closes.notna() & prev_closes.notna()
+        adv_count = (both & (closes > prev_closes)).sum(axis=1)
+        dec_count = both.sum(axis=1) - adv_count
+        
+        sentiment = np.select(
+            [(adv_count > dec_count) & (nifty_change > 0), (dec_count > adv_count) & (nifty_change < 0)],
+            ["Bullish", "Bearish"],
+            "Neutral"
+        )
+        return pd.Series(sentiment, index=nifty_close.index.strftime("%Y-%m-%d"))
+
+    def load_history(self, years, symbols):
+        """Daily bars for symbols and the market sentiment of every date, ({}, None) without data"""
+        frames = self.market_data.fetch(list(symbols) + ["^NSEI"], period=f"{years}y", interval="1d")
+        nifty_data = frames.pop("^NSEI", None)
+        if not frames:
+            return {}, None
+        return frames, self.historical_sentiment(frames, nifty_data)
+
+    def replay_history(self, years, symbols):
+        """Daily bars for symbols and every setup detected on them, (None, {}) without data"""
+        frames, sentiment = self.load_history(years, symbols)
+        if not frames:
+            return None, {}
+            
+        indicators = panel_to_frames(compute_panel_indicators(build_panel(frames)))
+        return detect_patterns(frames_to_long(indicators), sentiment), frames
+
+    def replay(self, years=3, symbols=None):
+        """Generate the setups the screener would have produced on every historical date
+        
+        Indicators are computed once over the full history. Every indicator only looks
+        backwards, so the row for a date uses only data available up to that date.
+        """
+        symbols = symbols or NSE_SYMBOLS
+        logging.info(f"Starting {years}-year historical replay for {len(symbols)} symbols")
+        start_time = time.time()
+        
+        setups, frames = self.replay_history(years, symbols)
+        if setups is None:
+            print("No historical data available for replay")
+            return None
+        
+        # Save all replayed setups for the backtester
+        self.save_setups([setups.to_dict("records")])
+        
+        elapsed = time.time() - start_time
+        trading_days = setups["Date"].nunique() if not setups.empty else 0
+        logging.info(f"Replay generated {len(setups)} setups over {trading_days} trading days in {elapsed:.1f}s")
+        print(f"Replay generated {len(setups)} setups over {trading_days} trading days in {elapsed:.1f}s")
+        
+        return setups
+
+    def portfolio_backtest(self, years=3, symbols=None, top_n=5, initial_capital=1_000_000.0, **limits):
+        """Simulate trading the top_n ranked replay setups each day as one portfolio
+        
+        Multi-year intraday bars are not available, so each setup is traded on the next
+        session's daily bar. limits (risk_per_trade, max_positions, ...) go to simulate.
+        """
+        symbols = symbols or NSE_SYMBOLS
+        logging.info(f"Starting {years}-year portfolio backtest for {len(symbols)} symbols")
+        start_time = time.time()
+        
+        setups, frames = self.replay_history(years, symbols)
+        if setups is None:
+            print("No historical data available for portfolio backtest")
+            return None
+            
+        stats, equity, drawdown, trades = backtest_portfolio(setups, frames, top_n=top_n,
+                                                             initial_capital=initial_capital, **limits)
+        elapsed = time.time() - start_time
+        logging.info(f"Portfolio backtest finished in {elapsed:.1f}s: {stats}")
+        
+        print("\n" + "="*50)
+        print(f"PORTFOLIO BACKTEST - top {top_n} setups per day over {years} year(s)")
+        print("="*50)
+        print(f"Sessions: {stats['sessions']} | Trades: {stats['trades']} | Skipped by limits: {stats['skipped']}")
+        print(f"Final equity: {stats['final_equity']:,.2f} ({stats['total_return']}%) | CAGR: {stats['cagr']}%")
+        print(f"Max drawdown: {stats['max_drawdown']}% | Sharpe: {stats['sharpe']}")
+        print(f"Win rate: {stats['win_rate']}% | Average R: {stats['avg_r']}")
+        print(f"Completed in {elapsed:.1f}s")
+        
+        if not equity.empty:
+            os.makedirs("backtest_results", exist_ok=True)
+            equity_path = f"backtest_results/portfolio_equity_{datetime.now().strftime('%Y%m%d')}.csv"
+            pd.DataFrame({"Equity": equity.round(2), "Drawdown": (drawdown * 100).round(2)}).to_csv(
+                equity_path, index_label="Date")
+            print(f"Equity curve saved to: {equity_path}")
+        
+        return stats
+
+    def parameter_sweep(self, years=3, grid=None, symbols=None, top_n=5, workers=None, executor="process", **limits):
+        """Rank pattern threshold sets by their portfolio backtest over the last years of history
+        
+        grid maps PATTERN_PARAMS names to candidate values (DEFAULT_GRID when omitted).
+        Indicators are computed once for the whole grid.
+        """
+        symbols = symbols or NSE_SYMBOLS
+        grid = grid or DEFAULT_GRID
+        start_time = time.time()
+        
+        frames, sentiment = self.load_history(years, symbols)
+        if not frames:
+            print("No historical data available for parameter sweep")
+            return None
+            
+        table = run_sweep(frames, grid, sentiment, top_n=top_n, workers=workers, executor=executor, **limits)
+        elapsed = time.time() - start_time
+        
+        print("\n" + "="*50)
+        print(f"PARAMETER SWEEP - {len(table)} parameter sets over {years} year(s) in {elapsed:.1f}s")
+        print("="*50)
+        print(table.head(10).to_string(index=False))
+        
+        if not table.empty:
+            os.makedirs("backtest_results", exist_ok=True)
+            table_path = f"backtest_results/parameter_sweep_{datetime.now().strftime('%Y%m%d')}.csv"
+            table.to_csv(table_path, index=False)
+            print(f"\nSweep results saved to: {table_path}")
+        
+        return table
+
+    def walk_forward(self, years=5, grid=None, symbols=None, train_sessions=TRAIN_SESSIONS,
+                     test_sessions=TEST_SESSIONS, top_n=5, workers=None, executor="process", **limits):
+        """Walk-forward optimize the pattern thresholds and report the out-of-sample results
+        
+        Each rolling window tunes grid (DEFAULT_GRID when omitted) on train_sessions and
+        trades the winning thresholds over the next test_sessions.
+        """
+        symbols = symbols or NSE_SYMBOLS
+        grid = grid or DEFAULT_GRID
+        start_time = time.time()
+        
+        frames, sentiment = self.load_history(years, symbols)
+        if not frames:
+            print("No historical data available for walk-forward optimization")
+            return None
+            
+        results, summary = run_walk_forward(frames, grid, sentiment, train_sessions=train_sessions,
+                                            test_sessions=test_sessions, top_n=top_n, workers=workers,
+                                            executor=executor, **limits)
+        if not results:
+            print(f"Not enough history for a {train_sessions}+{test_sessions} session walk-forward window")
+            return None
+        
+        print("\n" + "="*50)
+        print(f"WALK-FORWARD OPTIMIZATION - {summary['windows']} windows in {time.time() - start_time:.1f}s")
+        print("="*50)
+        print(f"Out-of-sample return: {summary['oos_return']}% (defaults: {summary['baseline_return']}%)")
+        print(f"Out-of-sample Sharpe: {summary['oos_sharpe']} (train: {summary['train_sharpe']}, "
+              f"defaults: {summary['baseline_sharpe']})")
+        print(f"Beat defaults in {summary['beat_baseline']} of {summary['windows']} windows | "
+              f"Efficiency: {summary['efficiency']}")
+        
+        self.generate_walk_forward_report(results, summary)
+        return results, summary
+
+    def _walk_forward_rows(self, results):
+        """Template fields for each walk-forward window"""
+        for result in results:
+            test = result["test"]
+            yield {
+                **result,
+                "params": ", ".join(f"{name}={value}" for name, value in result["params"].items()),
+                "train_sharpe": result["train"]["sharpe"],
+                "test_sharpe": test["sharpe"],
+                "sharpe_class": rate_class(test["sharpe"], 1, 0),
+                "test_return": test["total_return"],
+                "return_class": rate_class(test["total_return"], 0, result["baseline"]["total_return"]),
+                "baseline_return": result["baseline"]["total_return"],
+                "max_drawdown": test["max_drawdown"],
+                "trades": test["trades"],
+                "win_rate": test["win_rate"]
+            }
+
+    def generate_walk_forward_report(self, results, summary):
+        """Generate HTML walk-forward optimization report"""
+        try:
+            now = datetime.now().strftime("%Y-%m-%d")
+            os.makedirs("backtest_results", exist_ok=True)
+            report_path = f"backtest_results/walk_forward_report_{now}.html"
+            
+            with ReportWriter(report_path) as writer:
+                writer.write(BACKTEST_REPORT_HEADER, title="Walk-Forward Optimization Results", now=now)
+                writer.write(WALK_FORWARD_STATS,
+                             **dict(summary, efficiency=summary["efficiency"] if summary["efficiency"] is not None else "n/a"),
+                             oos_return_class=rate_class(summary["oos_return"], 0, summary["baseline_return"]),
+                             oos_sharpe_class=rate_class(summary["oos_sharpe"], 1, 0))
+                writer.write(WALK_FORWARD_TABLE_HEADER)
+                writer.write_rows(WALK_FORWARD_ROW, self._walk_forward_rows(results))
+                writer.write(TABLE_FOOTER)
+                writer.write(DOCUMENT_FOOTER)
+                
+            print(f"\nWalk-forward report saved to: {report_path}")
+        except Exception as e:
+            logging.error(f"Error generating walk-forward report: {e}")
+
+    def screen_universe(self, symbols, market_sentiment, fetch_workers=8, cpu_workers=None, executor="process",
+                        rules=None):
+        """Screen symbols through the fetch -> indicators/patterns -> SQLite pipeline
+        
+        Chunks are bulk-downloaded on I/O threads, screened in CPU workers and saved as
+        soon as each chunk finishes. Symbols that return no data are remembered as bad;
+        fetched bars refresh the daily summary and symbols failing the prefilter rules
+        are dropped before the CPU stage. Returns setups grouped per symbol.
+        """
+        market_sentiment = dict(market_sentiment) if market_sentiment else None
+        all_setups = []
+        shared = []
+        
+        def fetch(chunk):
+            empty = set()
+            frames = self.market_data.fetch(chunk, period="60d", interval="1d", empty=empty)
+            self.universe.record_fetch(chunk, frames, empty)
+            frames, dropped, summary = filter_frames(frames, rules)
+            self.summary.save(summary)
+            if dropped:
+                logging.info(f"Prefilter dropped {len(dropped)} symbols: {', '.join(dropped)}")
+            if executor != "process":
+                return frames
+            # Process workers attach to shared memory rather than unpickling DataFrames
+            bars = SharedBars.create(frames)
+            if bars is not None:
+                shared.append(bars)
+            return bars
+            
+        def save(chunk, result):
+            records, chart_windows = result
+            all_setups.extend(self.collect_setups(records, chart_windows))
+            
+        screen = screen_shared if executor == "process" else screen_frames
+        try:
+            stats = run_pipeline(chunked(symbols, SCREEN_CHUNK_SIZE), fetch,
+                                 partial(screen, market_sentiment=market_sentiment), save,
+                                 fetch_workers=fetch_workers, cpu_workers=cpu_workers, executor=executor)
+        finally:
+            for bars in shared:
+                bars.release()
+        logging.info(f"Screened {len(symbols)} symbols in {stats['elapsed']}s, {len(all_setups)} with setups")
+        return all_setups
+
+    def collect_setups(self, records, chart_windows):
+        """Confirm, save and keep chart windows for one batch of setup records, grouped per symbol"""
+        # Hourly bars are fetched only for the few symbols of this batch with daily setups
+        records = self.confirm_hourly(records)
+        by_symbol = {}
+        for setup in records:
+            by_symbol.setdefault(setup["Symbol"], []).append(setup)
+        for symbol, setups in by_symbol.items():
+            self._chart_data[symbol] = (chart_windows[symbol], setups[0])
+        self.save_setups(list(by_symbol.values()))
+        return list(by_symbol.values())
+
+    def screen_incremental(self, symbols, market_sentiment, rules=None, forming=False):
+        """Screen symbols from persisted indicator state, applying only bars added since the last run
+        
+        Bars come from the bar store, which downloads only the missing tail, and each
+        new bar advances every indicator in constant time. With forming, today's bar is
+        still in progress and is screened without being committed to the state.
+        """
+        start_time = time.time()
+        empty = set()
+        frames = self.market_data.fetch(symbols, period="60d", interval="1d", empty=empty)
+        self.universe.record_fetch(symbols, frames, empty)
+        frames, dropped, summary = filter_frames(frames, rules)
+        self.summary.save(summary)
+        if dropped:
+            logging.info(f"Prefilter dropped {len(dropped)} symbols: {', '.join(dropped)}")
+        
+        states = self.indicator_state.advance(frames, "1d", forming=forming)
+        setups = detect_patterns(states_to_long(states), market_sentiment, latest_only=True)
+        chart_windows = {symbol: states[symbol].frame() for symbol in setups["Symbol"].unique()}
+        all_setups = self.collect_setups(setups.to_dict("records"), chart_windows)
+        
+        logging.info(f"Incrementally screened {len(states)} symbols in {time.time() - start_time:.2f}s, "
+                     f"{len(all_setups)} with setups")
+        return all_setups
+
+    def live_scan(self, interval="5m", replay_path=None, speed=0, universe_path=None, max_batches=None):
+        """Scan the universe on every closed intraday bar until the session (or replay file) ends
+        
+        With replay_path, recorded bars stand in for the live feed and nothing is
+        persisted; otherwise Yahoo is polled after every bar close and the indicator
+        state is kept in SQLite between runs.
+        """
+        symbols = self.universe.load(universe_path, default=NSE_SYMBOLS)
+        if replay_path:
+            feed = ReplayFeed(replay_path, speed=speed)
+            scanner = LiveScanner("intraday_data.db", interval=interval, persist=False)
+        else:
+            scanner = LiveScanner("intraday_data.db", interval=interval, market_sentiment=self.get_market_context())
+            scanner.warm_up(self.market_data.fetch(symbols, period="5d", interval=interval))
+            feed = YahooPollingFeed(self.market_data, symbols, interval=interval, stop_at=MARKET_CLOSE)
+        
+        print(f"Live scanning {len(symbols)} symbols on {interval} bars{' from ' + replay_path if replay_path else ''}...")
+        stats = scanner.run(feed, max_batches=max_batches)
+        print(f"\nLive scan finished: {stats['setups']} new setups over {stats['batches']} bars, "
+              f"max latency {stats['max_latency_ms']} ms")
+        return stats
+
+    def run(self, workers=None, executor="process", universe_path=None, rules=None, incremental=False):
+        """Run the screener to find next-day intraday setups
+        
+        workers sets the number of CPU workers (default: all cores) and executor picks
+        'process' or 'thread' workers for the screening stage. universe_path loads the
+        symbols from a CSV/JSON list instead of NSE_SYMBOLS, and rules override the
+        prefilter thresholds (DEFAULT_RULES, where every rule is off).
+        incremental screens from persisted indicator state instead of recomputing
+        every indicator, which makes frequent re-screens during the session cheap.
+        """
         logging.info("Starting intraday screener")
         
-        # Check if today is a weekend
+        # Setups come from the latest session's data and are for the next session
         today = datetime.now()
-        is_weekend = today.weekday() >= 5  # 5 is Saturday, 6 is Sunday
+        trading_day = session_label(self.calendar.next_trading_session(today), today)
+        analyzed_day = session_label(self.calendar.latest_session(today), today, possessive=True)
+        message = f"Today is {today.strftime('%A')}. Analyzing {analyzed_day} data for {trading_day}'s trading."
+        logging.info(message)
+        if not self.calendar.is_session(today):
+            print(f"\n📅 {message}")
         
-        if is_weekend:
-            day_name = "Saturday" if today.weekday() == 5 else "Sunday"
-            logging.info(f"Today is {day_name}. Analyzing Friday's data for Monday's trading.")
-            print(f"\n📅 Today is {day_name}. Analyzing Friday's data for Monday's trading.")
-        else:
-            logging.info(f"Today is {today.strftime('%A')}. Analyzing today's data for tomorrow's trading.")
+        # Fetch market context once for the whole run
+        self._bars = self.market_data.fetch_frames(MARKET_INDICES + NSE_SYMBOLS[:20], CONTEXT_REQUESTS)
+        self.reset_market_context()
+        market_sentiment = self.get_market_context()
         
-        # Process each symbol
-        all_setups = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_symbol = {executor.submit(self.process_symbol, symbol): symbol for symbol in NSE_SYMBOLS}
-            for future in future_to_symbol:
-                try:
-                    setup = future.result()
-                    if setup:
-                        all_setups.append(setup)
-                        time.sleep(0.5)  # Small delay to avoid overloading
-                except Exception as e:
-                    logging.error(f"Error in thread: {e}")
+        # Fetch, screen and save the universe in overlapping stages
+        symbols = self.universe.load(universe_path, default=NSE_SYMBOLS)
         
-        # Save all setups to database
-        self.save_setups(all_setups)
+        # Drop symbols whose stored daily summary already rules them out, before any download
+        symbols, dropped = self.summary.prefilter(symbols, rules, store=self.market_data.store)
+        if dropped:
+            print(f"Prefilter skipped {len(dropped)} illiquid or untradeable symbols")
+        
+        if incremental:
+            # During market hours today's daily bar is still forming
+            forming = self.calendar.is_market_open(today)
+            all_setups = self.screen_incremental(symbols, market_sentiment, rules=rules, forming=forming)
+        else:
+            all_setups = self.screen_universe(symbols, market_sentiment, cpu_workers=workers, executor=executor,
+                                              rules=rules)
         
         # Rank setups
         ranked_setups = self.rank_setups(all_setups)
         
+        # Render charts for the report's top setups only
+        self.render_top_charts(ranked_setups)
+        
         # Generate report
         report_path = self.generate_report(all_setups)
         
-        # Determine trading day description
-        if today.weekday() == 4:  # Friday
-            trading_day = "Monday"
-        elif today.weekday() == 5:  # Saturday
-            trading_day = "Monday"
-        elif today.weekday() == 6:  # Sunday
-            trading_day = "Monday"
-        else:
-            trading_day = "tomorrow"
-        
         # Print summary
         if ranked_setups:
             print(f"\nTop Intraday Trading Setups for {trading_day}:")
@@ -987,71 +868,128 @@ class IntradayScreener:
 class IntradayBacktester:
     """Class to backtest the intraday setups"""
     
-    def __init__(self, db_path="intraday_data.db"):
+    def __init__(self, db_path="intraday_data.db", max_workers=4):
         self.db_path = db_path
+        self.max_workers = max_workers
+        self.store = BarStore(db_path)
+        self.calendar = get_calendar()
+        self.market_data = MarketDataClient()
+        self._next_day_cache = {}
         
     def get_historical_setups(self, days=30):
         """Get historical setups from database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Get setups from last N days
             from_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
             
-            cursor.execute('''
+            columns, setups = get_db(self.db_path).query('''
             SELECT * FROM intraday_setups
             WHERE Date >= ?
             ORDER BY Date DESC
             ''', (from_date,))
             
-            setups = cursor.fetchall()
-            
-            # Get column names
-            columns = [description[0] for description in cursor.description]
-            
             # Convert to list of dicts
-            setup_dicts = []
-            for setup in setups:
-                setup_dict = dict(zip(columns, setup))
-                setup_dicts.append(setup_dict)
-                
-            conn.close()
+            setup_dicts = [dict(zip(columns, setup)) for setup in setups]
             return setup_dicts
         except Exception as e:
             logging.error(f"Error getting historical setups: {e}")
             return []
             
+    def next_trading_day(self, date):
+        """Return the trading session after a setup date, skipping weekends and exchange holidays"""
+        return datetime.combine(self.calendar.next_session(date), dtime())
+        
+    def load_next_day_bars(self, next_day, symbols):
+        """Serve one trading day's bars from the disk cache, downloading only uncached symbols
+
+        Sessions older than Yahoo's 5m history go straight to daily bars. Once a session has
+        closed, symbols answered with daily bars only are recorded under DAILY_ONLY and
+        served from the stored daily bars on later runs.
+        """
+        session = next_day.strftime("%Y-%m-%d")
+        next_session = (next_day + timedelta(days=1)).strftime("%Y-%m-%d")
+        closed = self.calendar.last_closed_session()
+        
+        daily_only = self.store.fetched_symbols(DAILY_ONLY, session)
+        missing = sorted(symbol for symbol in self.store.missing_sessions(sorted(symbols), "5m", [session])
+                         if symbol not in daily_only)
+        if missing:
+            frames = {}
+            if (closed - next_day.date()).days < INTRADAY_HISTORY_DAYS:
+                frames = self.market_data.fetch(missing, period=None, interval="5m", start=session, end=next_session)
+                self.store.append(frames, "5m")
+            
+            fallback = [symbol for symbol in missing if symbol not in frames]
+            daily = {}
+            if fallback:
+                logging.warning(f"No intraday data for {len(fallback)} symbols on {session}, using daily data")
+                daily = self.market_data.fetch(fallback, period=None, interval="1d", start=session, end=next_session)
+                self.store.append(daily, "1d")
+                
+            # Only completed sessions are final, today's bars may still be arriving
+            if next_day.date() <= closed:
+                self.store.mark_fetched(sorted(frames), "5m", session)
+                self.store.mark_fetched(sorted(daily), DAILY_ONLY, session)
+                
+        intraday_bars = self.store.load_session(sorted(symbols), "5m", session, next_session)
+        daily_bars = self.store.load_session(sorted(symbols), "1d", session, next_session)
+        return session, len(missing), {
+            symbol: intraday_bars.get(symbol, daily_bars.get(symbol, pd.DataFrame())) for symbol in symbols
+        }
+        
+    def prefetch_next_day_data(self, setups):
+        """Fetch next-day bars deduplicated by (symbol, day), concurrently and through the disk cache"""
+        symbols_by_day = {}
+        for setup in setups:
+            try:
+                next_day = self.next_trading_day(setup["Date"])
+            except Exception as e:
+                logging.error(f"Invalid setup date {setup.get('Date')}: {e}")
+                continue
+            symbols_by_day.setdefault(next_day, set()).add(setup["Symbol"])
+            
+        downloaded = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.load_next_day_bars, next_day, symbols)
+                       for next_day, symbols in symbols_by_day.items()]
+            for future in as_completed(futures):
+                try:
+                    session, fetched, frames = future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching next-day bars: {e}")
+                    continue
+                downloaded += fetched
+                for symbol, data in frames.items():
+                    self._next_day_cache[(symbol, session)] = data
+                    
+        total = sum(len(symbols) for symbols in symbols_by_day.values())
+        logging.info(f"Next-day bars: {total - downloaded} of {total} (symbol, day) pairs served from cache")
+            
     def get_next_day_data(self, symbol, date):
         """Get next day's data for a symbol after a specific date"""
         try:
-            # Convert date string to datetime
-            setup_date = datetime.strptime(date, "%Y-%m-%d")
-            
-            # Calculate next trading day
-            next_day = setup_date + timedelta(days=1)
-            
-            # If next day falls on a weekend, move to Monday
-            if next_day.weekday() == 5:  # Saturday
-                next_day = next_day + timedelta(days=2)  # Move to Monday
-                logging.info(f"Next day would be Saturday, adjusted to Monday")
-            elif next_day.weekday() == 6:  # Sunday
-                next_day = next_day + timedelta(days=1)  # Move to Monday
-                logging.info(f"Next day would be Sunday, adjusted to Monday")
+            next_day = self.next_trading_day(date)
                 
             # Format as string
             next_day_str = next_day.strftime("%Y-%m-%d")
+            
+            # Serve from the bulk prefetch when available
+            if (symbol, next_day_str) in self._next_day_cache:
+                return self._next_day_cache[(symbol, next_day_str)]
+                
             logging.info(f"Getting next day data for {symbol} after {date} (next trading day: {next_day_str})")
             
             # Get data for that day
             ticker = yf.Ticker(f"{symbol}.NS")
             end_day = next_day + timedelta(days=1)
-            data = ticker.history(start=next_day_str, end=end_day.strftime("%Y-%m-%d"), interval="5m")
+            data = yahoo_call(ticker.history, start=next_day_str, end=end_day.strftime("%Y-%m-%d"), interval="5m",
+                              description=f"5m history for {symbol}")
             
             if data.empty:
                 logging.warning(f"No intraday data found for {symbol} on {next_day_str}")
                 # Try to get daily data as fallback
-                data = ticker.history(start=next_day_str, end=end_day.strftime("%Y-%m-%d"), interval="1d")
+                data = yahoo_call(ticker.history, start=next_day_str, end=end_day.strftime("%Y-%m-%d"), interval="1d",
+                                  description=f"Daily history for {symbol}")
                 if not data.empty:
                     logging.info(f"Using daily data instead of intraday for {symbol} on {next_day_str}")
             else:
@@ -1067,127 +1005,140 @@ class IntradayBacktester:
         if next_day_data is None or next_day_data.empty:
             return None
             
-        try:
-            result = {
-                "Symbol": setup["Symbol"],
-                "Date": setup["Date"],
-                "Setup_Type": setup["Setup_Type"],
-                "Signal": setup["Signal"],
-                "Entry": setup["Entry"],
-                "Stop_Loss": setup["Stop_Loss"],
-                "Target1": setup["Target1"],
-                "Target2": setup["Target2"]
-            }
+        results = self.evaluate_setups([setup], [next_day_data])
+        return results[0] if results else None
+        
+    def evaluate_setups(self, setups, bars):
+        """Walk next-day bars in time order for many setups at once
+        
+        Setups are evaluated together as (setups x bars) matrices. For each one we find the
+        entry bar, which of stop, T1 and T2 was touched first after entry, the time in trade
+        and the maximum adverse/favourable excursion (MAE/MFE, in R multiples). A stop and a
+        target inside the same bar cannot be ordered and are scored as breakeven.
+        """
+        pairs = [(setup, data) for setup, data in zip(setups, bars) if data is not None and not data.empty]
+        if not pairs:
+            return []
             
-            # Get entry, stop and target prices
-            entry_price = float(setup["Entry"])
-            stop_loss = float(setup["Stop_Loss"])
-            target1 = float(setup["Target1"])
-            target2 = float(setup["Target2"])
-            
-            # Get next day's high, low
-            day_high = next_day_data["High"].max()
-            day_low = next_day_data["Low"].min()
-            
-            # Check if entry was triggered
-            entry_triggered = False
-            if setup["Setup_Type"] in ["Bullish", "Momentum"] and day_low <= entry_price <= day_high:
-                entry_triggered = True
-            elif setup["Setup_Type"] in ["Bearish"] and day_low <= entry_price <= day_high:
-                entry_triggered = True
-            elif setup["Setup_Type"] in ["Range"] and day_low <= entry_price <= day_high:
-                entry_triggered = True
+        try:
+            n = len(pairs)
+            width = max(len(data) for _, data in pairs)
+            high = np.full((n, width), np.nan)
+            low = np.full((n, width), np.nan)
+            close = np.full((n, width), np.nan)
+            for i, (_, data) in enumerate(pairs):
+                high[i, :len(data)] = data["High"].to_numpy(dtype=float)
+                low[i, :len(data)] = data["Low"].to_numpy(dtype=float)
+                close[i, :len(data)] = data["Close"].to_numpy(dtype=float)
                 
-            result["Entry_Triggered"] = entry_triggered
-            
-            if entry_triggered:
-                # Check if stop loss was hit
-                stop_hit = False
-                if setup["Setup_Type"] in ["Bullish", "Momentum"] and day_low <= stop_loss:
-                    stop_hit = True
-                elif setup["Setup_Type"] in ["Bearish"] and day_high >= stop_loss:
-                    stop_hit = True
-                elif setup["Setup_Type"] in ["Range"]:
-                    if entry_price > stop_loss and day_low <= stop_loss:
-                        stop_hit = True
-                    elif entry_price < stop_loss and day_high >= stop_loss:
-                        stop_hit = True
-                        
-                result["Stop_Hit"] = stop_hit
+            entry = np.array([float(setup["Entry"]) for setup, _ in pairs])[:, None]
+            stop = np.array([float(setup["Stop_Loss"]) for setup, _ in pairs])[:, None]
+            target1 = np.array([float(setup["Target1"]) for setup, _ in pairs])[:, None]
+            target2 = np.array([float(setup["Target2"]) for setup, _ in pairs])[:, None]
+            
+            # Range setups trade in the direction of their first target
+            is_long = np.array([
+                setup["Setup_Type"] in ["Bullish", "Momentum"] or
+                (setup["Setup_Type"] == "Range" and float(setup["Entry"]) < float(setup["Target1"]))
+                for setup, _ in pairs
+            ])[:, None]
+            
+            bar_no = np.arange(width)[None, :]
+            valid = ~np.isnan(high)
+            last_bar = valid.sum(axis=1) - 1
+            
+            # Entry is the first bar that trades through the entry price
+            touched = valid & (low <= entry) & (high >= entry)
+            entry_triggered = touched.any(axis=1)
+            entry_bar = touched.argmax(axis=1)
+            in_trade = valid & entry_triggered[:, None] & (bar_no >= entry_bar[:, None])
+            
+            def first_bar(hit):
+                hit = hit & in_trade
+                return np.where(hit.any(axis=1), hit.argmax(axis=1), width)
                 
-                # Check if targets were hit
-                target1_hit = False
-                target2_hit = False
+            stop_bar = first_bar(np.where(is_long, low <= stop, high >= stop))
+            target1_bar = first_bar(np.where(is_long, high >= target1, low <= target1))
+            target2_bar = first_bar(np.where(is_long, high >= target2, low <= target2))
+            
+            risk = np.abs(entry - stop)[:, 0]
+            safe_risk = np.where(risk > 0, risk, np.nan)
+            direction = np.where(is_long[:, 0], 1.0, -1.0)
+            
+            # Decide the first event and exit bar for every setup
+            tie = (stop_bar < width) & (stop_bar == target1_bar)
+            stop_first = stop_bar < target1_bar
+            target_first = target1_bar < stop_bar
+            reached_t2 = target_first & (target2_bar < stop_bar)
+            
+            exit_bar = np.select(
+                [tie | stop_first, reached_t2, target_first],
+                [stop_bar, target2_bar, target1_bar],
+                last_bar
+            )
+            exit_close = close[np.arange(n), np.minimum(exit_bar, width - 1)]
+            
+            r_target1 = np.abs(target1[:, 0] - entry[:, 0]) / safe_risk
+            r_target2 = np.abs(target2[:, 0] - entry[:, 0]) / safe_risk
+            r_close = direction * (exit_close - entry[:, 0]) / safe_risk
+            
+            # Excursions while the trade was open, in R multiples
+            window = in_trade & (bar_no <= exit_bar[:, None])
+            favourable = np.where(is_long, high - entry, entry - low)
+            adverse = np.where(is_long, entry - low, high - entry)
+            with np.errstate(invalid="ignore"):
+                mfe = np.nanmax(np.where(window, favourable, np.nan), axis=1, initial=0) / safe_risk
+                mae = np.nanmax(np.where(window, adverse, np.nan), axis=1, initial=0) / safe_risk
                 
-                if setup["Setup_Type"] in ["Bullish", "Momentum"] and day_high >= target1:
-                    target1_hit = True
-                    if day_high >= target2:
-                        target2_hit = True
-                elif setup["Setup_Type"] in ["Bearish"] and day_low <= target1:
-                    target1_hit = True
-                    if day_low <= target2:
-                        target2_hit = True
-                elif setup["Setup_Type"] in ["Range"]:
-                    if entry_price < target1 and day_high >= target1:
-                        target1_hit = True
-                        if day_high >= target2:
-                            target2_hit = True
-                    elif entry_price > target1 and day_low <= target1:
-                        target1_hit = True
-                        if day_low <= target2:
-                            target2_hit = True
-                            
-                result["Target1_Hit"] = target1_hit
-                result["Target2_Hit"] = target2_hit
+            results = []
+            for i, (setup, data) in enumerate(pairs):
+                result = {
+                    "Symbol": setup["Symbol"],
+                    "Date": setup["Date"],
+                    "Setup_Type": setup["Setup_Type"],
+                    "Signal": setup["Signal"],
+                    "Entry": setup["Entry"],
+                    "Stop_Loss": setup["Stop_Loss"],
+                    "Target1": setup["Target1"],
+                    "Target2": setup["Target2"],
+                    "Entry_Triggered": bool(entry_triggered[i]),
+                    "Stop_Hit": bool(stop_bar[i] < width),
+                    "Target1_Hit": bool(target1_bar[i] < width),
+                    "Target2_Hit": bool(target2_bar[i] < width)
+                }
                 
-                # Calculate outcome
-                if stop_hit and not (target1_hit or target2_hit):
-                    result["Outcome"] = "Loss"
-                    result["Profit_Factor"] = -1.0
-                elif target1_hit and not stop_hit:
-                    result["Outcome"] = "Win"
-                    if target2_hit:
-                        result["Profit_Factor"] = abs((target2 - entry_price) / (entry_price - stop_loss))
-                    else:
-                        result["Profit_Factor"] = abs((target1 - entry_price) / (entry_price - stop_loss))
-                elif target1_hit and stop_hit:
-                    # Need to check which happened first - for this we'd need time series analysis
-                    # For simplicity, we'll assume breakeven
-                    result["Outcome"] = "Breakeven"
-                    result["Profit_Factor"] = 0.0
+                if not entry_triggered[i]:
+                    result.update({"Outcome": "No Entry", "Profit_Factor": 0.0, "First_Hit": "None"})
+                    results.append(result)
+                    continue
+                    
+                if tie[i]:
+                    result.update({"Outcome": "Breakeven", "Profit_Factor": 0.0, "First_Hit": "Ambiguous"})
+                elif stop_first[i]:
+                    result.update({"Outcome": "Loss", "Profit_Factor": -1.0, "First_Hit": "Stop"})
+                elif reached_t2[i]:
+                    result.update({"Outcome": "Win", "Profit_Factor": float(r_target2[i]), "First_Hit": "Target2"})
+                elif target_first[i]:
+                    result.update({"Outcome": "Win", "Profit_Factor": float(r_target1[i]), "First_Hit": "Target1"})
                 else:
-                    # Neither stop nor target hit - would close at end of day
-                    close_price = next_day_data["Close"].iloc[-1]
-                    if setup["Setup_Type"] in ["Bullish", "Momentum"]:
-                        pnl = close_price - entry_price
-                    elif setup["Setup_Type"] in ["Bearish"]:
-                        pnl = entry_price - close_price
-                    else:  # Range
-                        if entry_price < target1:  # Long position
-                            pnl = close_price - entry_price
-                        else:  # Short position
-                            pnl = entry_price - close_price
-                            
-                    risk = abs(entry_price - stop_loss)
-                    result["Profit_Factor"] = pnl / risk
+                    # Neither stop nor target hit - closes at end of day
+                    profit_factor = float(r_close[i])
+                    outcome = "Small Win" if profit_factor > 0 else "Small Loss" if profit_factor < 0 else "Breakeven"
+                    result.update({"Outcome": outcome, "Profit_Factor": profit_factor, "First_Hit": "None"})
                     
-                    if result["Profit_Factor"] > 0:
-                        result["Outcome"] = "Small Win"
-                    elif result["Profit_Factor"] < 0:
-                        result["Outcome"] = "Small Loss"
-                    else:
-                        result["Outcome"] = "Breakeven"
-            else:
-                result["Outcome"] = "No Entry"
-                result["Profit_Factor"] = 0.0
-                result["Stop_Hit"] = False
-                result["Target1_Hit"] = False
-                result["Target2_Hit"] = False
+                entry_time = data.index[entry_bar[i]]
+                exit_time = data.index[min(exit_bar[i], len(data) - 1)]
+                result["Entry_Time"] = entry_time.strftime("%H:%M")
+                result["Exit_Time"] = exit_time.strftime("%H:%M")
+                result["Time_In_Trade"] = round((exit_time - entry_time).total_seconds() / 60, 1)
+                result["MAE"] = round(float(mae[i]), 2)
+                result["MFE"] = round(float(mfe[i]), 2)
+                results.append(result)
                 
-            return result
+            return results
         except Exception as e:
-            logging.error(f"Error evaluating setup: {e}")
-            return None
+            logging.error(f"Error evaluating setups: {e}")
+            return []
             
     def run_backtest(self, days=30):
         """Run backtest on historical setups"""
@@ -1199,16 +1150,21 @@ class IntradayBacktester:
             
         print(f"Running backtest on {len(setups)} historical setups...")
         
-        results = []
+        # Fetch all next-day bars in bulk, grouped by trading day
+        self.prefetch_next_day_data(setups)
+        
+        # Evaluate all setups of the same trading day together
+        by_day = {}
         for setup in setups:
-            # Get next day data
-            next_day_data = self.get_next_day_data(setup["Symbol"], setup["Date"])
-            
-            # Evaluate setup
-            if next_day_data is not None:
-                result = self.evaluate_setup(setup, next_day_data)
-                if result:
-                    results.append(result)
+            try:
+                by_day.setdefault(self.next_trading_day(setup["Date"]), []).append(setup)
+            except Exception as e:
+                logging.error(f"Invalid setup date {setup.get('Date')}: {e}")
+                
+        results = []
+        for next_day, day_setups in sorted(by_day.items()):
+            bars = [self.get_next_day_data(setup["Symbol"], setup["Date"]) for setup in day_setups]
+            results.extend(self.evaluate_setups(day_setups, bars))
                     
         # Generate backtest report
         if results:
@@ -1289,6 +1245,29 @@ class IntradayBacktester:
             "setup_types": setup_types
         })
         
+    def _setup_type_rows(self, setup_types):
+        """Template fields for the per-setup-type performance table"""
+        for setup_type, type_stats in setup_types.items():
+            decided = type_stats["wins"] + type_stats["losses"]
+            win_rate = round(type_stats["wins"] / decided * 100, 2) if decided > 0 else 0
+            yield {**type_stats, "setup_type": setup_type, "win_rate": win_rate,
+                   "win_rate_class": rate_class(win_rate, 60, 45)}
+
+    def _result_rows(self, results):
+        """Template fields for each individual backtest result"""
+        for result in results:
+            outcome = result.get("Outcome")
+            yield {
+                "Symbol": result.get('Symbol'),
+                "Date": result.get('Date'),
+                "Setup_Type": result.get('Setup_Type'),
+                "Signal": result.get('Signal'),
+                "entry_triggered": "Yes" if result.get('Entry_Triggered') else "No",
+                "outcome_class": "win" if outcome in ["Win", "Small Win"] else "loss" if outcome in ["Loss", "Small Loss"] else "neutral",
+                "Outcome": outcome,
+                "profit_factor": round(result.get('Profit_Factor', 0), 2)
+            }
+
     def generate_html_backtest_report(self, results, stats):
         """Generate HTML backtest report"""
         try:
@@ -1296,118 +1275,19 @@ class IntradayBacktester:
             now = datetime.now().strftime("%Y-%m-%d")
             report_path = f"backtest_report_{now}.html"
             
-            html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Intraday Strategy Backtest Results</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .header {{ background-color: #f0f0f0; padding: 10px; border-radius: 5px; margin-bottom: 20px; }}
-                    .stats {{ display: flex; justify-content: space-between; margin-bottom: 20px; }}
-                    .stat-box {{ background-color: #f9f9f9; padding: 15px; border-radius: 5px; width: 30%; text-align: center; }}
-                    table {{ border-collapse: collapse; width: 100%; margin-top: 20px; }}
-                    th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                    th {{ background-color: #f2f2f2; }}
-                    .win {{ color: green; }}
-                    .loss {{ color: red; }}
-                    .neutral {{ color: orange; }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>Intraday Strategy Backtest Results</h1>
-                    <p>Generated on: {now}</p>
-                </div>
-                
-                <div class="stats">
-                    <div class="stat-box">
-                        <h3>Win Rate</h3>
-                        <h2 class="{('win' if stats['win_rate'] >= 60 else 'neutral' if stats['win_rate'] >= 45 else 'loss')}">{stats['win_rate']}%</h2>
-                        <p>{stats['wins']} wins, {stats['losses']} losses</p>
-                    </div>
-                    <div class="stat-box">
-                        <h3>Profit Factor</h3>
-                        <h2 class="{('win' if stats['profit_factor'] >= 1.5 else 'neutral' if stats['profit_factor'] >= 1 else 'loss')}">{stats['profit_factor']}</h2>
-                        <p>Profit to Loss Ratio</p>
-                    </div>
-                    <div class="stat-box">
-                        <h3>Entry Rate</h3>
-                        <h2>{stats['entry_rate']}%</h2>
-                        <p>{stats['entry_triggered']} of {stats['total_setups']} setups</p>
-                    </div>
-                </div>
-                
-                <h2>Performance by Setup Type</h2>
-                <table>
-                    <tr>
-                        <th>Setup Type</th>
-                        <th>Count</th>
-                        <th>Win Rate</th>
-                        <th>Wins</th>
-                        <th>Losses</th>
-                        <th>Breakeven</th>
-                        <th>No Entry</th>
-                    </tr>
-            """
-            
-            # Add setup type rows
-            for setup_type, type_stats in stats["setup_types"].items():
-                win_rate = round(type_stats["wins"] / (type_stats["wins"] + type_stats["losses"]) * 100, 2) if (type_stats["wins"] + type_stats["losses"]) > 0 else 0
-                
-                html += f"""
-                <tr>
-                    <td>{setup_type}</td>
-                    <td>{type_stats['count']}</td>
-                    <td class="{('win' if win_rate >= 60 else 'neutral' if win_rate >= 45 else 'loss')}">{win_rate}%</td>
-                    <td>{type_stats['wins']}</td>
-                    <td>{type_stats['losses']}</td>
-                    <td>{type_stats['breakeven']}</td>
-                    <td>{type_stats['no_entry']}</td>
-                </tr>
-                """
-                
-            html += """
-                </table>
-                
-                <h2>Individual Setup Results</h2>
-                <table>
-                    <tr>
-                        <th>Symbol</th>
-                        <th>Date</th>
-                        <th>Setup Type</th>
-                        <th>Signal</th>
-                        <th>Entry Triggered</th>
-                        <th>Outcome</th>
-                        <th>Profit Factor</th>
-                    </tr>
-            """
-            
-            # Add individual result rows
-            for result in results:
-                outcome_class = "win" if result.get("Outcome") in ["Win", "Small Win"] else "loss" if result.get("Outcome") in ["Loss", "Small Loss"] else "neutral"
-                
-                html += f"""
-                <tr>
-                    <td>{result.get('Symbol')}</td>
-                    <td>{result.get('Date')}</td>
-                    <td>{result.get('Setup_Type')}</td>
-                    <td>{result.get('Signal')}</td>
-                    <td>{"Yes" if result.get('Entry_Triggered') else "No"}</td>
-                    <td class="{outcome_class}">{result.get('Outcome')}</td>
-                    <td>{round(result.get('Profit_Factor', 0), 2)}</td>
-                </tr>
-                """
-                
-            html += """
-                </table>
-            </body>
-            </html>
-            """
-            
-            # Write to file
-            with open(report_path, "w") as f:
-                f.write(html)
+            # Stream the report so multi-year replays do not build the document in memory
+            with ReportWriter(report_path) as writer:
+                writer.write(BACKTEST_REPORT_HEADER, title="Intraday Strategy Backtest Results", now=now)
+                writer.write(BACKTEST_STATS,
+                             **stats,
+                             win_rate_class=rate_class(stats['win_rate'], 60, 45),
+                             profit_factor_class=rate_class(stats['profit_factor'], 1.5, 1))
+                writer.write(SETUP_TYPE_TABLE_HEADER)
+                writer.write_rows(SETUP_TYPE_ROW, self._setup_type_rows(stats["setup_types"]))
+                writer.write(RESULT_TABLE_HEADER)
+                writer.write_rows(RESULT_ROW, self._result_rows(results))
+                writer.write(TABLE_FOOTER)
+                writer.write(DOCUMENT_FOOTER)
                 
             print(f"\nBacktest report saved to: {report_path}")
         except Exception as e:
@@ -1415,32 +1295,110 @@ class IntradayBacktester:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intraday stock screener for next-day trading")
+    parser.add_argument("--replay", type=int, metavar="YEARS",
+                        help="replay the screener over the last YEARS years of history and exit")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of screening workers (default: one per CPU core)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="run the screening stage in worker processes or threads")
+    parser.add_argument("--universe", metavar="PATH",
+                        help="CSV or JSON symbol list to screen instead of the built-in NSE list")
+    parser.add_argument("--min-avg-volume", type=float, default=DEFAULT_RULES["min_avg_volume"], metavar="SHARES",
+                        help="skip symbols whose 20-day average volume is below SHARES (e.g. 100000)")
+    parser.add_argument("--min-avg-turnover", type=float, default=DEFAULT_RULES["min_avg_turnover"], metavar="RUPEES",
+                        help="skip symbols whose 20-day average traded value is below RUPEES")
+    parser.add_argument("--min-close", type=float, default=DEFAULT_RULES["min_close"], metavar="PRICE",
+                        help="skip symbols whose last close is below PRICE (e.g. 20)")
+    parser.add_argument("--atr-pct-range", type=float, nargs=2, metavar=("MIN", "MAX"),
+                        default=[DEFAULT_RULES["min_atr_pct"], DEFAULT_RULES["max_atr_pct"]],
+                        help="skip symbols whose ATR as a percent of price is outside MIN..MAX (e.g. 1 15)")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="screen every symbol without the daily summary prefilter")
+    parser.add_argument("--incremental", action="store_true",
+                        help="advance persisted indicator state by the new bars instead of recomputing history")
+    parser.add_argument("--live", choices=["1m", "5m"], metavar="INTERVAL",
+                        help="scan every closed 1m or 5m bar during the session instead of end-of-day data")
+    parser.add_argument("--live-replay", metavar="PATH",
+                        help="with --live, replay bars from a CSV/JSON-lines file instead of polling Yahoo")
+    parser.add_argument("--replay-speed", type=float, default=0, metavar="X",
+                        help="with --live-replay, play bars at X times real time (default: as fast as possible)")
+    parser.add_argument("--portfolio", type=int, metavar="YEARS",
+                        help="simulate trading the ranked setups of the last YEARS years as one portfolio and exit")
+    parser.add_argument("--top-n", type=int, default=5, metavar="N",
+                        help="with --portfolio, --sweep or --walk-forward, candidate setups per day after ranking")
+    parser.add_argument("--max-positions", type=int, default=5, metavar="N",
+                        help="with --portfolio, --sweep or --walk-forward, most positions opened in one session")
+    parser.add_argument("--risk-per-trade", type=float, default=1.0, metavar="PCT",
+                        help="with --portfolio, --sweep or --walk-forward, percent of equity risked per trade")
+    parser.add_argument("--capital", type=float, default=1_000_000, metavar="RUPEES",
+                        help="with --portfolio, --sweep or --walk-forward, starting capital")
+    parser.add_argument("--sweep", type=int, metavar="YEARS",
+                        help="rank pattern threshold sets by a portfolio backtest over the last YEARS years and exit")
+    parser.add_argument("--grid", metavar="PATH",
+                        help="with --sweep or --walk-forward, JSON file mapping threshold names to lists of values")
+    parser.add_argument("--walk-forward", type=int, metavar="YEARS",
+                        help="walk-forward optimize the pattern thresholds over the last YEARS years and exit")
+    parser.add_argument("--train-sessions", type=int, default=TRAIN_SESSIONS, metavar="N",
+                        help="with --walk-forward, sessions in each training window")
+    parser.add_argument("--test-sessions", type=int, default=TEST_SESSIONS, metavar="N",
+                        help="with --walk-forward, out-of-sample sessions after each training window")
+    args = parser.parse_args()
+    rules = {} if args.no_prefilter else {
+        "min_close": args.min_close,
+        "min_avg_volume": args.min_avg_volume,
+        "min_avg_turnover": args.min_avg_turnover,
+        "min_atr_pct": args.atr_pct_range[0],
+        "max_atr_pct": args.atr_pct_range[1],
+    }
+    
     try:
         # Initialize with welcome message
         print("\n" + "="*50)
         print("Intraday Stock Screener")
         print("="*50 + "\n")
         
+        if args.replay:
+            print(f"Replaying screener over the last {args.replay} year(s)...")
+            IntradayScreener().replay(years=args.replay)
+            raise SystemExit(0)
+        
+        if args.portfolio:
+            IntradayScreener().portfolio_backtest(years=args.portfolio, top_n=args.top_n,
+                                                  initial_capital=args.capital, max_positions=args.max_positions,
+                                                  risk_per_trade=args.risk_per_trade / 100)
+            raise SystemExit(0)
+        
+        if args.sweep:
+            IntradayScreener().parameter_sweep(years=args.sweep, grid=load_grid(args.grid) if args.grid else None,
+                                               top_n=args.top_n, workers=args.workers, executor=args.executor,
+                                               initial_capital=args.capital, max_positions=args.max_positions,
+                                               risk_per_trade=args.risk_per_trade / 100)
+            raise SystemExit(0)
+        
+        if args.walk_forward:
+            IntradayScreener().walk_forward(years=args.walk_forward, grid=load_grid(args.grid) if args.grid else None,
+                                            train_sessions=args.train_sessions, test_sessions=args.test_sessions,
+                                            top_n=args.top_n, workers=args.workers, executor=args.executor,
+                                            initial_capital=args.capital, max_positions=args.max_positions,
+                                            risk_per_trade=args.risk_per_trade / 100)
+            raise SystemExit(0)
+        
+        if args.live:
+            IntradayScreener().live_scan(interval=args.live, replay_path=args.live_replay,
+                                         speed=args.replay_speed, universe_path=args.universe)
+            raise SystemExit(0)
+        
         # Run the screener
         print("Running stock screener to identify today's setups...")
         screener = IntradayScreener()
-        setups = screener.run()
+        setups = screener.run(workers=args.workers, executor=args.executor, universe_path=args.universe,
+                              rules=rules, incremental=args.incremental)
         
         # Show screener results
         if setups:
-            # Determine the correct report path based on today's date
-            today = datetime.now()
-            
-            # Determine the next trading day for the filename
-            if today.weekday() == 4:  # Friday
-                next_trading_day = (today + timedelta(days=3))  # Monday
-            elif today.weekday() == 5:  # Saturday
-                next_trading_day = (today + timedelta(days=2))  # Monday
-            elif today.weekday() == 6:  # Sunday
-                next_trading_day = (today + timedelta(days=1))  # Monday
-            else:
-                next_trading_day = (today + timedelta(days=1))  # Tomorrow
-                
+            # The report is named after the session its setups are for
+            next_trading_day = screener.calendar.next_trading_session()
             report_filename = f"intraday_setups_{next_trading_day.strftime('%Y%m%d')}.html"
             report_path = os.path.join(screener.output_dir, report_filename)
             
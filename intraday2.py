@@ -14,9 +14,7 @@ from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor
 from fake_useragent import UserAgent
 import warnings
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
+from charts import chart_job, render_cached_chart
 
 # Set up logging
 logging.basicConfig(
@@ -480,90 +478,14 @@ class IntradayScreener:
         
         return patterns
 
-    def create_chart(self, symbol, data, patterns=None):
-        """Create a chart for visual confirmation"""
-
+    def create_chart(self, symbol, data, pattern=None):
+        """Create a chart for visual confirmation, reusing the PNG when nothing changed"""
         if data is None or data.empty:
             return False
             
-        try:
-            df = data.copy()
-            
-            # Create figure and axis
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [3, 1]})
-            fig.suptitle(f"{symbol} - Technical Analysis Chart", fontsize=14)
-            
-            # Plot candlesticks
-            width = 0.6
-            width2 = 0.05
-            up = df[df['Close'] >= df['Open']]
-            down = df[df['Close'] < df['Open']]
-            
-            # Plot up candles
-            ax1.bar(up.index, up['Close'] - up['Open'], width, bottom=up['Open'], color='green', alpha=0.6)
-            ax1.bar(up.index, up['High'] - up['Close'], width2, bottom=up['Close'], color='green', alpha=0.6)
-            ax1.bar(up.index, up['Open'] - up['Low'], width2, bottom=up['Low'], color='green', alpha=0.6)
-            
-            # Plot down candles
-            ax1.bar(down.index, down['Open'] - down['Close'], width, bottom=down['Close'], color='red', alpha=0.6)
-            ax1.bar(down.index, down['High'] - down['Open'], width2, bottom=down['Open'], color='red', alpha=0.6)
-            ax1.bar(down.index, down['Close'] - down['Low'], width2, bottom=down['Low'], color='red', alpha=0.6)
-            
-            # Plot moving averages
-            ax1.plot(df.index, df['SMA20'], color='blue', linestyle='-', linewidth=1.0, label='SMA20')
-            ax1.plot(df.index, df['EMA9'], color='red', linestyle='-', linewidth=1.0, label='EMA9')
-            ax1.plot(df.index, df['EMA21'], color='green', linestyle='--', linewidth=1.0, label='EMA21')
-            
-            # Plot bollinger bands
-            ax1.plot(df.index, df['BB_Upper'], color='gray', linestyle='--', linewidth=0.5)
-            ax1.plot(df.index, df['BB_Lower'], color='gray', linestyle='--', linewidth=0.5)
-            
-            # Plot Volume
-            ax2.bar(up.index, up['Volume'], width, color='green', alpha=0.6)
-            ax2.bar(down.index, down['Volume'], width, color='red', alpha=0.6)
-            ax2.plot(df.index, df['VolSMA20'], color='blue', linestyle='-', label='Volume SMA20')
-            
-            # Highlight patterns if provided
-            if patterns:
-                for pattern in patterns:
-                    # Mark entry, stop and target levels
-                    last_idx = df.index[-1]
-                    ax1.axhline(y=pattern['Entry'], color='blue', linestyle='-', alpha=0.7, linewidth=1)
-                    ax1.axhline(y=pattern['Stop_Loss'], color='red', linestyle='-', alpha=0.7, linewidth=1)
-                    ax1.axhline(y=pattern['Target1'], color='green', linestyle='--', alpha=0.7, linewidth=1)
-                    
-                    # Add labels
-                    ax1.text(df.index[-int(len(df)*0.1)], pattern['Entry'], 'Entry', fontsize=8, color='blue')
-                    ax1.text(df.index[-int(len(df)*0.1)], pattern['Stop_Loss'], 'Stop', fontsize=8, color='red')
-                    ax1.text(df.index[-int(len(df)*0.1)], pattern['Target1'], 'Target', fontsize=8, color='green')
-                    
-                    # Add pattern info
-                    fig.text(0.02, 0.02, f"Setup: {pattern['Signal']} ({pattern['Confidence']}) - R:R {pattern['Risk_Reward']}", fontsize=10)
-            
-            # Add legends and labels
-            ax1.legend(loc='upper left', fontsize=8)
-            ax1.set_ylabel('Price')
-            ax1.grid(True, alpha=0.3)
-            
-            ax2.set_ylabel('Volume')
-            ax2.grid(True, alpha=0.3)
-            
-            # Format dates on x-axis
-            if len(df) > 30:
-                plt.xticks(rotation=45)
-                
-            plt.tight_layout()
-            
-            # Save chart
-            chart_path = f"{self.output_dir}/charts/{symbol}_chart.png"
-            plt.savefig(chart_path)
-            plt.close(fig)
-            plt.close()
-            
-            return chart_path
-        except Exception as e:
-            logging.error(f"Error creating chart for {symbol}: {e}")
-            return False
+        chart_path = f"{self.output_dir}/charts/{symbol}_chart.png"
+        chart_path, _ = render_cached_chart(chart_job(symbol, data, pattern, chart_path))
+        return chart_path
 
     def process_symbol(self, symbol):
         """Process a single symbol for intraday setups"""
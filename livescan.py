@@ -0,0 +1,168 @@
+# Live intraday scanning for the NSE screener
+# Advances per-symbol indicator state on every closed bar from a feed and reports new setups as they appear
+
+import time
+import logging
+import pandas as pd
+from datetime import datetime
+from screenerdb import get_db
+from indicatorstate import IndicatorState, IndicatorStateStore, states_to_long
+from patterns import detect_patterns, SETUP_COLUMNS
+
+LIVE_SETUP_COLUMNS = SETUP_COLUMNS + ["Interval", "Bar_Time", "Detected_At", "Latency_Ms"]
+
+
+class LiveScanner:
+    """Runs the detect_patterns setup rules on every new bar from a feed
+
+    Each closed bar is a constant-time indicator update for its symbol; only symbols
+    that received a bar are re-screened. A setup is reported once, on the bar it first
+    appears, to SQLite and the console.
+    """
+
+    def __init__(self, db_path="intraday_data.db", interval="5m", market_sentiment=None, persist=True):
+        self.db = get_db(db_path)
+        self.interval = interval
+        self.market_sentiment = dict(market_sentiment) if market_sentiment else None
+        self.persist = persist
+        self.store = IndicatorStateStore(db_path)
+        self.states = {}
+        self.active = {}
+        self.stats = {"bars": 0, "batches": 0, "setups": 0, "max_latency_ms": 0.0}
+        self.init_database()
+
+    def init_database(self):
+        """Create the live setups table if it does not exist"""
+        try:
+            self.db.execute('''
+            CREATE TABLE IF NOT EXISTS live_setups (
+                Symbol TEXT,
+                Date TEXT,
+                Setup_Type TEXT,
+                Signal TEXT,
+                Confidence TEXT,
+                Entry REAL,
+                Stop_Loss REAL,
+                Target1 REAL,
+                Target2 REAL,
+                Risk_Reward REAL,
+                Volume_Ratio REAL,
+                Trend_Strength TEXT,
+                Support REAL,
+                Resistance REAL,
+                ADX REAL,
+                RSI REAL,
+                MACD_Signal TEXT,
+                Volatility REAL,
+                Risk_Factor REAL,
+                Expected_Movement REAL,
+                Pattern TEXT,
+                Notes TEXT,
+                Timestamp TEXT,
+                Hourly_Confirmation TEXT,
+                Hourly_RSI REAL,
+                Interval TEXT,
+                Bar_Time TEXT,
+                Detected_At TEXT,
+                Latency_Ms REAL,
+                PRIMARY KEY (Symbol, Interval, Bar_Time, Signal)
+            )
+            ''')
+            self.db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_live_setups_bar_time ON live_setups (Bar_Time)
+            ''')
+        except Exception as e:
+            logging.error(f"Live database initialization error: {e}")
+
+    def warm_up(self, frames):
+        """Bring states up to date from recent intraday bars before the feed starts
+
+        The last bar of each frame may still be forming, so it is left for the feed.
+        """
+        if self.persist:
+            self.store.advance(frames, self.interval, forming=True, states=self.states)
+        else:
+            for symbol, df in frames.items():
+                state = self.states.setdefault(symbol, IndicatorState())
+                for timestamp, values in zip(df.index[:-1], df[["Open", "High", "Low", "Close", "Volume"]].to_numpy()):
+                    state.update(timestamp, *values)
+        logging.info(f"Live scanner warmed up {len(self.states)} symbols on {self.interval} bars")
+
+    def on_bars(self, timestamp, bars, received_at=None):
+        """Apply one batch of closed bars and return the setups that are new on this bar"""
+        received_at = received_at or time.time()
+        timestamp = pd.Timestamp(timestamp)
+        updated = {}
+        for symbol, values in bars.items():
+            state = self.states.get(symbol)
+            if state is None:
+                state = self.states[symbol] = IndicatorState()
+            elif state.last_timestamp is not None and timestamp.value <= state.last_timestamp:
+                continue
+            state.update(timestamp, *values)
+            updated[symbol] = state
+
+        setups = detect_patterns(states_to_long(updated), self.market_sentiment, latest_only=True)
+        records = setups.to_dict("records")
+
+        # A setup is new when its signal was not already showing on the symbol's previous bar
+        current = {}
+        for setup in records:
+            current.setdefault(setup["Symbol"], set()).add(setup["Signal"])
+        new_setups = [setup for setup in records if setup["Signal"] not in self.active.get(setup["Symbol"], ())]
+        for symbol in updated:
+            self.active[symbol] = current.get(symbol, set())
+
+        latency_ms = round((time.time() - received_at) * 1000, 1)
+        for setup in new_setups:
+            setup["Interval"] = self.interval
+            setup["Bar_Time"] = timestamp.strftime("%Y-%m-%d %H:%M")
+            setup["Detected_At"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            setup["Latency_Ms"] = latency_ms
+        self.save_setups(new_setups)
+        self.print_setups(new_setups)
+
+        self.stats["bars"] += len(updated)
+        self.stats["batches"] += 1
+        self.stats["setups"] += len(new_setups)
+        self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], latency_ms)
+
+        # Persist after reporting so state writes never delay an alert
+        if self.persist and updated:
+            self.store.save(updated, self.interval)
+        return new_setups
+
+    def save_setups(self, setups):
+        """Write new live setups to SQLite"""
+        if not setups:
+            return
+        try:
+            self.db.executemany(f'''
+            INSERT OR REPLACE INTO live_setups ({", ".join(LIVE_SETUP_COLUMNS)})
+            VALUES ({", ".join("?" * len(LIVE_SETUP_COLUMNS))})
+            ''', [tuple(setup[column] for column in LIVE_SETUP_COLUMNS) for setup in setups])
+        except Exception as e:
+            logging.error(f"Error saving live setups: {e}")
+
+    def print_setups(self, setups):
+        """One console line per new setup"""
+        for setup in setups:
+            print(f"[{setup['Bar_Time']}] {setup['Symbol']} - {setup['Signal']} ({setup['Confidence']}) | "
+                  f"Entry: {setup['Entry']} | Stop: {setup['Stop_Loss']} | Target: {setup['Target1']} | "
+                  f"R:R {setup['Risk_Reward']} | {setup['Latency_Ms']} ms")
+
+    def run(self, feed, max_batches=None):
+        """Consume a feed until it ends (or max_batches), returning the scan stats"""
+        start_time = time.time()
+        try:
+            for timestamp, bars in feed.batches():
+                self.on_bars(timestamp, bars, received_at=time.time())
+                if max_batches and self.stats["batches"] >= max_batches:
+                    break
+        except KeyboardInterrupt:
+            logging.info("Live scan interrupted")
+        finally:
+            feed.close()
+        self.stats["elapsed"] = round(time.time() - start_time, 2)
+        logging.info(f"Live scan finished: {self.stats}")
+        return self.stats
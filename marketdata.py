@@ -0,0 +1,328 @@
+# Shared market data access for the NSE screeners
+# Fetches a whole symbol universe in grouped bulk requests and splits the result into per-symbol frames
+
+import time
+import logging
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from ratelimit import AdaptiveRateLimiter, RateLimitedError, THROTTLE_MESSAGES
+
+# Index tickers used for market context (no exchange suffix)
+MARKET_INDICES = ["^NSEI", "^INDIAVIX", "^NSEBANK"]
+
+# Approximate calendar length of each yfinance period unit, used to pick the widest request
+PERIOD_UNITS = {"d": 1, "wk": 7, "mo": 30, "y": 365}
+
+# Relative difference between a re-fetched completed bar's close and the stored one above
+# which the provider is taken to have re-adjusted the history (split, dividend)
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+class _ThrottleLog(logging.Handler):
+    """Remembers when yfinance last logged a throttling error it swallowed
+
+    yf.download catches per-ticker errors and only logs them, so the log is the only
+    place a rate limit inside a bulk download shows up.
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.last_seen = 0.0
+
+    def emit(self, record):
+        message = record.getMessage().lower()
+        if any(fragment in message for fragment in THROTTLE_MESSAGES):
+            self.last_seen = time.monotonic()
+
+
+_throttle_log = _ThrottleLog()
+logging.getLogger("yfinance").addHandler(_throttle_log)
+
+# One limiter for every Yahoo Finance request made by this process
+yahoo_limiter = AdaptiveRateLimiter(name="Yahoo Finance")
+
+
+def yahoo_call(fn, *args, cost=1, description="Yahoo Finance request", **kwargs):
+    """Call a yfinance function through the shared rate limiter
+
+    cost is the number of HTTP requests the call makes, e.g. one per ticker for yf.download.
+    """
+    def attempt():
+        started = time.monotonic()
+        result = fn(*args, **kwargs)
+        if _throttle_log.last_seen >= started:
+            raise RateLimitedError("yfinance reported rate limiting")
+        return result
+
+    return yahoo_limiter.call(attempt, cost=cost, description=description)
+
+
+def period_to_days(period):
+    """Convert a yfinance period string such as '60d' or '3mo' to an approximate day count"""
+    if period == "max":
+        return float("inf")
+    if period == "ytd":
+        return 366
+    for unit in sorted(PERIOD_UNITS, key=len, reverse=True):
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return int(period[:-len(unit)]) * PERIOD_UNITS[unit]
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def to_ticker(symbol, suffix=".NS"):
+    """Map an NSE symbol to its Yahoo ticker, leaving index tickers untouched"""
+    if symbol.startswith("^") or symbol.endswith(suffix):
+        return symbol
+    return f"{symbol}{suffix}"
+
+
+def trim_to_period(df, period):
+    """Keep only the trailing sessions covered by a shorter period of the same interval"""
+    if df is None or df.empty or period in ("max", "ytd"):
+        return df
+    days = period_to_days(period)
+
+    # Day periods count trading sessions, like Yahoo's range parameter
+    if period.endswith("d"):
+        sessions = pd.Index(df.index.normalize()).unique()
+        if len(sessions) <= days:
+            return df
+        return df[df.index.normalize() >= sessions[-int(days)]]
+
+    cutoff = df.index[-1] - pd.Timedelta(days=days)
+    return df[df.index >= cutoff]
+
+
+def readjusted(stored, downloaded):
+    """Symbols whose re-downloaded bars disagree with the stored closes of completed bars
+
+    Bars are downloaded with auto_adjust, so a split or dividend rescales the whole
+    history; the overlap between a tail download and the store shows it. The last
+    stored bar is left out, it may have been a partial bar.
+    """
+    symbols = []
+    for symbol, df in downloaded.items():
+        old = stored.get(symbol)
+        if old is None or len(old) < 2:
+            continue
+        overlap = old.index[:-1].intersection(df.index)
+        if len(overlap) and not np.allclose(df.loc[overlap, "Close"].to_numpy(dtype=float),
+                                            old.loc[overlap, "Close"].to_numpy(dtype=float),
+                                            rtol=ADJUSTMENT_TOLERANCE, atol=0):
+            symbols.append(symbol)
+    return symbols
+
+
+def covers_period(df, period):
+    """Check whether stored bars reach back far enough to serve a period"""
+    if df is None or df.empty or period in ("max", "ytd"):
+        return False
+    days = period_to_days(period)
+    if period.endswith("d"):
+        return pd.Index(df.index.normalize()).nunique() >= days
+    return df.index[0] <= df.index[-1] - pd.Timedelta(days=days)
+
+
+class YahooProvider:
+    """Bulk OHLCV provider backed by yfinance.download"""
+
+    def download(self, tickers, period=None, interval="1d", start=None, end=None):
+        """Download several tickers in one request, returning ticker-grouped columns"""
+        return yahoo_call(
+            yf.download,
+            cost=len(tickers),
+            description=f"Bulk download of {len(tickers)} tickers ({interval})",
+            tickers=tickers,
+            period=period if start is None else None,
+            interval=interval,
+            start=start,
+            end=end,
+            group_by="ticker",
+            auto_adjust=True,
+            actions=False,
+            threads=True,
+            progress=False
+        )
+
+
+class MarketDataClient:
+    """Fetches OHLCV for many symbols at once and splits it back into per-symbol frames
+
+    Any object with a download(tickers, period, interval, start, end) method that returns
+    a ticker-grouped frame can be used as the provider, e.g. a local fake for offline runs.
+    With a trading calendar, stored symbols that already hold every closed session are
+    served from the store without a tail request.
+    """
+
+    def __init__(self, provider=None, chunk_size=100, suffix=".NS", store=None, calendar=None):
+        self.provider = provider or YahooProvider()
+        self.chunk_size = chunk_size
+        self.suffix = suffix
+        self.store = store
+        self.calendar = calendar
+
+    def fetch(self, symbols, period="60d", interval="1d", start=None, end=None, empty=None):
+        """Fetch bars for all symbols in grouped requests, returning {symbol: DataFrame}
+
+        Symbols the provider answered without any bars are added to the empty set when
+        one is given (see download_frames).
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if self.store is not None and period is not None and start is None:
+            return self.fetch_incremental(symbols, period, interval, empty)
+        return self.download_frames(symbols, period=period, interval=interval, start=start, end=end, empty=empty)
+
+    def fetch_incremental(self, symbols, period, interval, empty=None):
+        """Serve bars from the local store and download only the tail since the last stored bar
+
+        A symbol whose tail shows the provider re-adjusted its history is downloaded again
+        for the whole period and its stored bars are replaced.
+        """
+        stored = self.store.load(symbols, interval)
+
+        full = []
+        tails = {}
+        for symbol in symbols:
+            df = stored.get(symbol)
+            if not covers_period(df, period):
+                full.append(symbol)
+            else:
+                # Re-fetch the last stored session too, it may have been a partial bar, and
+                # the completed bar before it, which shows whether the history was re-adjusted
+                start = df.index[-min(len(df), 2)].strftime("%Y-%m-%d")
+                tails.setdefault(start, []).append(symbol)
+
+        if self.calendar is not None:
+            tails = self.stale_tails(tails, interval)
+        logging.info(f"Bar store ({interval}): {len(symbols) - len(full)} symbols cached, {len(full)} need full history, "
+                     f"{sum(map(len, tails.values()))} need new sessions")
+
+        if full:
+            downloaded = self.download_frames(full, period=period, interval=interval, empty=empty)
+            self.store.append(downloaded, interval)
+            self.mark_complete(downloaded, interval)
+        rebased = []
+        for start, group in tails.items():
+            downloaded = self.download_frames(group, period=None, interval=interval, start=start, empty=empty)
+            changed = readjusted(stored, downloaded)
+            rebased.extend(changed)
+            downloaded = {symbol: df for symbol, df in downloaded.items() if symbol not in changed}
+            self.store.append(downloaded, interval)
+            self.mark_complete(downloaded, interval, start)
+        if rebased:
+            logging.info(f"Bar store ({interval}): history re-adjusted for {', '.join(rebased)}, replacing stored bars")
+            downloaded = self.download_frames(rebased, period=period, interval=interval, empty=empty)
+            self.store.replace(downloaded, interval)
+            self.mark_complete(downloaded, interval)
+
+        frames = self.store.load(symbols, interval)
+        return {symbol: trim_to_period(df, period) for symbol, df in frames.items()}
+
+    def stale_tails(self, tails, interval):
+        """Keep only the {start: symbols} tail requests that have a session left to fetch"""
+        latest = self.calendar.latest_session()
+        stale = {}
+        for start, group in tails.items():
+            missing = self.store.missing_sessions(group, interval, self.calendar.sessions_between(start, latest))
+            group = [symbol for symbol in group if symbol in missing]
+            if group:
+                stale[start] = group
+        return stale
+
+    def mark_complete(self, frames, interval, start=None):
+        """Record the closed sessions from start to each symbol's last downloaded bar as complete
+
+        Without start only the last bar's session is recorded, which is all the next tail
+        check looks at. A session the provider has not published yet stays missing.
+        """
+        if self.calendar is None:
+            return
+        closed = self.calendar.last_closed_session()
+        by_session = {}
+        for symbol, df in frames.items():
+            if df is None or df.empty:
+                continue
+            last = min(df.index[-1].date(), closed)
+            for session in self.calendar.sessions_between(start or last, last):
+                by_session.setdefault(str(session), []).append(symbol)
+        for session, symbols in by_session.items():
+            self.store.mark_fetched(symbols, interval, session)
+
+    def download_frames(self, symbols, period="60d", interval="1d", start=None, end=None, empty=None):
+        """Download bars straight from the provider in chunks of tickers
+
+        Symbols missing from a chunk that succeeded are added to empty when it is given.
+        A chunk that raised, or that returned nothing for any of several tickers, says
+        nothing about its symbols (yfinance logs outages and throttling per ticker and
+        hands back an empty frame), so those are left out.
+        """
+        frames = {}
+
+        for i in range(0, len(symbols), self.chunk_size):
+            chunk = symbols[i:i + self.chunk_size]
+            tickers = [to_ticker(symbol, self.suffix) for symbol in chunk]
+            try:
+                raw = self.provider.download(tickers, period=period, interval=interval, start=start, end=end)
+            except Exception as e:
+                logging.error(f"Bulk download failed for {len(tickers)} tickers ({interval}): {e}")
+                continue
+
+            chunk_frames = self.split_frame(raw, chunk)
+            if empty is not None and (chunk_frames or len(chunk) == 1):
+                empty.update(symbol for symbol in chunk if symbol not in chunk_frames)
+            frames.update(chunk_frames)
+
+        missing = [symbol for symbol in symbols if symbol not in frames]
+        logging.info(f"Bulk fetched {len(frames)}/{len(symbols)} symbols ({period or start}, {interval})")
+        if missing:
+            logging.warning(f"No data returned for: {', '.join(missing)}")
+
+        return frames
+
+    def fetch_frames(self, symbols, requests):
+        """Serve several (period, interval) requests with one bulk download per interval
+
+        Requests sharing an interval are merged into the widest period and trimmed back
+        afterwards, so e.g. 60d, 10d and 2d daily bars cost a single round trip.
+        Returns {(period, interval): {symbol: DataFrame}}.
+        """
+        by_interval = {}
+        for period, interval in requests:
+            by_interval.setdefault(interval, []).append(period)
+
+        results = {}
+        for interval, periods in by_interval.items():
+            widest = max(periods, key=period_to_days)
+            frames = self.fetch(symbols, period=widest, interval=interval)
+            for period in periods:
+                results[(period, interval)] = {
+                    symbol: trim_to_period(df, period) for symbol, df in frames.items()
+                }
+
+        return results
+
+    def split_frame(self, raw, symbols):
+        """Split a ticker-grouped download into clean per-symbol frames"""
+        frames = {}
+        if raw is None or raw.empty:
+            return frames
+
+        for symbol in symbols:
+            ticker = to_ticker(symbol, self.suffix)
+            if isinstance(raw.columns, pd.MultiIndex):
+                if ticker not in raw.columns.get_level_values(0):
+                    continue
+                df = raw[ticker]
+            elif len(symbols) == 1:
+                df = raw
+            else:
+                continue
+
+            # The union index leaves all-NaN rows where a ticker had no bar
+            df = df.dropna(how="all")
+            if df.empty:
+                continue
+            frames[symbol] = df.copy()
+
+        return frames
@@ -0,0 +1,277 @@
+# Vectorized pattern detection for the intraday screener
+# Runs the screener's setup rules as boolean masks over every symbol and date at once
+
+from datetime import datetime
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
+from indicators import build_panel, compute_panel_indicators
+
+# Bars of history a symbol needs before it is screened for setups
+MIN_BARS = 30
+
+SETUP_COLUMNS = [
+    "Symbol", "Date", "Setup_Type", "Signal", "Confidence", "Entry", "Stop_Loss", "Target1", "Target2",
+    "Risk_Reward", "Volume_Ratio", "Trend_Strength", "Support", "Resistance", "ADX", "RSI",
+    "MACD_Signal", "Volatility", "Risk_Factor", "Expected_Movement", "Pattern", "Notes", "Timestamp",
+    "Hourly_Confirmation", "Hourly_RSI"
+]
+
+# Hourly bars fetched for multi-timeframe confirmation of daily setups
+HOURLY_PERIOD = "10d"
+HOURLY_INTERVAL = "1h"
+
+# Hourly_Confirmation values: rejected setups are dropped, so only these are ever saved
+NOT_CHECKED = "Not Checked"
+CONFIRMED = "Confirmed"
+UNAVAILABLE = "Unavailable"
+
+# Tunable thresholds of the setup and ranking rules, at their screener defaults
+PATTERN_PARAMS = MappingProxyType({
+    "volume_surge": 1.5,     # VolRatio above which an engulfing setup is High confidence
+    "adx_trend": 25,         # ADX above which a trend counts as Strong
+    "rsi_floor": 40,         # RSI band for pullback and momentum entries
+    "rsi_ceiling": 70,
+    "target1_atr": 1.5,      # ATR multiples for the first and second targets
+    "target2_atr": 2.5,
+    "max_risk_factor": 3.0,  # Risk_Factor above which a setup loses two ranking points
+})
+
+# Thresholds that only change ranking, so detected setups can be reused across them
+SCORING_PARAMS = ("max_risk_factor",)
+
+
+def frames_to_long(frames):
+    """Stack per-symbol indicator frames into one (Symbol, Date) indexed frame"""
+    frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+    long_df = pd.concat(frames, names=["Symbol", "Date"])
+    return long_df.sort_index(level=["Symbol", "Date"], sort_remaining=False)
+
+
+def pattern_params(params=None):
+    """PATTERN_PARAMS with the given overrides applied, rejecting unknown names"""
+    params = dict(params or {})
+    unknown = set(params) - set(PATTERN_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown pattern parameters: {', '.join(sorted(unknown))}")
+    return {**PATTERN_PARAMS, **params}
+
+
+def _market_trend(long_df, market_sentiment):
+    """Per-row market trend from a sentiment dict, a trend string, or a Series keyed by date"""
+    if isinstance(market_sentiment, pd.Series):
+        dates = long_df.index.get_level_values("Date").strftime("%Y-%m-%d")
+        return pd.Series(dates.map(market_sentiment), index=long_df.index).fillna("Neutral")
+    if isinstance(market_sentiment, str):
+        trend = market_sentiment
+    else:
+        trend = market_sentiment.get("Overall_Sentiment", "Neutral") if market_sentiment else "Neutral"
+    return pd.Series(trend, index=long_df.index)
+
+
+def _emit(rows, mask, order, setup_type, signal, confidence, entry, stop_loss, target1, target2, pattern, notes):
+    """Collect the rows matching a rule as setup records"""
+    if not mask.any():
+        return
+    rows.append(pd.DataFrame({
+        "Order": order,
+        "Setup_Type": setup_type,
+        "Signal": signal,
+        "Confidence": confidence[mask] if isinstance(confidence, pd.Series) else confidence,
+        "Entry": entry[mask],
+        "Stop_Loss": stop_loss[mask],
+        "Target1": target1[mask],
+        "Target2": target2[mask],
+        "Pattern": pattern,
+        "Notes": notes
+    }, index=mask.index[mask]))
+
+
+def detect_patterns(long_df, market_sentiment=None, latest_only=False, params=None):
+    """Evaluate every setup rule over a (Symbol, Date) indicator frame
+
+    market_sentiment may be the screener's sentiment dict, a trend string, or a Series of
+    trends keyed by 'YYYY-MM-DD' for historical evaluation. With latest_only, only each
+    symbol's last bar is screened, matching a live run. params overrides PATTERN_PARAMS.
+    Returns a DataFrame of setups.
+    """
+    params = pattern_params(params)
+    if long_df is None or long_df.empty:
+        return pd.DataFrame(columns=SETUP_COLUMNS)
+
+    df = long_df
+    grouped = df.groupby(level="Symbol", sort=False)
+    prev_open = grouped["Open"].shift(1)
+    prev_close = grouped["Close"].shift(1)
+    prev_ranges = pd.concat([grouped["CandleSize"].shift(lag) for lag in range(1, 5)], axis=1)
+
+    eligible = grouped.cumcount() + 1 >= MIN_BARS
+    if latest_only:
+        eligible &= grouped.cumcount(ascending=False) == 0
+
+    trend = _market_trend(df, market_sentiment)
+    bullish_market = eligible & trend.isin(["Bullish", "Neutral"])
+    bearish_market = eligible & trend.isin(["Bearish", "Neutral"])
+
+    o, h, l, c = df["Open"], df["High"], df["Low"], df["Close"]
+    atr, vol_ratio, adx = df["ATR"], df["VolRatio"], df["ADX"]
+    candle = df["CandleSize"]
+    target1, target2 = atr * params["target1_atr"], atr * params["target2_atr"]
+    volume_surge, adx_trend = params["volume_surge"], params["adx_trend"]
+    rsi_band = (df["RSI"] > params["rsi_floor"]) & (df["RSI"] < params["rsi_ceiling"])
+
+    def high_or_medium(condition):
+        return pd.Series(np.where(condition, "High", "Medium"), index=df.index)
+
+    rows = []
+
+    # 1. Bullish patterns
+    mask = bullish_market & (df["Engulfing"] == 1) & (l <= df["PrevLow"] * 1.01) & (vol_ratio > 1.0)
+    _emit(rows, mask, 0, "Bullish", "Engulfing at Support", high_or_medium((vol_ratio > volume_surge) & (adx > 20)),
+          c * 1.005, np.minimum(l, l - atr * 0.5), c + target1, c + target2,
+          "Bullish Engulfing", "Wait for breakout above day's high")
+
+    mask = (bullish_market & (c > df["SMA20"]) & (df["SMA20"] > df["SMA50"]) &
+            (l <= df["EMA21"] * 1.01) & (l > df["EMA21"] * 0.98) & (df["RSI"] > params["rsi_floor"]))
+    _emit(rows, mask, 1, "Bullish", "MA Pullback", high_or_medium(adx > adx_trend),
+          c * 1.01, np.minimum(l, df["EMA21"] * 0.97), c + target1, c + target2,
+          "EMA21 Support Bounce", "Strong trending setup")
+
+    mask = bullish_market & (candle < prev_ranges.min(axis=1)) & (vol_ratio > 0.8)
+    _emit(rows, mask, 2, "Bullish", "NR4 Breakout", "Medium",
+          h * 1.005, l * 0.995, h + candle * 1.5, h + candle * 2.5,
+          "Narrow Range", "Explosive move potential")
+
+    # 2. Bearish patterns
+    mask = (bearish_market & (c < o) & (h >= df["PrevHigh"] * 0.99) &
+            (o > prev_close) & (c < prev_open) & (vol_ratio > 1.0))
+    _emit(rows, mask, 3, "Bearish", "Engulfing at Resistance", high_or_medium((vol_ratio > volume_surge) & (adx > 20)),
+          c * 0.995, np.maximum(h, h + atr * 0.5), c - target1, c - target2,
+          "Bearish Engulfing", "Wait for breakdown below day's low")
+
+    mask = bearish_market & (h > df["BreakoutLevel"]) & (c < df["BreakoutLevel"]) & (vol_ratio > 1.2)
+    _emit(rows, mask, 4, "Bearish", "Failed Breakout", high_or_medium(df["UpperWick"] > df["BodySize"] * 1.5),
+          l * 0.995, h * 1.005, c - target1, c - target2,
+          "Failed Breakout", "Watch for high volume rejection")
+
+    # 3. Range-bound plays
+    inside = eligible & (df["InsideBar"] == 1) & (vol_ratio < 0.8)
+    upper_half = c > (h + l) / 2
+    _emit(rows, inside & upper_half, 5, "Range", "Inside Bar Breakout", "Medium",
+          h * 1.005, l * 0.995, h + candle, h + candle * 1.5,
+          "Inside Bar", "Wait for mother bar high break")
+    _emit(rows, inside & ~upper_half, 5, "Range", "Inside Bar Breakdown", "Medium",
+          l * 0.995, h * 1.005, l - candle, l - candle * 1.5,
+          "Inside Bar", "Wait for mother bar low break")
+
+    # 4. Momentum plays
+    mask = (eligible & (c > o) & (c > df["SMA5"]) & (df["SMA5"] > df["SMA20"]) &
+            rsi_band & (df["MACD"] > df["MACD_Signal"]))
+    _emit(rows, mask, 6, "Momentum", "Bull Momentum", high_or_medium((vol_ratio > 1.2) & (adx > adx_trend)),
+          c * 1.01, np.minimum(l, df["SMA5"] * 0.98), c * 1.02, c * 1.04,
+          "Momentum Continuation", "Strong trend continuation setup")
+
+    if not rows:
+        return pd.DataFrame(columns=SETUP_COLUMNS)
+
+    setups = pd.concat(rows)
+    for column in ["Entry", "Stop_Loss", "Target1", "Target2"]:
+        setups[column] = setups[column].round(2)
+
+    # Enhance patterns with additional metrics
+    latest = df.loc[setups.index]
+    setups["Symbol"] = setups.index.get_level_values("Symbol")
+    setups["Date"] = setups.index.get_level_values("Date").strftime("%Y-%m-%d")
+    setups["Risk_Reward"] = ((setups["Target1"] - setups["Entry"]) / (setups["Entry"] - setups["Stop_Loss"])).round(2)
+    setups["Volume_Ratio"] = latest["VolRatio"].round(2).to_numpy()
+    setups["Trend_Strength"] = np.select([latest["ADX"] > adx_trend, latest["ADX"] > 20], ["Strong", "Moderate"], "Weak")
+    setups["Support"] = latest["PrevLow"].round(2).to_numpy()
+    setups["Resistance"] = latest["PrevHigh"].round(2).to_numpy()
+    setups["ADX"] = latest["ADX"].round(2).to_numpy()
+    setups["RSI"] = latest["RSI"].round(2).to_numpy()
+    setups["MACD_Signal"] = np.where(latest["MACD"] > latest["MACD_Signal"], "Bullish", "Bearish")
+    setups["Volatility"] = latest["ATR%"].round(2).to_numpy()
+    setups["Risk_Factor"] = ((setups["Entry"] - setups["Stop_Loss"]).abs() / latest["Close"].to_numpy() * 100).round(2)
+    setups["Expected_Movement"] = (latest["ATR"] * 1.5).round(2).to_numpy()
+    setups["Timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    setups["Hourly_Confirmation"] = NOT_CHECKED
+    setups["Hourly_RSI"] = None
+
+    # A zero-risk setup has no defined reward ratio
+    setups = setups[np.isfinite(setups["Risk_Reward"])].reset_index(drop=True)
+
+    setups = setups.sort_values(["Symbol", "Date", "Order"], kind="stable")
+    return setups[SETUP_COLUMNS].reset_index(drop=True)
+
+
+def hourly_state(hourly_frames):
+    """Last hourly close, EMA21 and RSI per symbol, from the same indicator pass as the daily bars"""
+    frames = {symbol: df for symbol, df in hourly_frames.items() if df is not None and not df.empty}
+    if not frames:
+        return pd.DataFrame(columns=["Close", "EMA21", "RSI"])
+    indicators = compute_panel_indicators(build_panel(frames))
+    return pd.DataFrame({column: indicators[column].ffill().iloc[-1] for column in ["Close", "EMA21", "RSI"]})
+
+
+def confirm_setups(setups, hourly_frames):
+    """Filter daily setups by hourly trend and RSI agreement, recording the result on each
+
+    A long setup (Entry above Stop_Loss) needs the last hourly close above its EMA21 with
+    RSI above 50; a short setup needs both below. Setups without usable hourly bars are
+    kept and marked Unavailable rather than rejected on missing data.
+    """
+    if setups.empty:
+        return setups
+
+    state = hourly_state(hourly_frames).reindex(setups["Symbol"])
+    close, ema, rsi = (state[column].to_numpy(dtype=float) for column in ["Close", "EMA21", "RSI"])
+    available = ~(np.isnan(close) | np.isnan(ema) | np.isnan(rsi))
+    long_side = (setups["Entry"] > setups["Stop_Loss"]).to_numpy()
+
+    with np.errstate(invalid="ignore"):
+        agrees = np.where(long_side, (close > ema) & (rsi > 50), (close < ema) & (rsi < 50))
+
+    setups = setups.copy()
+    setups["Hourly_Confirmation"] = np.where(available, CONFIRMED, UNAVAILABLE)
+    setups["Hourly_RSI"] = pd.Series([round(float(value), 2) if ok else None for value, ok in zip(rsi, available)],
+                                     index=setups.index, dtype=object)
+    return setups[~available | agrees].reset_index(drop=True)
+
+
+def score_setups(setups, params=None):
+    """rank_setups' score for every setup at once, as an integer array"""
+    params = pattern_params(params)
+    confidence = setups["Confidence"].to_numpy()
+    setup_type = setups["Setup_Type"].to_numpy()
+    risk_reward = setups["Risk_Reward"].to_numpy(dtype=float)
+    volume_ratio = setups["Volume_Ratio"].to_numpy(dtype=float)
+    rsi = setups["RSI"].to_numpy(dtype=float)
+    risk_factor = setups["Risk_Factor"].to_numpy(dtype=float)
+    strong = setups["Trend_Strength"].to_numpy() == "Strong"
+    macd = setups["MACD_Signal"].to_numpy()
+
+    # Base score from confidence, then risk:reward, trend alignment, volume and extreme RSI
+    score = np.select([confidence == "High", confidence == "Medium"], [5, 3], 1)
+    score += np.select([risk_reward >= 3, risk_reward >= 2, risk_reward >= 1.5], [3, 2, 1], 0)
+    score += np.where(((setup_type == "Bullish") & strong & (macd == "Bullish")) |
+                      ((setup_type == "Bearish") & strong & (macd == "Bearish")), 2, 0)
+    score += np.select([volume_ratio >= 1.5, volume_ratio >= 1.0], [2, 1], 0)
+    score += np.where(((setup_type == "Bullish") & (rsi < 30)) | ((setup_type == "Bearish") & (rsi > 70)), 1, 0)
+
+    # Penalize for high risk factor
+    score -= np.select([risk_factor > params["max_risk_factor"], risk_factor > 2.0], [2, 1], 0)
+    return score
+
+
+def rank_daily(setups, top_n=5, one_per_symbol=False, params=None):
+    """Score setups and keep the top_n per Date, in the order rank_setups would list them
+
+    one_per_symbol keeps only the best-scoring setup of a symbol on each Date.
+    """
+    if setups.empty:
+        return setups.assign(Score=pd.Series(dtype=int))
+    ranked = setups.assign(Score=score_setups(setups, params))
+    ranked = ranked.sort_values(["Date", "Score"], ascending=[True, False], kind="stable")
+    if one_per_symbol:
+        ranked = ranked.drop_duplicates(["Date", "Symbol"])
+    return ranked.groupby("Date", sort=False).head(top_n).reset_index(drop=True)
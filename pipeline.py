@@ -0,0 +1,102 @@
+# Staged screening pipeline shared by the screeners
+# I/O threads fetch work units into a bounded queue, CPU workers screen them, results stream to a sink
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Marks the end of the fetch stage on the queue
+_DONE = object()
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def make_executor(kind, max_workers, initializer=None, initargs=()):
+    """CPU stage executor: 'process' for real parallelism, 'thread' for debugging or tiny runs"""
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs)
+    raise ValueError(f"Unknown executor: {kind}")
+
+
+def run_pipeline(items, fetch, process, sink, fetch_workers=8, cpu_workers=None, executor="process", queue_size=8):
+    """Run fetch -> process -> sink over work items with the stages overlapping
+
+    fetch(item) runs on I/O threads and returns a payload (None to skip the item).
+    Payloads wait in a bounded queue, so fetching pauses when the CPU stage falls behind.
+    process(payload) runs in the CPU executor and must be picklable for process workers.
+    sink(item, result) runs on the calling thread as each result finishes, e.g. a SQLite writer.
+    Returns per-stage counts and the elapsed time.
+    """
+    items = list(items)
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    stats = {"items": len(items), "fetched": 0, "processed": 0, "failed": 0}
+    start_time = time.time()
+    fetched = queue.Queue(maxsize=queue_size)
+
+    def fetch_item(item):
+        try:
+            payload = fetch(item)
+        except Exception as e:
+            logging.error(f"Pipeline fetch failed for {item}: {e}")
+            payload = None
+        if payload is not None:
+            fetched.put((item, payload))
+
+    def feed():
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+            list(fetch_pool.map(fetch_item, items))
+        fetched.put(_DONE)
+
+    def drain(futures, timeout):
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            item = futures.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Pipeline processing failed for {item}: {e}")
+                stats["failed"] += 1
+                continue
+            stats["processed"] += 1
+            sink(item, result)
+
+    feeder = threading.Thread(target=feed, name="pipeline-fetch", daemon=True)
+    feeder.start()
+
+    with make_executor(executor, cpu_workers) as cpu_pool:
+        in_flight = {}
+        while True:
+            # Stop taking fetched payloads while the CPU pool is saturated, so the fetch
+            # queue fills up and backpressure reaches the fetch threads
+            if len(in_flight) >= cpu_workers * 2:
+                drain(in_flight, None)
+                continue
+            try:
+                entry = fetched.get(timeout=0.05)
+            except queue.Empty:
+                if in_flight:
+                    drain(in_flight, 0)
+                continue
+            if entry is _DONE:
+                break
+            item, payload = entry
+            stats["fetched"] += 1
+            in_flight[cpu_pool.submit(process, payload)] = item
+            drain(in_flight, 0)
+
+        while in_flight:
+            drain(in_flight, None)
+
+    feeder.join()
+    stats["elapsed"] = round(time.time() - start_time, 2)
+    logging.info(f"Pipeline finished: {stats}")
+    return stats
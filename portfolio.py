@@ -0,0 +1,182 @@
+# Portfolio backtester for ranked intraday setups
+# Replays the top-N setups per day against capital, position limits and risk-based sizing on NumPy arrays
+
+import logging
+import numpy as np
+import pandas as pd
+from indicators import build_panel
+from patterns import rank_daily
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def is_long(setups):
+    """Trade direction per setup; Range setups trade towards their first target"""
+    setup_type = setups["Setup_Type"].to_numpy()
+    return np.isin(setup_type, ["Bullish", "Momentum"]) | \
+        ((setup_type == "Range") & (setups["Entry"].to_numpy(dtype=float) < setups["Target1"].to_numpy(dtype=float)))
+
+
+def next_session_bars(setups, panel):
+    """Open/high/low/close of the session after each setup's Date, NaN when there is none
+
+    panel is the {field: DataFrame(dates x symbols)} layout of build_panel.
+    """
+    dates = panel["Close"].index.strftime("%Y-%m-%d")
+    columns = panel["Close"].columns.get_indexer(setups["Symbol"])
+    rows = dates.get_indexer(setups["Date"]) + 1
+    valid = (columns >= 0) & (rows > 0) & (rows < len(dates))
+
+    bars = {}
+    for field in ["Open", "High", "Low", "Close"]:
+        values = panel[field].to_numpy(dtype=float)
+        out = np.full(len(setups), np.nan)
+        out[valid] = values[rows[valid], columns[valid]]
+        bars[field] = out
+    bars["Session"] = np.where(valid, np.asarray(dates)[np.minimum(np.maximum(rows, 0), len(dates) - 1)], None)
+    return bars
+
+
+def trade_results(setups, bars):
+    """R multiple and entry flag of every setup on its next session's daily bar
+
+    Uses the backtester's rules on one bar: entry when the bar trades through the entry
+    price (filled at the open on a gap through it), stop before target, a stop and a
+    target in the same bar scored as breakeven, otherwise exit at the close.
+    """
+    entry = setups["Entry"].to_numpy(dtype=float)
+    stop = setups["Stop_Loss"].to_numpy(dtype=float)
+    target1 = setups["Target1"].to_numpy(dtype=float)
+    target2 = setups["Target2"].to_numpy(dtype=float)
+    long_side = is_long(setups)
+    o, h, l, c = bars["Open"], bars["High"], bars["Low"], bars["Close"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        triggered = np.where(long_side, h >= entry, l <= entry) & ~np.isnan(c)
+        fill = np.where(long_side, np.maximum(entry, o), np.minimum(entry, o))
+        risk = np.abs(entry - stop)
+        safe_risk = np.where(risk > 0, risk, np.nan)
+        direction = np.where(long_side, 1.0, -1.0)
+
+        stop_hit = np.where(long_side, l <= stop, h >= stop)
+        target1_hit = np.where(long_side, h >= target1, l <= target1)
+        target2_hit = np.where(long_side, h >= target2, l <= target2)
+
+        r_multiple = np.select(
+            [stop_hit & target1_hit, stop_hit, target2_hit, target1_hit],
+            [0.0, direction * (stop - fill) / safe_risk, direction * (target2 - fill) / safe_risk,
+             direction * (target1 - fill) / safe_risk],
+            direction * (c - fill) / safe_risk
+        )
+    r_multiple = np.where(triggered & np.isfinite(r_multiple), r_multiple, 0.0)
+    return triggered, r_multiple
+
+
+def simulate(trades, initial_capital=1_000_000.0, risk_per_trade=0.01, max_positions=5, max_position_pct=0.25,
+             leverage=1.0, cost_pct=0.05):
+    """Replay ranked trades day by day with compounding, position and capital limits
+
+    trades needs Session, Risk_Factor, Triggered and R columns in rank order within each
+    session. Each trade risks risk_per_trade of start-of-day equity, sized from Risk_Factor
+    (stop distance in % of price) and capped at max_position_pct of equity. Orders are
+    allotted in rank order until max_positions or equity * leverage of notional is used;
+    intraday positions are flat by the close, so each day starts with full capacity.
+    cost_pct is the round-trip cost in % of notional for trades that fill.
+    Returns (equity Series indexed by session, trades with Notional and PnL).
+    """
+    trades = trades.reset_index(drop=True)
+    sessions, day_index = np.unique(trades["Session"].to_numpy(dtype=str), return_inverse=True)
+    rank_in_day = trades.groupby(day_index).cumcount().to_numpy()
+    stop_pct = trades["Risk_Factor"].to_numpy(dtype=float) / 100
+    triggered = trades["Triggered"].to_numpy(dtype=bool)
+    r_multiple = trades["R"].to_numpy(dtype=float)
+
+    # Per-unit-of-equity sizing is fixed per trade, so only the day loop compounds
+    with np.errstate(divide="ignore", invalid="ignore"):
+        notional_per_equity = np.minimum(np.where(stop_pct > 0, risk_per_trade / stop_pct, 0.0), max_position_pct)
+    eligible = rank_in_day < max_positions
+    day_start = np.searchsorted(day_index, np.arange(len(sessions)))
+    day_stop = np.append(day_start[1:], len(trades))
+
+    equity = np.empty(len(sessions))
+    notional = np.zeros(len(trades))
+    pnl = np.zeros(len(trades))
+    capital = float(initial_capital)
+    for day, (start, stop) in enumerate(zip(day_start, day_stop)):
+        size = np.where(eligible[start:stop], notional_per_equity[start:stop] * capital, 0.0)
+        allotted = np.cumsum(size) <= capital * leverage + 1e-9
+        size = np.where(allotted, size, 0.0)
+        filled = size * triggered[start:stop]
+        day_pnl = filled * stop_pct[start:stop] * r_multiple[start:stop] - filled * cost_pct / 100
+        notional[start:stop] = filled
+        pnl[start:stop] = day_pnl
+        capital += day_pnl.sum()
+        equity[day] = capital
+
+    trades = trades.assign(Notional=notional.round(2), PnL=pnl.round(2))
+    return pd.Series(equity, index=pd.to_datetime(sessions), name="Equity"), trades
+
+
+def session_equity(equity, panel, first, last):
+    """Equity on every panel session from first to last, flat on sessions without trades
+
+    simulate only records sessions with setups, and the annualized statistics count
+    sessions, so the quiet days in between have to be present as 0% returns.
+    """
+    dates = panel["Close"].index.strftime("%Y-%m-%d")
+    sessions = pd.to_datetime(dates[(dates >= first) & (dates <= last)])
+    return equity.reindex(sessions.union(equity.index)).ffill().rename(equity.name)
+
+
+def performance(equity, trades, initial_capital):
+    """Summary statistics of an equity curve and its trades"""
+    curve = pd.concat([pd.Series([initial_capital], index=[equity.index[0] - pd.Timedelta(days=1)]), equity]) \
+        if len(equity) else pd.Series([initial_capital])
+    daily_returns = curve.pct_change().dropna()
+    drawdown = curve / curve.cummax() - 1
+    taken = trades[trades["Notional"] > 0]
+    years = max(len(daily_returns) / TRADING_DAYS_PER_YEAR, 1e-9)
+    final = float(curve.iloc[-1])
+    volatility = daily_returns.std()
+
+    return {
+        "initial_capital": round(initial_capital, 2),
+        "final_equity": round(final, 2),
+        "total_return": round((final / initial_capital - 1) * 100, 2),
+        "cagr": round(((final / initial_capital) ** (1 / years) - 1) * 100, 2) if final > 0 else -100.0,
+        "max_drawdown": round(float(drawdown.min()) * 100, 2),
+        "sharpe": round(float(daily_returns.mean() / volatility * np.sqrt(TRADING_DAYS_PER_YEAR)), 2)
+        if volatility > 0 else 0.0,
+        "sessions": len(equity),
+        "trades": len(taken),
+        "win_rate": round(float((taken["PnL"] > 0).mean()) * 100, 2) if len(taken) else 0.0,
+        "avg_r": round(float(taken["R"].mean()), 2) if len(taken) else 0.0,
+        "skipped": int(((trades["Notional"] == 0) & trades["Triggered"]).sum()),
+    }, drawdown.iloc[1:] if len(equity) else drawdown
+
+
+def backtest_portfolio(setups, frames, top_n=5, initial_capital=1_000_000.0, panel=None, params=None, **limits):
+    """Rank setups per day, evaluate them on the next session and simulate the portfolio
+
+    Only the best setup of a symbol is traded on a given day.
+    setups is a detect_patterns frame (e.g. from replay); frames are the daily bars it
+    was computed from, or None when their panel is given instead. params are the ranking
+    thresholds and limits are passed to simulate. Returns (stats, equity, drawdown, trades).
+    """
+    ranked = rank_daily(setups, top_n, one_per_symbol=True, params=params)
+    panel = panel if panel is not None else build_panel(frames)
+    bars = next_session_bars(ranked, panel)
+    triggered, r_multiple = trade_results(ranked, bars)
+    trades = ranked.assign(Session=bars["Session"], Triggered=triggered, R=np.round(r_multiple, 4))
+    trades = trades[trades["Session"].notna()]
+    if trades.empty:
+        logging.info("Portfolio backtest: no setups with a following session")
+        empty = pd.Series(dtype=float, name="Equity")
+        stats, drawdown = performance(empty, trades.assign(Notional=0.0, PnL=0.0), initial_capital)
+        return stats, empty, drawdown, trades
+
+    equity, trades = simulate(trades, initial_capital=initial_capital, **limits)
+    equity = session_equity(equity, panel, trades["Session"].min(), trades["Session"].max())
+    stats, drawdown = performance(equity, trades, initial_capital)
+    logging.debug(f"Portfolio backtest: {stats}")
+    return stats, equity, drawdown, trades
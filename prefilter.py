@@ -0,0 +1,169 @@
+# Cheap prefilter stage for the intraday screener
+# Keeps a compact per-symbol daily summary (last close, average volume, ATR%) and drops untradeable symbols before the full fetch
+
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from screenerdb import get_db
+from indicators import build_panel
+
+# Bars averaged for volume / turnover, and for the true range behind ATR%
+SUMMARY_WINDOW = 20
+ATR_WINDOW = 14
+
+# Summaries older than this are ignored and the symbol goes through the full screen again
+SUMMARY_MAX_AGE_DAYS = 7
+
+SUMMARY_COLUMNS = ["Symbol", "Date", "Close", "Avg_Volume", "Avg_Turnover", "ATR_Pct"]
+
+# Prefilter thresholds; None disables a rule. All are off by default so the screener
+# output only changes when a threshold is asked for
+DEFAULT_RULES = {
+    "min_close": None,            # e.g. 20 for penny stocks: circuit limits and wide spreads
+    "min_avg_volume": None,       # shares per day, e.g. 100000
+    "min_avg_turnover": None,     # rupees per day
+    "min_atr_pct": None,          # e.g. 1.0, too quiet to reach intraday targets
+    "max_atr_pct": None,          # e.g. 15.0, too erratic for ATR based stops
+}
+
+
+def summarize(frames):
+    """Daily summary per symbol from OHLCV frames, computed on the aligned panel tail
+
+    ATR% uses a simple mean of the last ATR_WINDOW true ranges, which is close enough
+    to Wilder's ATR for a coarse filter and needs only the tail of the history.
+    """
+    frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS).set_index("Symbol")
+
+    panel = build_panel(frames)
+    tail = {field: values.iloc[-(SUMMARY_WINDOW + 1):] for field, values in panel.items()}
+    close, volume = tail["Close"], tail["Volume"]
+
+    prev_close = close.ffill().shift(1)
+    true_range = np.maximum(tail["High"] - tail["Low"],
+                            np.maximum((tail["High"] - prev_close).abs(), (tail["Low"] - prev_close).abs()))
+    last_close = close.ffill().iloc[-1]
+
+    summary = pd.DataFrame({
+        "Date": [frames[symbol].index[-1].strftime("%Y-%m-%d") for symbol in close.columns],
+        "Close": last_close.to_numpy(),
+        "Avg_Volume": volume.iloc[-SUMMARY_WINDOW:].mean().to_numpy(),
+        "Avg_Turnover": (close * volume).iloc[-SUMMARY_WINDOW:].mean().to_numpy(),
+        "ATR_Pct": (true_range.iloc[-ATR_WINDOW:].mean() / last_close * 100).to_numpy(),
+    }, index=pd.Index(close.columns, name="Symbol"))
+    return summary
+
+
+def enabled(rules=None):
+    """True if any prefilter rule has a threshold"""
+    rules = DEFAULT_RULES if rules is None else rules
+    return any(value is not None for value in rules.values())
+
+
+def passes(summary, rules=None):
+    """Boolean Series: which summarized symbols meet every enabled rule"""
+    rules = DEFAULT_RULES if rules is None else rules
+    mask = pd.Series(True, index=summary.index)
+    checks = [("min_close", "Close", np.greater_equal), ("min_avg_volume", "Avg_Volume", np.greater_equal),
+              ("min_avg_turnover", "Avg_Turnover", np.greater_equal), ("min_atr_pct", "ATR_Pct", np.greater_equal),
+              ("max_atr_pct", "ATR_Pct", np.less_equal)]
+    for rule, column, compare in checks:
+        if rules.get(rule) is not None:
+            # NaN metrics (no volume reported, bad bars) fail the rule
+            mask &= compare(summary[column].astype(float), rules[rule])
+    return mask
+
+
+def filter_frames(frames, rules=None):
+    """Apply the prefilter rules to freshly fetched bars, returning (kept frames, dropped symbols, summary)"""
+    summary = summarize(frames)
+    mask = passes(summary, rules)
+    kept = {symbol: frames[symbol] for symbol in summary.index[mask]}
+    return kept, list(summary.index[~mask]), summary
+
+
+class DailySummary:
+    """SQLite table of per-symbol daily summaries used to prefilter before fetching"""
+
+    def __init__(self, db_path="intraday_data.db", max_age_days=SUMMARY_MAX_AGE_DAYS):
+        self.db = get_db(db_path)
+        self.max_age_days = max_age_days
+        self.init_database()
+
+    def init_database(self):
+        """Create the summary table if it does not exist"""
+        try:
+            self.db.execute('''
+            CREATE TABLE IF NOT EXISTS daily_summary (
+                Symbol TEXT PRIMARY KEY,
+                Date TEXT,
+                Close REAL,
+                Avg_Volume REAL,
+                Avg_Turnover REAL,
+                ATR_Pct REAL
+            )
+            ''')
+        except Exception as e:
+            logging.error(f"Summary database initialization error: {e}")
+
+    def save(self, summary):
+        """Upsert summary rows, returning how many were written"""
+        if summary.empty:
+            return 0
+        try:
+            rows = summary.reset_index()[SUMMARY_COLUMNS].astype(object)
+            rows = rows.where(rows.notna(), None)
+            return self.db.executemany('''
+            INSERT OR REPLACE INTO daily_summary (Symbol, Date, Close, Avg_Volume, Avg_Turnover, ATR_Pct)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', list(rows.itertuples(index=False, name=None)))
+        except Exception as e:
+            logging.error(f"Error saving daily summary: {e}")
+            return 0
+
+    def update(self, frames):
+        """Summarize and store fetched bars, returning the summary"""
+        summary = summarize(frames)
+        self.save(summary)
+        return summary
+
+    def load(self, symbols):
+        """Summaries no older than max_age_days for the given symbols, indexed by symbol"""
+        symbols = list(symbols)
+        oldest = (datetime.now() - timedelta(days=self.max_age_days)).strftime("%Y-%m-%d")
+        try:
+            placeholders = ",".join("?" * len(symbols))
+            return self.db.read_frame(f'''
+            SELECT {", ".join(SUMMARY_COLUMNS)} FROM daily_summary
+            WHERE Date >= ? AND Symbol IN ({placeholders})
+            ''', (oldest, *symbols)).set_index("Symbol")
+        except Exception as e:
+            logging.error(f"Error loading daily summary: {e}")
+            return pd.DataFrame(columns=SUMMARY_COLUMNS).set_index("Symbol")
+
+    def prefilter(self, symbols, rules=None, store=None):
+        """Split symbols into (kept, dropped) using stored summaries, without touching the network
+
+        Symbols without a fresh summary are summarized from the bar store when one is
+        given; symbols still unknown are kept so the full screen can summarize them.
+        """
+        symbols = list(symbols)
+        if not enabled(rules):
+            return symbols, []
+        summary = self.load(symbols)
+        missing = [symbol for symbol in symbols if symbol not in summary.index]
+        if missing and store is not None:
+            # The summary only looks at the trailing window, so only that much history is read
+            cached = self.update(store.load_tail(missing, "1d", SUMMARY_WINDOW + 1))
+            oldest = (datetime.now() - timedelta(days=self.max_age_days)).strftime("%Y-%m-%d")
+            summary = pd.concat([summary, cached[cached["Date"] >= oldest]])
+
+        failing = set(summary.index[~passes(summary, rules)])
+        kept = [symbol for symbol in symbols if symbol not in failing]
+        dropped = [symbol for symbol in symbols if symbol in failing]
+        logging.info(f"Prefilter: {len(kept)} of {len(symbols)} symbols kept, "
+                     f"{len(symbols) - len(summary)} without a fresh summary")
+        return kept, dropped
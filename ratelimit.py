@@ -0,0 +1,170 @@
+# Shared request throttling for market data providers
+# Token-bucket rate limiter that adapts to throttling signals, with jittered exponential backoff
+
+import time
+import random
+import logging
+import threading
+
+# Exception class names and message fragments that mean the provider is throttling us
+THROTTLE_ERRORS = ("YFRateLimitError",)
+THROTTLE_MESSAGES = ("too many requests", "rate limit")
+
+# Errors worth retrying after a pause; anything else (bad symbol, parse error) fails fast
+TRANSIENT_ERRORS = ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "ChunkedEncodingError",
+                    "RemoteDisconnected", "TimeoutError", "CurlError")
+
+
+class RateLimitedError(Exception):
+    """The provider answered with a throttling signal"""
+
+    def __init__(self, message="Rate limited", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _status_code(exc):
+    """HTTP status carried by a requests/curl style exception, if any"""
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(exc):
+    """Seconds the provider asked us to wait, from the exception or its Retry-After header"""
+    if getattr(exc, "retry_after", None) is not None:
+        return float(exc.retry_after)
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc):
+    """Return 'throttle', 'transient' or None (not retryable) for a failed request"""
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    status = _status_code(exc)
+    message = str(exc).lower()
+
+    if isinstance(exc, RateLimitedError) or names & set(THROTTLE_ERRORS) or status == 429:
+        return "throttle"
+    if any(fragment in message for fragment in THROTTLE_MESSAGES):
+        return "throttle"
+    if names & set(TRANSIENT_ERRORS) or (status is not None and status >= 500):
+        return "transient"
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until enough tokens have accumulated"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate):
+        """Change the refill rate, keeping the tokens accrued so far"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def drain(self):
+        """Empty the bucket so every caller waits for fresh tokens"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = 0.0
+
+    def acquire(self, tokens=1):
+        """Take tokens, sleeping outside the lock until they are available; returns seconds waited"""
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate follows the provider's throttling signals
+
+    The rate creeps up after each successful request and is cut multiplicatively on
+    every throttling answer (AIMD), so runs settle near the fastest rate the provider
+    tolerates. Failed calls are retried with full-jitter exponential backoff, honouring
+    Retry-After when the provider sends one.
+    """
+
+    def __init__(self, rate=10.0, capacity=100, min_rate=0.5, max_rate=50.0, increase=0.2, decrease=0.5,
+                 max_retries=5, base_delay=1.0, max_delay=60.0, name="provider"):
+        self.bucket = TokenBucket(rate, capacity)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.name = name
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "waited": 0.0}
+
+    @property
+    def rate(self):
+        """Current request rate in tokens per second"""
+        return self.bucket.rate
+
+    def on_success(self):
+        """Additive increase towards max_rate"""
+        with self.lock:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.increase))
+
+    def on_throttle(self):
+        """Multiplicative decrease, and stop the burst that triggered it"""
+        with self.lock:
+            self.stats["throttled"] += 1
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.decrease))
+            self.bucket.drain()
+        logging.warning(f"{self.name} throttled us, request rate lowered to {self.bucket.rate:.2f}/s")
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential delay for a retry attempt, at least Retry-After if given"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def call(self, fn, *args, cost=1, description="request", **kwargs):
+        """Run fn under the rate limit, retrying throttled and transient failures"""
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire(cost)
+            with self.lock:
+                self.stats["requests"] += 1
+                self.stats["waited"] += waited
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None or attempt == self.max_retries:
+                    raise
+                if kind == "throttle":
+                    self.on_throttle()
+                delay = self.backoff_delay(attempt, _retry_after(e))
+                with self.lock:
+                    self.stats["retries"] += 1
+                logging.warning(f"{description} failed ({kind}: {e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.on_success()
+            return result
@@ -0,0 +1,366 @@
+# Streaming HTML report writer shared by the screeners and the backtester
+# Rows are rendered through module-level HTML templates and written straight to the file
+
+import os
+import logging
+
+
+class HtmlTemplate:
+    """HTML fragment with {field} placeholders, rendered per row with str.format_map"""
+
+    def __init__(self, text):
+        self.text = text
+        self.render = text.format_map
+
+
+class ReportWriter:
+    """Write a report section by section without holding the document in memory
+
+    The file is written under a temporary name and moved into place on success, so a
+    failed run never leaves a truncated report behind.
+    """
+
+    def __init__(self, path, buffer_size=1 << 16):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.rows_written = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self._tmp_path, "w", buffering=self.buffer_size, encoding="utf-8")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            try:
+                os.remove(self._tmp_path)
+            except OSError as e:
+                logging.error(f"Error removing partial report {self._tmp_path}: {e}")
+        return False
+
+    def write(self, template, **values):
+        """Render a single template, such as a header or footer"""
+        self._file.write(template.render(values))
+
+    def write_rows(self, template, rows):
+        """Render and stream an iterable of row dicts, returning how many were written"""
+        count = 0
+        for row in rows:
+            self._file.write(template.render(row))
+            count += 1
+        self.rows_written += count
+        return count
+
+
+def frame_records(df, columns):
+    """Yield DataFrame rows as dicts of plain Python values, column-wise instead of iterrows"""
+    for values in zip(*(df[column].tolist() for column in columns)):
+        yield dict(zip(columns, values))
+
+
+def rate_class(value, good, fair, classes=("win", "neutral", "loss")):
+    """CSS class for a metric: the first class at or above good, the second at or above fair"""
+    return classes[0] if value >= good else classes[1] if value >= fair else classes[2]
+
+
+# Intraday setups report
+
+SETUP_REPORT_HEADER = HtmlTemplate("""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <title>Intraday Trading Setups for {trading_day_description} ({next_trading_day})</title>
+                <style>
+                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
+                    .header {{ background-color: #f0f0f0; padding: 10px; border-radius: 5px; margin-bottom: 20px; }}
+                    .setup {{ border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; }}
+                    .high {{ border-left: 5px solid green; }}
+                    .medium {{ border-left: 5px solid orange; }}
+                    .bullish {{ background-color: rgba(0, 255, 0, 0.05); }}
+                    .bearish {{ background-color: rgba(255, 0, 0, 0.05); }}
+                    .range {{ background-color: rgba(0, 0, 255, 0.05); }}
+                    .momentum {{ background-color: rgba(255, 165, 0, 0.05); }}
+                    table {{ border-collapse: collapse; width: 100%; }}
+                    th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+                    th {{ background-color: #f2f2f2; }}
+                    .chart {{ margin-top: 15px; text-align: center; }}
+                    .note {{ color: #666; font-style: italic; }}
+                    .rank {{ font-weight: bold; background-color: #f2f2f2; padding: 5px 10px; border-radius: 15px; margin-right: 10px; }}
+                </style>
+            </head>
+            <body>
+                <div class="header">
+                    <h1>Top {count} Intraday Trading Setups for {trading_day_description} ({next_trading_day})</h1>
+                    <p>Generated on: {now}</p>
+                    <p class="note">{analyzed_day_note} (Last market date: {sentiment_date})</p>
+                    <p>Market Sentiment: <strong>{sentiment_text}</strong></p>
+                    <p>Showing top {count} setups ranked by score</p>
+                    <p class="note">Charts reused from cache: {charts_reused} of {charts_total}</p>
+                </div>
+""")
+
+SETUP_CARD = HtmlTemplate("""
+                <div class="setup {confidence_class} {setup_class}">
+                    <h2><span class="rank">#{rank}</span> {Symbol} - {Signal} ({Confidence}) - Score: {Score}</h2>
+                    <p><strong>Pattern:</strong> {Pattern}</p>
+                    <p><strong>Notes:</strong> {Notes}</p>
+                    <p><strong>Hourly Confirmation:</strong> {Hourly_Confirmation}</p>
+
+                    <table>
+                        <tr>
+                            <th>Entry</th>
+                            <th>Stop Loss</th>
+                            <th>Target 1</th>
+                            <th>Target 2</th>
+                            <th>Risk:Reward</th>
+                        </tr>
+                        <tr>
+                            <td>{Entry}</td>
+                            <td>{Stop_Loss}</td>
+                            <td>{Target1}</td>
+                            <td>{Target2}</td>
+                            <td>{Risk_Reward}</td>
+                        </tr>
+                    </table>
+
+                    <table style="margin-top: 15px;">
+                        <tr>
+                            <th>ADX</th>
+                            <th>RSI</th>
+                            <th>Volume Ratio</th>
+                            <th>Trend Strength</th>
+                            <th>MACD Signal</th>
+                        </tr>
+                        <tr>
+                            <td>{ADX}</td>
+                            <td>{RSI}</td>
+                            <td>{Volume_Ratio}</td>
+                            <td>{Trend_Strength}</td>
+                            <td>{MACD_Signal}</td>
+                        </tr>
+                    </table>
+                    {chart_html}
+                </div>
+""")
+
+SETUP_CHART = HtmlTemplate("""
+                    <div class="chart">
+                        <img src="charts/{chart_filename}" alt="{Symbol} Chart" style="max-width: 100%; height: auto;">
+                    </div>
+""")
+
+# Backtest report
+
+BACKTEST_REPORT_HEADER = HtmlTemplate("""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <title>{title}</title>
+                <style>
+                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
+                    .header {{ background-color: #f0f0f0; padding: 10px; border-radius: 5px; margin-bottom: 20px; }}
+                    .stats {{ display: flex; justify-content: space-between; margin-bottom: 20px; }}
+                    .stat-box {{ background-color: #f9f9f9; padding: 15px; border-radius: 5px; width: 30%; text-align: center; }}
+                    table {{ border-collapse: collapse; width: 100%; margin-top: 20px; }}
+                    th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+                    th {{ background-color: #f2f2f2; }}
+                    .win {{ color: green; }}
+                    .loss {{ color: red; }}
+                    .neutral {{ color: orange; }}
+                </style>
+            </head>
+            <body>
+                <div class="header">
+                    <h1>{title}</h1>
+                    <p>Generated on: {now}</p>
+                </div>
+""")
+
+BACKTEST_STATS = HtmlTemplate("""
+                <div class="stats">
+                    <div class="stat-box">
+                        <h3>Win Rate</h3>
+                        <h2 class="{win_rate_class}">{win_rate}%</h2>
+                        <p>{wins} wins, {losses} losses</p>
+                    </div>
+                    <div class="stat-box">
+                        <h3>Profit Factor</h3>
+                        <h2 class="{profit_factor_class}">{profit_factor}</h2>
+                        <p>Profit to Loss Ratio</p>
+                    </div>
+                    <div class="stat-box">
+                        <h3>Entry Rate</h3>
+                        <h2>{entry_rate}%</h2>
+                        <p>{entry_triggered} of {total_setups} setups</p>
+                    </div>
+                </div>
+""")
+
+SETUP_TYPE_TABLE_HEADER = HtmlTemplate("""
+                <h2>Performance by Setup Type</h2>
+                <table>
+                    <tr>
+                        <th>Setup Type</th>
+                        <th>Count</th>
+                        <th>Win Rate</th>
+                        <th>Wins</th>
+                        <th>Losses</th>
+                        <th>Breakeven</th>
+                        <th>No Entry</th>
+                    </tr>
+""")
+
+SETUP_TYPE_ROW = HtmlTemplate("""
+                <tr>
+                    <td>{setup_type}</td>
+                    <td>{count}</td>
+                    <td class="{win_rate_class}">{win_rate}%</td>
+                    <td>{wins}</td>
+                    <td>{losses}</td>
+                    <td>{breakeven}</td>
+                    <td>{no_entry}</td>
+                </tr>
+""")
+
+RESULT_TABLE_HEADER = HtmlTemplate("""
+                </table>
+
+                <h2>Individual Setup Results</h2>
+                <table>
+                    <tr>
+                        <th>Symbol</th>
+                        <th>Date</th>
+                        <th>Setup Type</th>
+                        <th>Signal</th>
+                        <th>Entry Triggered</th>
+                        <th>Outcome</th>
+                        <th>Profit Factor</th>
+                    </tr>
+""")
+
+RESULT_ROW = HtmlTemplate("""
+                <tr>
+                    <td>{Symbol}</td>
+                    <td>{Date}</td>
+                    <td>{Setup_Type}</td>
+                    <td>{Signal}</td>
+                    <td>{entry_triggered}</td>
+                    <td class="{outcome_class}">{Outcome}</td>
+                    <td>{profit_factor}</td>
+                </tr>
+""")
+
+TABLE_FOOTER = HtmlTemplate("""
+                </table>
+""")
+
+DOCUMENT_FOOTER = HtmlTemplate("""
+            </body>
+            </html>
+""")
+
+# Walk-forward optimization report, under BACKTEST_REPORT_HEADER
+
+WALK_FORWARD_STATS = HtmlTemplate("""
+                <div class="stats">
+                    <div class="stat-box">
+                        <h3>Out-of-Sample Return</h3>
+                        <h2 class="{oos_return_class}">{oos_return}%</h2>
+                        <p>{baseline_return}% with default thresholds</p>
+                    </div>
+                    <div class="stat-box">
+                        <h3>Out-of-Sample Sharpe</h3>
+                        <h2 class="{oos_sharpe_class}">{oos_sharpe}</h2>
+                        <p>Train {train_sharpe}, defaults {baseline_sharpe}</p>
+                    </div>
+                    <div class="stat-box">
+                        <h3>Beat Defaults</h3>
+                        <h2>{beat_baseline} of {windows}</h2>
+                        <p>Efficiency {efficiency}, worst drawdown {worst_drawdown}%</p>
+                    </div>
+                </div>
+""")
+
+WALK_FORWARD_TABLE_HEADER = HtmlTemplate("""
+                <h2>Walk-Forward Windows</h2>
+                <table>
+                    <tr>
+                        <th>Window</th>
+                        <th>Train</th>
+                        <th>Test</th>
+                        <th>Selected Thresholds</th>
+                        <th>Train Sharpe</th>
+                        <th>Test Sharpe</th>
+                        <th>Test Return</th>
+                        <th>Default Return</th>
+                        <th>Max Drawdown</th>
+                        <th>Trades</th>
+                        <th>Win Rate</th>
+                    </tr>
+""")
+
+WALK_FORWARD_ROW = HtmlTemplate("""
+                <tr>
+                    <td>{Window}</td>
+                    <td>{Train_Start} to {Train_End}</td>
+                    <td>{Test_Start} to {Test_End}</td>
+                    <td>{params}</td>
+                    <td>{train_sharpe}</td>
+                    <td class="{sharpe_class}">{test_sharpe}</td>
+                    <td class="{return_class}">{test_return}%</td>
+                    <td>{baseline_return}%</td>
+                    <td>{max_drawdown}%</td>
+                    <td>{trades}</td>
+                    <td>{win_rate}%</td>
+                </tr>
+""")
+
+# Swing breakout report
+
+BREAKOUT_REPORT_HEADER = HtmlTemplate("""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <title>Stock Breakout Report - {date}</title>
+                <style>
+                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
+                    h1 {{ color: #333366; }}
+                    table {{ border-collapse: collapse; width: 100%; margin-top: 20px; }}
+                    th, td {{ padding: 8px; text-align: left; border: 1px solid #ddd; }}
+                    th {{ background-color: #f2f2f2; }}
+                    tr:nth-child(even) {{ background-color: #f9f9f9; }}
+                    .green {{ color: green; }}
+                    .red {{ color: red; }}
+                    .strong {{ font-weight: bold; }}
+                </style>
+            </head>
+            <body>
+                <h1>Stock Breakout Scanner - {title}</h1>
+                <p>Generated on: {now}</p>
+                <table>
+                    <tr>
+                        <th>Symbol</th>
+                        <th>Signal</th>
+                        <th>Reason</th>
+                        <th>Close</th>
+                        <th>Volume Ratio</th>
+                        <th>Stop Loss</th>
+                        <th>Target</th>
+                    </tr>
+""")
+
+BREAKOUT_ROW = HtmlTemplate("""
+                    <tr>
+                        <td class="{signal_class}">{Symbol}</td>
+                        <td class="{signal_class}">{Signal}</td>
+                        <td>{Reason}</td>
+                        <td class="{close_class}">{Close}</td>
+                        <td>{Volume_Ratio}</td>
+                        <td>{Stop_Loss}</td>
+                        <td>{Target}</td>
+                    </tr>
+""")
@@ -0,0 +1,71 @@
+# Shared SQLite persistence for the screeners
+# One WAL-mode connection per database per process, with batched writes
+
+import os
+import sqlite3
+import logging
+import threading
+import pandas as pd
+
+_databases = {}
+_registry_lock = threading.Lock()
+
+
+def get_db(db_path):
+    """Return the process-wide ScreenerDB for a database file, opening it on first use"""
+    key = (os.getpid(), os.path.abspath(db_path))
+    with _registry_lock:
+        if key not in _databases:
+            _databases[key] = ScreenerDB(db_path)
+        return _databases[key]
+
+
+class ScreenerDB:
+    """Single SQLite connection shared by every thread of a run
+
+    WAL mode lets readers run alongside the writer, and each batch goes through one
+    executemany call inside a single transaction.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        logging.info(f"Opened {db_path} in WAL mode")
+
+    def execute(self, sql, params=()):
+        """Run a single statement in its own transaction"""
+        with self.lock, self.conn:
+            self.conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        """Write a whole batch of rows in one transaction"""
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.lock, self.conn:
+            self.conn.executemany(sql, rows)
+        return len(rows)
+
+    def query(self, sql, params=()):
+        """Run a SELECT and return (column names, rows)"""
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            return columns, cursor.fetchall()
+
+    def read_frame(self, sql, params=()):
+        """Run a SELECT into a DataFrame"""
+        with self.lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def close(self):
+        """Close the connection and drop it from the registry"""
+        with _registry_lock:
+            for key, db in list(_databases.items()):
+                if db is self:
+                    del _databases[key]
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,107 @@
+# Shared-memory transport for OHLCV bars between screener processes
+# Packs a chunk of symbols into one (fields x timestamps x symbols) block so workers attach instead of unpickling frames
+
+import logging
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from indicators import PRICE_FIELDS
+
+
+class SharedBars:
+    """Picklable handle to a chunk of bars held in a shared memory segment
+
+    The segment holds int64 timestamps followed by a float64 (fields x timestamps x symbols)
+    panel with NaN where a symbol had no bar. Only this small handle crosses process
+    boundaries; the creating process owns the segment and must call release().
+    """
+
+    def __init__(self, name, symbols, n_rows, fields, tz=None, index_name=None):
+        self.name = name
+        self.symbols = symbols
+        self.n_rows = n_rows
+        self.fields = fields
+        self.tz = tz
+        self.index_name = index_name
+        self._segment = None
+
+    @classmethod
+    def create(cls, frames, fields=PRICE_FIELDS):
+        """Copy per-symbol frames into a new shared memory segment, returning its handle"""
+        frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+        if not frames:
+            return None
+
+        symbols = list(frames)
+        index = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))))
+        n_rows = len(index)
+        size = max(8, n_rows * 8 + len(fields) * n_rows * len(symbols) * 8)
+
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        handle = cls(segment.name, symbols, n_rows, list(fields), str(index.tz) if index.tz else None, index.name)
+        handle._segment = segment
+
+        timestamps, panel = handle._views(segment)
+        timestamps[:] = index.as_unit("ns").asi8
+        panel[:] = np.nan
+        for column, symbol in enumerate(symbols):
+            df = frames[symbol]
+            rows = index.get_indexer(df.index)
+            for f, field in enumerate(fields):
+                panel[f, rows, column] = df[field].to_numpy(dtype=float)
+        return handle
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_segment"] = None
+        return state
+
+    def _views(self, segment):
+        """Numpy views of the timestamp vector and the bar panel inside a segment"""
+        timestamps = np.ndarray((self.n_rows,), dtype=np.int64, buffer=segment.buf)
+        panel = np.ndarray((len(self.fields), self.n_rows, len(self.symbols)), dtype=np.float64,
+                           buffer=segment.buf, offset=self.n_rows * 8)
+        return timestamps, panel
+
+    def _read(self):
+        """Attach to the segment and copy out the index and panel, then detach"""
+        segment = self._segment or shared_memory.SharedMemory(name=self.name)
+        try:
+            timestamps, panel = self._views(segment)
+            index = pd.DatetimeIndex(timestamps.copy().view("datetime64[ns]"), name=self.index_name)
+            if self.tz:
+                index = index.tz_localize("UTC").tz_convert(self.tz)
+            values = panel.copy()
+            del timestamps, panel
+        finally:
+            if segment is not self._segment:
+                segment.close()
+        return index, values
+
+    def panel(self):
+        """Load the bars as {field: DataFrame(timestamps x symbols)}, the layout build_panel returns"""
+        index, values = self._read()
+        return {field: pd.DataFrame(values[f], index=index, columns=self.symbols)
+                for f, field in enumerate(self.fields)}
+
+    def frames(self):
+        """Load the bars as {symbol: DataFrame}, dropping timestamps where a symbol had no bar"""
+        index, values = self._read()
+        frames = {}
+        for column, symbol in enumerate(self.symbols):
+            df = pd.DataFrame(values[:, :, column].T, index=index, columns=self.fields)
+            frames[symbol] = df[df["Close"].notna()]
+        return frames
+
+    def release(self):
+        """Free the segment; only the creating process should call this"""
+        if self._segment is None:
+            return
+        try:
+            self._segment.close()
+            self._segment.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Error releasing shared bars {self.name}: {e}")
+        self._segment = None
@@ -0,0 +1,161 @@
+# Parameter sweep over the pattern thresholds
+# Screens and backtests every grid point against one indicator panel computed once and shared with worker processes
+
+import os
+import json
+import time
+import logging
+import itertools
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from concurrent.futures import as_completed
+from indicators import build_panel, compute_panel_indicators, panel_to_frames
+from patterns import detect_patterns, frames_to_long, pattern_params, SCORING_PARAMS
+from portfolio import backtest_portfolio
+from pipeline import make_executor
+from sharedbars import SharedBars
+
+# Grid used when none is given: 81 points around the screener defaults
+DEFAULT_GRID = {
+    "volume_surge": [1.2, 1.5, 2.0],
+    "adx_trend": [20, 25, 30],
+    "target1_atr": [1.0, 1.5, 2.0],
+    "max_risk_factor": [2.0, 3.0, 4.0],
+}
+
+# Statistics reported for every parameter set, in table order
+SWEEP_STATS = ["sharpe", "total_return", "cagr", "max_drawdown", "win_rate", "avg_r", "trades", "skipped"]
+
+# Indicator frame and price panel attached once per worker
+_worker = {}
+
+# Detection results kept per worker, one entry per set of detection thresholds
+DETECTION_CACHE_SIZE = 32
+
+
+def load_grid(path):
+    """Read a {parameter: [values]} grid from a JSON file"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def expand_grid(grid):
+    """Every combination of a {parameter: [values]} grid as override dicts
+
+    Combinations with an empty RSI band or a second target inside the first are skipped.
+    """
+    pattern_params(grid)
+    names = list(grid)
+    values = [value if isinstance(value, (list, tuple)) else [value] for value in grid.values()]
+    points = []
+    for combo in itertools.product(*values):
+        point = dict(zip(names, combo))
+        params = pattern_params(point)
+        if params["rsi_floor"] >= params["rsi_ceiling"] or params["target2_atr"] <= params["target1_atr"]:
+            continue
+        points.append(point)
+    return points
+
+
+def detection_key(point):
+    """Hashable form of the thresholds in point that change which setups are detected"""
+    return tuple(sorted((name, value) for name, value in point.items() if name not in SCORING_PARAMS))
+
+
+def group_points(points):
+    """Batch grid points that share detection thresholds, so each batch is screened once"""
+    groups = {}
+    for point in points:
+        groups.setdefault(detection_key(point), []).append(point)
+    return list(groups.values())
+
+
+def share_indicators(frames):
+    """Compute indicators for frames once and place them in shared memory for the workers"""
+    indicators = compute_panel_indicators(build_panel(frames))
+    return SharedBars.create(panel_to_frames(indicators), fields=list(indicators))
+
+
+def init_worker(bars, market_sentiment):
+    """Attach to the shared indicators and build the long frame detect_patterns needs"""
+    panel = bars.panel()
+    _worker["long"] = frames_to_long(panel_to_frames(panel))
+    _worker["panel"] = panel
+    _worker["sentiment"] = market_sentiment
+    detected_setups.cache_clear()
+
+
+def worker_dates():
+    """'YYYY-MM-DD' session dates of the worker's shared history"""
+    return np.asarray(_worker["panel"]["Close"].index.strftime("%Y-%m-%d"))
+
+
+@lru_cache(maxsize=DETECTION_CACHE_SIZE)
+def detected_setups(key):
+    """Setups over the worker's whole history for one detection_key, computed once per worker"""
+    return detect_patterns(_worker["long"], _worker["sentiment"], params=dict(key))
+
+
+def evaluate_point(point, setups, top_n, limits):
+    """Portfolio statistics of one parameter set on its setups, None if the backtest fails"""
+    try:
+        stats, _, _, _ = backtest_portfolio(setups, None, top_n=top_n, panel=_worker["panel"], params=point, **limits)
+    except Exception as e:
+        logging.error(f"Sweep backtest failed for {point}: {e}")
+        return None
+    return {**point, "setups": len(setups), **{name: stats[name] for name in SWEEP_STATS}}
+
+
+def _run_points(points, top_n, limits):
+    """Screen with the detection thresholds of a batch, then backtest each point's ranking"""
+    setups = detected_setups(detection_key(points[0]))
+    results = (evaluate_point(point, setups, top_n, limits) for point in points)
+    return [result for result in results if result is not None]
+
+
+def rank_results(rows, names, sort_by="sharpe"):
+    """Order sweep results best first, parameters then statistics, with a Rank column"""
+    columns = list(names) + ["setups"] + SWEEP_STATS
+    if not rows:
+        return pd.DataFrame(columns=["Rank"] + columns)
+    table = pd.DataFrame(rows)[columns]
+    table = table.sort_values([sort_by, "total_return"], ascending=False, kind="stable").reset_index(drop=True)
+    table.insert(0, "Rank", range(1, len(table) + 1))
+    return table
+
+
+def run_sweep(frames, grid, market_sentiment=None, top_n=5, workers=None, executor="process", sort_by="sharpe",
+              **limits):
+    """Backtest the portfolio for every point of a parameter grid
+
+    frames are daily bars per symbol; indicators are computed from them once and shared
+    with the workers, which only rerun detection and the portfolio simulation. limits go
+    to backtest_portfolio (initial_capital, max_positions, risk_per_trade, ...).
+    Returns the ranked table of parameter sets.
+    """
+    start_time = time.time()
+    points = expand_grid(grid)
+    groups = group_points(points)
+    bars = share_indicators(frames)
+    if bars is None or not groups:
+        logging.info("Parameter sweep: nothing to run")
+        return rank_results([], grid, sort_by)
+
+    workers = min(workers or os.cpu_count() or 1, len(groups))
+    logging.info(f"Sweeping {len(points)} parameter sets in {len(groups)} screening batches on {workers} workers")
+    rows = []
+    try:
+        with make_executor(executor, workers, initializer=init_worker,
+                           initargs=(bars, market_sentiment)) as pool:
+            futures = [pool.submit(_run_points, group, top_n, limits) for group in groups]
+            for future in as_completed(futures):
+                try:
+                    rows.extend(future.result())
+                except Exception as e:
+                    logging.error(f"Sweep batch failed: {e}")
+    finally:
+        bars.release()
+
+    logging.info(f"Parameter sweep finished {len(rows)} of {len(points)} sets in {time.time() - start_time:.1f}s")
+    return rank_results(rows, grid, sort_by)
@@ -3,14 +3,12 @@
 
 import requests
 import pandas as pd
-import time
-import sqlite3
-import random
 import logging
 import os
 import json
+import argparse
 from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 import yfinance as tf
 from fake_useragent import UserAgent
@@ -21,6 +19,14 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import warnings
 import http.client
+from marketdata import MarketDataClient, yahoo_call
+from barstore import BarStore
+from screenerdb import get_db
+from pipeline import run_pipeline, chunked
+from sharedbars import SharedBars
+from universe import UniverseLoader, filter_liquidity
+from tradingcalendar import get_calendar
+from reportwriter import ReportWriter, frame_records, BREAKOUT_REPORT_HEADER, BREAKOUT_ROW, TABLE_FOOTER, DOCUMENT_FOOTER
 http.client.HTTPConnection.debuglevel = 0
 
 # Set up logging
@@ -57,12 +63,69 @@ ADDITIONAL_SYMBOLS = [
     "HINDPETRO", "NMDC", "LALPATHLAB", "AFFLE", "POLYCAB", "DIXON", "COFORGE", "DEEPAKNTR"
 ]
 
+# Symbols per bulk download / CPU work unit in the screening pipeline
+SCREEN_CHUNK_SIZE = 25
+
+
+def history_records(hist, days=30):
+    """Format OHLCV bars as newest-first dicts, limited to the requested number of days"""
+    dates = hist.index.strftime("%Y-%m-%d")
+    data = [
+        {"date": date, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for date, o, h, l, c, v in zip(dates, hist["Open"].tolist(), hist["High"].tolist(),
+                                       hist["Low"].tolist(), hist["Close"].tolist(), hist["Volume"].tolist())
+    ]
+    
+    # Sort by date descending and limit to requested days
+    data.sort(key=lambda x: x["date"], reverse=True)
+    return data[:days]
+
+
+def run_screen_history(payload):
+    """Unpack a fetched (frames or SharedBars, index_name, days) payload for screen_history"""
+    bars, index_name, days = payload
+    frames = bars.frames() if isinstance(bars, SharedBars) else bars
+    return screen_history(frames, index_name, days)
+
+
+def screen_history(frames, index_name, days=30):
+    """CPU stage of the screening pipeline: breakout signals for one chunk of symbols
+
+    Runs in a worker process, so it only takes and returns plain picklable data.
+    """
+    results = []
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for symbol, hist in frames.items():
+        try:
+            data = history_records(hist, days) if hist is not None and not hist.empty else []
+            if len(data) < 10:
+                logging.warning(f"Insufficient data for {symbol}: got {len(data)} days")
+                continue
+            
+            result = StockScreener.calculate_breakout(data[0], data[1:])
+            if not result:
+                continue
+                
+            result["Symbol"] = symbol
+            result["IndexName"] = index_name
+            result["Timestamp"] = timestamp
+            results.append(result)
+        except Exception as e:
+            logging.error(f"Error processing {symbol}: {e}")
+    return results
+
+
 class StockScreener:
     def __init__(self):
         self.ua = UserAgent()
         self.session = requests.Session()
         self.output_dir = "/home/zero/trading/swing_output"
         os.makedirs(self.output_dir, exist_ok=True)
+        self.calendar = get_calendar()
+        self.market_data = MarketDataClient(store=BarStore("stock_data.db"), calendar=self.calendar)
+        self.universe = UniverseLoader("stock_data.db")
+        self._metadata = []
+        self.db = get_db("stock_data.db")
         self.init_database()
         
     def get_random_headers(self):
@@ -80,10 +143,7 @@ class StockScreener:
     def init_database(self):
         """Initialize SQLite database with proper schema"""
         try:
-            conn = sqlite3.connect("stock_data.db")
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.db.execute('''
             CREATE TABLE IF NOT EXISTS breakout_results (
                 Symbol TEXT,
                 IndexName TEXT,
@@ -107,7 +167,12 @@ class StockScreener:
             )
             ''')
             
-            cursor.execute('''
+            # The primary key already covers Symbol lookups; add one for Date filters
+            self.db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_breakout_results_date ON breakout_results (Date)
+            ''')
+            
+            self.db.execute('''
             CREATE TABLE IF NOT EXISTS symbol_metadata (
                 Symbol TEXT PRIMARY KEY,
                 Name TEXT,
@@ -118,8 +183,6 @@ class StockScreener:
             )
             ''')
             
-            conn.commit()
-            conn.close()
             logging.info("Database initialized successfully")
         except Exception as e:
             logging.error(f"Database initialization error: {e}")
@@ -128,7 +191,7 @@ class StockScreener:
         """Get stock metadata from Yahoo Finance"""
         try:
             ticker = tf.Ticker(f"{symbol}.NS")
-            info = ticker.info
+            info = yahoo_call(lambda: ticker.info, description=f"Metadata for {symbol}")
             
             return {
                 "Symbol": symbol,
@@ -149,44 +212,8 @@ class StockScreener:
                 "LastUpdated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
     
-    def get_historical_data(self, symbol, days=30):
-        """Get historical data using yfinance library"""
-        try:
-            logging.info(f"Fetching data for {symbol}")
-            ticker = tf.Ticker(f"{symbol}.NS")
-            
-            # Get data for slightly more days to account for market holidays
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days*1.5)
-            
-            # Get historical data
-            hist = ticker.history(start=start_date.strftime("%Y-%m-%d"), end=end_date.strftime("%Y-%m-%d"))
-            
-            if hist.empty:
-                logging.warning(f"No historical data found for {symbol}")
-                return []
-            
-            # Format the data
-            data = []
-            for index, row in hist.iterrows():
-                data.append({
-                    "date": index.strftime("%Y-%m-%d"),
-                    "open": row["Open"],
-                    "high": row["High"],
-                    "low": row["Low"],
-                    "close": row["Close"],
-                    "volume": row["Volume"]
-                })
-            
-            # Sort by date descending and limit to requested days
-            data.sort(key=lambda x: x["date"], reverse=True)
-            return data[:days]
-            
-        except Exception as e:
-            logging.error(f"Error fetching historical data for {symbol}: {e}")
-            return []
-
-    def calculate_breakout(self, latest, previous):
+    @staticmethod
+    def calculate_breakout(latest, previous):
         """Calculate breakout patterns with additional metrics"""
         if not latest or not previous or len(previous) < 5:
             return None
@@ -315,72 +342,27 @@ class StockScreener:
             "Gap_Percentage": round(gap_percentage, 2)
         }
 
-    def process_symbol(self, symbol, index_name):
-        """Process a single symbol with retries"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Add random delay to avoid rate limiting
-                time.sleep(random.uniform(0.5, 2.0))
-                
-                # Get the data
-                data = self.get_historical_data(symbol)
-                
-                if not data or len(data) < 10:
-                    logging.warning(f"Insufficient data for {symbol}: got {len(data) if data else 0} days")
-                    return None
-                
-                # Calculate breakout signals
-                result = self.calculate_breakout(data[0], data[1:])
-                
-                if not result:
-                    return None
-                    
-                result["Symbol"] = symbol
-                result["IndexName"] = index_name
-                result["Timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Get and save metadata if we have a result
-                try:
-                    metadata = self.get_stock_metadata(symbol)
-                    self.save_metadata(metadata)
-                except Exception as e:
-                    logging.error(f"Error saving metadata for {symbol}: {e}")
-                
-                return result
-                
-            except Exception as e:
-                logging.error(f"Error processing {symbol} (Attempt {attempt+1}): {str(e)}")
-                time.sleep(random.uniform(2, 5))
-                
-        return None
-        
-    def save_metadata(self, metadata):
-        """Save stock metadata to database"""
-        if not metadata:
+    def save_metadata(self, metadata_list):
+        """Save stock metadata to database in one batch"""
+        if not metadata_list:
             return
             
         try:
-            conn = sqlite3.connect("stock_data.db")
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            saved = self.db.executemany('''
             INSERT OR REPLACE INTO symbol_metadata 
             (Symbol, Name, Sector, Industry, MarketCap, LastUpdated)
             VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
+            ''', [(
                 metadata["Symbol"],
                 metadata["Name"],
                 metadata["Sector"],
                 metadata["Industry"],
                 metadata["MarketCap"],
                 metadata["LastUpdated"]
-            ))
-            
-            conn.commit()
-            conn.close()
+            ) for metadata in metadata_list])
+            logging.info(f"Saved metadata for {saved} symbols")
         except Exception as e:
-            logging.error(f"Error saving metadata for {metadata['Symbol']}: {e}")
+            logging.error(f"Error saving metadata: {e}")
 
     def save_to_db(self, results):
         """Save results to SQLite database with improved error handling"""
@@ -388,53 +370,92 @@ class StockScreener:
             logging.warning("No results to save to database")
             return
             
-        conn = None
         try:
-            conn = sqlite3.connect("stock_data.db")
-            cursor = conn.cursor()
-            
-            for result in results:
-                try:
-                    cursor.execute('''
-                    INSERT OR REPLACE INTO breakout_results 
-                    (Symbol, IndexName, Date, Open, High, Low, Close, Volume, 
-                    Avg_Volume, Volume_Ratio, Candle, Signal, Reason, 
-                    Resistance, Support, Risk_Reward, Volume_Strength, Timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        result["Symbol"],
-                        result["IndexName"],
-                        result["Date"],
-                        result["Open"],
-                        result["High"],
-                        result["Low"],
-                        result["Close"],
-                        result["Volume"],
-                        result["Avg_Volume"],
-                        result["Volume_Ratio"],
-                        result["Candle"],
-                        result["Signal"],
-                        result["Reason"],
-                        result["Resistance"],
-                        result["Support"],
-                        result["Risk_Reward"],
-                        result["Volume_Strength"],
-                        result["Timestamp"]
-                    ))
-                except Exception as e:
-                    logging.error(f"Error inserting {result['Symbol']}: {e}")
-                    continue
-                    
-            conn.commit()
-            logging.info(f"Saved {len(results)} records to database")
+            saved = self.db.executemany('''
+            INSERT OR REPLACE INTO breakout_results 
+            (Symbol, IndexName, Date, Open, High, Low, Close, Volume, 
+            Avg_Volume, Volume_Ratio, Candle, Signal, Reason, 
+            Resistance, Support, Risk_Reward, Volume_Strength, Timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                result["Symbol"],
+                result["IndexName"],
+                result["Date"],
+                result["Open"],
+                result["High"],
+                result["Low"],
+                result["Close"],
+                result["Volume"],
+                result["Avg_Volume"],
+                result["Volume_Ratio"],
+                result["Candle"],
+                result["Signal"],
+                result["Reason"],
+                result["Resistance"],
+                result["Support"],
+                result["Risk_Reward"],
+                result["Volume_Strength"],
+                result["Timestamp"]
+            ) for result in results])
+            logging.info(f"Saved {saved} records to database")
         except Exception as e:
             logging.error(f"Database error: {e}")
+
+    def screen_universe(self, symbols_dict, days=30, fetch_workers=8, cpu_workers=None, executor="process",
+                        min_avg_volume=None, min_avg_turnover=None):
+        """Screen every index through the fetch -> breakout -> SQLite pipeline
+        
+        Chunks are bulk-downloaded on I/O threads, screened in CPU workers and written to
+        the database as soon as each chunk finishes. Symbols that return no data are
+        remembered as bad and illiquid ones are dropped before the CPU stage.
+        Returns {index_name: [results]}.
+        """
+        index_results = {index_name: [] for index_name in symbols_dict}
+        items = [(index_name, chunk) for index_name, symbols in symbols_dict.items()
+                 for chunk in chunked(symbols, SCREEN_CHUNK_SIZE)]
+        
+        shared = []
+        
+        def fetch(item):
+            index_name, chunk = item
+            # Period based so the bar store only has to fetch the missing tail
+            empty = set()
+            frames = self.market_data.fetch(chunk, period=f"{int(days*1.5)}d", empty=empty)
+            self.universe.record_fetch(chunk, frames, empty)
+            frames, illiquid = filter_liquidity(frames, min_avg_volume, min_avg_turnover)
+            if illiquid:
+                logging.info(f"Skipped {len(illiquid)} illiquid {index_name} symbols: {', '.join(illiquid)}")
+            if executor != "process":
+                return frames, index_name, days
+            # Process workers attach to shared memory rather than unpickling DataFrames
+            bars = SharedBars.create(frames)
+            if bars is None:
+                return None
+            shared.append(bars)
+            return bars, index_name, days
+            
+        def save(item, results):
+            index_results[item[0]].extend(results)
+            self.save_to_db(results)
+            
+        try:
+            stats = run_pipeline(items, fetch, run_screen_history, save,
+                                 fetch_workers=fetch_workers, cpu_workers=cpu_workers, executor=executor)
         finally:
-            if conn:
-                conn.close()
+            for bars in shared:
+                bars.release()
+        logging.info(f"Screened {sum(len(chunk) for _, chunk in items)} symbols in {stats['elapsed']}s")
+        return index_results
 
-    def run(self, symbols_dict=None):
-        """Run the screener with the specified symbols or default lists"""
+    def run(self, symbols_dict=None, workers=None, executor="process", universe_path=None,
+            min_avg_volume=None, min_avg_turnover=None):
+        """Run the screener with the specified symbols or default lists
+        
+        workers sets the number of CPU workers (default: all cores) and executor picks
+        'process' or 'thread' workers for the screening stage. universe_path loads the
+        index lists from a CSV/JSON file, and the minimum average volume / turnover filter
+        out illiquid names.
+        """
         start_time = datetime.now()
         logging.info(f"Starting stock screener at {start_time}")
         
@@ -443,35 +464,29 @@ class StockScreener:
                 "NIFTY50": NIFTY50_SYMBOLS,
                 "MIDCAP_SMALLCAP": ADDITIONAL_SYMBOLS
             }
+        symbols_dict = self.universe.load_groups(universe_path, default=symbols_dict)
         
         all_results = []
         
-        for index_name, symbols in symbols_dict.items():
-            logging.info(f"\nProcessing {len(symbols)} symbols from {index_name}...")
-            index_results = []
-            
-            # Process symbols in parallel
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {executor.submit(self.process_symbol, symbol, index_name): symbol for symbol in symbols}
-                
-                for future in futures:
-                    symbol = futures[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            index_results.append(result)
-                    except Exception as e:
-                        logging.error(f"Error in future for {symbol}: {str(e)}")
-            
+        # Fetch, screen and save every index in overlapping stages
+        index_results = self.screen_universe(symbols_dict, cpu_workers=workers, executor=executor,
+                                             min_avg_volume=min_avg_volume, min_avg_turnover=min_avg_turnover)
+        
+        # Metadata lookups are I/O only, so fetch them on threads for the symbols with signals
+        signal_symbols = [result["Symbol"] for results in index_results.values() for result in results]
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            self._metadata = [metadata for metadata in executor.map(self.get_stock_metadata, signal_symbols) if metadata]
+        
+        for index_name, results in index_results.items():
             # Filter interesting signals
-            breakouts = [r for r in index_results if r["Signal"] in ["Strong Breakout", "Gap Up Breakout", "Resistance Breakout"]]
-            potentials = [r for r in index_results if r["Signal"] == "Potential Breakout"]
+            breakouts = [r for r in results if r["Signal"] in ["Strong Breakout", "Gap Up Breakout", "Resistance Breakout"]]
+            potentials = [r for r in results if r["Signal"] == "Potential Breakout"]
             
             logging.info(f"Found {len(breakouts)} strong breakouts and {len(potentials)} potential breakouts in {index_name}")
             
             # Save index-specific results
-            if index_results:
-                df = pd.DataFrame(index_results)
+            if results:
+                df = pd.DataFrame(results)
                 
                 # Save all signals for this index
                 all_filename = f"{self.output_dir}/{index_name}_all_{datetime.now().strftime('%Y%m%d')}.xlsx"
@@ -483,7 +498,7 @@ class StockScreener:
                     breakouts_filename = f"{self.output_dir}/{index_name}_breakouts_{datetime.now().strftime('%Y%m%d')}.xlsx"
                     df_breakouts.to_excel(breakouts_filename, index=False)
                 
-                all_results.extend(index_results)
+                all_results.extend(results)
         
         # Save all results
         if all_results:
@@ -509,8 +524,8 @@ class StockScreener:
             if not potential_signals.empty:
                 potential_signals.to_excel(potential_filename, index=False)
             
-            # Save to database
-            self.save_to_db(all_results)
+            # Results were saved as each chunk finished; metadata goes in one batch
+            self.save_metadata(self._metadata)
             
             # Create HTML report with charts
             self.create_html_report(strong_signals, "strong_breakouts")
@@ -538,65 +553,27 @@ class StockScreener:
             # Create an HTML file with the results
             html_file = f"{self.output_dir}/{report_type}_{datetime.now().strftime('%Y%m%d')}.html"
             
-            # HTML template with basic styling
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Stock Breakout Report - {datetime.now().strftime('%Y-%m-%d')}</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    h1 {{ color: #333366; }}
-                    table {{ border-collapse: collapse; width: 100%; margin-top: 20px; }}
-                    th, td {{ padding: 8px; text-align: left; border: 1px solid #ddd; }}
-                    th {{ background-color: #f2f2f2; }}
-                    tr:nth-child(even) {{ background-color: #f9f9f9; }}
-                    .green {{ color: green; }}
-                    .red {{ color: red; }}
-                    .strong {{ font-weight: bold; }}
-                </style>
-            </head>
-            <body>
-                <h1>Stock Breakout Scanner - {report_type.replace('_', ' ').title()}</h1>
-                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                <table>
-                    <tr>
-                        <th>Symbol</th>
-                        <th>Signal</th>
-                        <th>Reason</th>
-                        <th>Close</th>
-                        <th>Volume Ratio</th>
-                        <th>Stop Loss</th>
-                        <th>Target</th>
-                    </tr>
-            """
-            
-            # Add each row to the table
-            for _, row in df.iterrows():
-                signal_class = "strong" if "Strong" in row["Signal"] else ""
-                close_class = "green" if row["Close"] > row["Open"] else "red"
-                
-                html_content += f"""
-                    <tr>
-                        <td class="{signal_class}">{row["Symbol"]}</td>
-                        <td class="{signal_class}">{row["Signal"]}</td>
-                        <td>{row["Reason"]}</td>
-                        <td class="{close_class}">{row["Close"]}</td>
-                        <td>{row["Volume_Ratio"]}</td>
-                        <td>{row.get("Stop_Loss", row["Support"])}</td>
-                        <td>{row.get("Target", "-")}</td>
-                    </tr>
-                """
-            
-            html_content += """
-                </table>
-            </body>
-            </html>
-            """
-            
-            # Write the HTML content to a file
-            with open(html_file, "w") as f:
-                f.write(html_content)
+            # Precompute per-row fields column-wise, then stream rows through the template
+            rows = pd.DataFrame({
+                "Symbol": df["Symbol"],
+                "Signal": df["Signal"],
+                "Reason": df["Reason"],
+                "Close": df["Close"],
+                "Volume_Ratio": df["Volume_Ratio"],
+                "Stop_Loss": df["Stop_Loss"] if "Stop_Loss" in df.columns else df["Support"],
+                "Target": df["Target"] if "Target" in df.columns else "-",
+                "signal_class": df["Signal"].str.contains("Strong").map({True: "strong", False: ""}),
+                "close_class": (df["Close"] > df["Open"]).map({True: "green", False: "red"})
+            })
+            
+            with ReportWriter(html_file) as writer:
+                writer.write(BREAKOUT_REPORT_HEADER,
+                             date=datetime.now().strftime('%Y-%m-%d'),
+                             title=report_type.replace('_', ' ').title(),
+                             now=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                writer.write_rows(BREAKOUT_ROW, frame_records(rows, list(rows.columns)))
+                writer.write(TABLE_FOOTER)
+                writer.write(DOCUMENT_FOOTER)
                 
             logging.info(f"HTML report created: {html_file}")
         except Exception as e:
@@ -604,12 +581,26 @@ class StockScreener:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Breakout screener for NSE stocks")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of screening workers (default: one per CPU core)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="run the screening stage in worker processes or threads")
+    parser.add_argument("--universe", metavar="PATH",
+                        help="CSV or JSON symbol list (JSON may group symbols by index) to screen instead of the built-in lists")
+    parser.add_argument("--min-avg-volume", type=float, default=None, metavar="SHARES",
+                        help="skip symbols whose 20-day average volume is below SHARES")
+    parser.add_argument("--min-avg-turnover", type=float, default=None, metavar="RUPEES",
+                        help="skip symbols whose 20-day average traded value is below RUPEES")
+    args = parser.parse_args()
+    
     try:
         logging.info("Starting Stock Breakout Screener")
         
         # Create and run the screener
         screener = StockScreener()
-        results = screener.run()
+        results = screener.run(workers=args.workers, executor=args.executor, universe_path=args.universe,
+                               min_avg_volume=args.min_avg_volume, min_avg_turnover=args.min_avg_turnover)
         
         if results is not None:
             print(f"Found {len(results)} signals.")
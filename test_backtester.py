@@ -0,0 +1,98 @@
+# Tests for the vectorized next-day setup evaluation
+# Feeds hand-built 5m sessions to IntradayBacktester.evaluate_setups, no download or database involved
+
+import pandas as pd
+import pytest
+from intraday import IntradayBacktester
+
+LONG = {"Setup_Type": "Bullish", "Signal": "BUY", "Entry": 100.0, "Stop_Loss": 98.0, "Target1": 103.0, "Target2": 106.0}
+SHORT = {"Setup_Type": "Bearish", "Signal": "SELL", "Entry": 100.0, "Stop_Loss": 102.0, "Target1": 97.0, "Target2": 94.0}
+
+
+def session_bars(bars, start="2025-03-04 09:15"):
+    """5m frame from (high, low, close) tuples, opening at the previous close"""
+    high, low, close = (list(column) for column in zip(*bars))
+    return pd.DataFrame({"Open": [close[0]] + close[:-1], "High": high, "Low": low, "Close": close,
+                         "Volume": [1000.0] * len(bars)},
+                        index=pd.date_range(start, periods=len(bars), freq="5min"))
+
+
+CASES = [
+    # name, setup, bars, outcome, profit factor, first hit, exit time
+    ("long target1", LONG, [(100.5, 99.5, 100), (101, 99.8, 100.8), (103.2, 100.5, 103)],
+     "Win", 1.5, "Target1", "09:25"),
+    ("short target1", SHORT, [(100.5, 99.5, 100), (100, 96.5, 97)],
+     "Win", 1.5, "Target1", "09:20"),
+    ("long stop", LONG, [(100.5, 99.5, 100), (100, 97.5, 98), (104, 98, 103.5)],
+     "Loss", -1.0, "Stop", "09:20"),
+    ("short stop", SHORT, [(100.5, 99.5, 100), (102.5, 100, 102)],
+     "Loss", -1.0, "Stop", "09:20"),
+    ("stop and target in one bar", LONG, [(100.5, 99.5, 100), (103.5, 97.5, 100)],
+     "Breakeven", 0.0, "Ambiguous", "09:20"),
+    ("long target2 before close", LONG, [(100.5, 99.5, 100), (103.5, 100, 103), (106.5, 103, 106), (106, 104, 105)],
+     "Win", 3.0, "Target2", "09:25"),
+    ("short target2 before close", SHORT, [(100.5, 99.5, 100), (100, 96.5, 97), (97, 93.5, 94), (95, 93, 94)],
+     "Win", 3.0, "Target2", "09:25"),
+    ("long exit at close", LONG, [(100.5, 99.5, 100), (102, 99, 101), (102.5, 100, 101.5)],
+     "Small Win", 0.75, "None", "09:25"),
+    ("short exit at close", SHORT, [(100.5, 99.5, 100), (101, 99.5, 100.5)],
+     "Small Loss", -0.25, "None", "09:20"),
+]
+
+NO_ENTRY_CASES = [
+    ("long never reaches entry", LONG, [(99.5, 98.5, 99), (99.8, 98.2, 99.5)]),
+    ("long gaps through entry", LONG, [(105, 101, 104), (107, 102, 106)]),
+    ("short gaps through entry", SHORT, [(99, 95, 96), (96, 93, 94)]),
+]
+
+
+@pytest.fixture
+def backtester():
+    # Skip __init__, evaluation needs no store, calendar or provider
+    return IntradayBacktester.__new__(IntradayBacktester)
+
+
+def evaluate(backtester, setup, bars):
+    setup = {"Symbol": "AAA", "Date": "2025-03-03", **setup}
+    results = backtester.evaluate_setups([setup], [session_bars(bars)])
+    assert len(results) == 1
+    return results[0]
+
+
+@pytest.mark.parametrize("name,setup,bars,outcome,profit_factor,first_hit,exit_time", CASES, ids=[case[0] for case in CASES])
+def test_evaluate_setups_outcomes(backtester, name, setup, bars, outcome, profit_factor, first_hit, exit_time):
+    result = evaluate(backtester, setup, bars)
+    assert result["Entry_Triggered"]
+    assert result["Outcome"] == outcome
+    assert result["Profit_Factor"] == pytest.approx(profit_factor)
+    assert result["First_Hit"] == first_hit
+    assert result["Entry_Time"] == "09:15"
+    assert result["Exit_Time"] == exit_time
+
+
+@pytest.mark.parametrize("name,setup,bars", NO_ENTRY_CASES, ids=[case[0] for case in NO_ENTRY_CASES])
+def test_evaluate_setups_no_entry(backtester, name, setup, bars):
+    result = evaluate(backtester, setup, bars)
+    assert not result["Entry_Triggered"]
+    assert result["Outcome"] == "No Entry"
+    assert result["Profit_Factor"] == 0.0
+    assert "Exit_Time" not in result
+
+
+def test_evaluate_setups_batch_matches_single(backtester):
+    # Sessions of different lengths are padded into one matrix, results keep setup order
+    setups = [{"Symbol": name, "Date": "2025-03-03", **setup} for name, setup, *_ in CASES]
+    batch = backtester.evaluate_setups(setups, [session_bars(case[2]) for case in CASES])
+    assert [result["Outcome"] for result in batch] == [case[3] for case in CASES]
+    assert [result["Symbol"] for result in batch] == [case[0] for case in CASES]
+
+
+def test_evaluate_setups_excursions(backtester):
+    result = evaluate(backtester, LONG, [(100.5, 99.5, 100), (101, 99, 100.8), (103.2, 100.5, 103)])
+    assert result["MAE"] == 0.5
+    assert result["MFE"] == 1.6
+    assert result["Time_In_Trade"] == 10.0
+
+
+def test_evaluate_setups_skips_missing_bars(backtester):
+    assert backtester.evaluate_setups([{"Symbol": "AAA", **LONG}], [pd.DataFrame()]) == []
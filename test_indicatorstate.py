@@ -0,0 +1,125 @@
+# Tests for the incremental indicator engine
+# Checks IndicatorStateStore against the vectorized panel indicators on synthetic bars
+
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import build_panel, compute_panel_indicators, panel_to_frames
+from indicatorstate import IndicatorState, IndicatorStateStore
+from patterns import MIN_BARS
+
+
+def make_bars(sessions, seed=0):
+    """Random-walk daily OHLCV frame with consistent highs and lows"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, sessions)))
+    open_ = close * (1 + rng.normal(0, 0.005, sessions))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, sessions))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, sessions))
+    volume = rng.integers(10_000, 500_000, sessions).astype(float)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=pd.bdate_range("2025-01-01", periods=sessions))
+
+
+def panel_window(bars):
+    """Last MIN_BARS indicator rows computed from the full history in one vectorized pass"""
+    frame = panel_to_frames(compute_panel_indicators(build_panel({"AAA": bars})))["AAA"]
+    return frame.iloc[-MIN_BARS:]
+
+
+def assert_matches_panel(state, bars):
+    pd.testing.assert_frame_equal(state.frame(), panel_window(bars), check_dtype=False, check_index_type=False,
+                                  check_freq=False, check_names=False, rtol=1e-9)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IndicatorStateStore(str(tmp_path / "state.db"))
+
+
+def test_advance_matches_panel_across_runs(store, tmp_path):
+    bars = make_bars(120)
+    store.advance({"AAA": bars.iloc[:70]}, "1d")
+
+    # A second store on the same database reads the state back instead of warming up again
+    reloaded = IndicatorStateStore(str(tmp_path / "state.db"))
+    state = reloaded.advance({"AAA": bars}, "1d")["AAA"]
+    assert state.bars == 120
+    assert_matches_panel(state, bars)
+
+
+def test_dumps_loads_round_trip():
+    bars = make_bars(80)
+    state = IndicatorState()
+    for timestamp, values in zip(bars.index[:60], bars.to_numpy()):
+        state.update(timestamp, *values)
+
+    restored = IndicatorState.loads(*state.dumps())
+    pd.testing.assert_frame_equal(restored.frame(), state.frame())
+    for timestamp, values in zip(bars.index[60:], bars.to_numpy()[60:]):
+        restored.update(timestamp, *values)
+    assert_matches_panel(restored, bars)
+
+
+def stale_case(bars, timestamps_from, scale=1.0, drop=None):
+    """State over the first 40 bars, and the timestamps and closes of a later bar frame"""
+    state = IndicatorState()
+    for timestamp, values in zip(bars.index[:40], bars.to_numpy()[:40]):
+        state.update(timestamp, *values)
+    frame = bars.iloc[timestamps_from:]
+    if drop is not None:
+        frame = frame.drop(bars.index[drop])
+    closes = frame["Close"].to_numpy() * scale
+    return state, frame.index.as_unit("ns").asi8, closes
+
+
+@pytest.mark.parametrize("timestamps_from,scale,drop,reason", [
+    (0, 1.0, None, None),
+    (30, 1.0, None, None),
+    (41, 1.0, None, "bars start after the saved state"),
+    (0, 1.0, 39, "last state bar is missing from the bars"),
+    (0, 0.5, None, "bars were re-adjusted"),
+], ids=["continues", "overlaps the tail", "gap after state", "state bar missing", "re-adjusted"])
+def test_stale_reason(timestamps_from, scale, drop, reason):
+    state, timestamps, closes = stale_case(make_bars(60), timestamps_from, scale, drop)
+    assert IndicatorStateStore.stale_reason(state, timestamps, closes) == reason
+
+
+def test_stale_reason_without_state_or_new_bars():
+    bars = make_bars(60)
+    timestamps = bars.index.as_unit("ns").asi8
+    assert IndicatorStateStore.stale_reason(IndicatorState(), timestamps, bars["Close"].to_numpy()) is None
+
+    # Bars that end before the state have nothing to apply
+    state, _, _ = stale_case(bars, 0)
+    assert IndicatorStateStore.stale_reason(state, timestamps[:20], bars["Close"].to_numpy()[:20]) is None
+
+
+def test_advance_rewarms_readjusted_history(store):
+    bars = make_bars(100)
+    store.advance({"AAA": bars.iloc[:80]}, "1d")
+
+    split = bars.copy()
+    split[["Open", "High", "Low", "Close"]] *= 0.5
+    state = store.advance({"AAA": split}, "1d")["AAA"]
+    assert state.bars == 100
+    assert_matches_panel(state, split)
+    assert store.load(["AAA"], "1d")["AAA"].prev[3] == split["Close"].iloc[-1]
+
+
+def test_forming_bar_is_peeked_not_committed(store):
+    bars = make_bars(90)
+    forming = bars.copy()
+    forming.iloc[-1, forming.columns.get_loc("Close")] *= 1.01
+
+    current = store.advance({"AAA": forming}, "1d", forming=True)["AAA"]
+    assert current.bars == 90
+    assert current.prev[3] == forming["Close"].iloc[-1]
+
+    saved = store.load(["AAA"], "1d")["AAA"]
+    assert saved.bars == 89
+    assert saved.last_timestamp == bars.index[-2].as_unit("ns").value
+
+    # The completed bar's final values replace the forming ones
+    state = store.advance({"AAA": bars}, "1d")["AAA"]
+    assert_matches_panel(state, bars)
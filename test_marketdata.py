@@ -0,0 +1,195 @@
+# Tests for the bulk market data layer
+# Runs MarketDataClient against a local fake provider, so no request reaches Yahoo Finance
+
+import numpy as np
+import pandas as pd
+import pytest
+from marketdata import MarketDataClient, covers_period, period_to_days, to_ticker, trim_to_period
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def make_bars(sessions, start="2025-01-01", seed=0):
+    """Daily OHLCV frame with one bar per business day"""
+    index = pd.bdate_range(start, periods=sessions)
+    close = 100 + np.random.default_rng(seed).normal(0, 1, sessions).cumsum()
+    return pd.DataFrame({"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": np.full(sessions, 1000.0)}, index=index)
+
+
+class FakeProvider:
+    """Serves stored frames in the ticker-grouped layout of yf.download and records every call"""
+
+    def __init__(self, frames, flat_single=False, fail_on=()):
+        self.frames = frames
+        self.flat_single = flat_single
+        self.fail_on = set(fail_on)
+        self.calls = []
+
+    def download(self, tickers, period=None, interval="1d", start=None, end=None):
+        self.calls.append({"tickers": list(tickers), "period": period, "interval": interval, "start": start})
+        if self.fail_on & set(tickers):
+            raise ConnectionError("simulated outage")
+        found = {ticker: self.frames[ticker] for ticker in tickers if ticker in self.frames}
+        if not found:
+            return pd.DataFrame()
+        if start is not None:
+            found = {ticker: df[df.index >= pd.Timestamp(start)] for ticker, df in found.items()}
+        elif period is not None:
+            found = {ticker: trim_to_period(df, period) for ticker, df in found.items()}
+        if self.flat_single and len(tickers) == 1:
+            return next(iter(found.values()))
+        # Union index, like yfinance: tickers without a bar on a date get an all-NaN row
+        return pd.concat(found, axis=1, sort=True)
+
+
+@pytest.fixture
+def bars():
+    return {
+        "AAA.NS": make_bars(80, seed=1),
+        "BBB.NS": make_bars(80, seed=2),
+        "CCC.NS": make_bars(40, start="2025-03-03", seed=3),
+        "^NSEI": make_bars(80, seed=4),
+    }
+
+
+def test_period_to_days():
+    assert period_to_days("60d") == 60
+    assert period_to_days("3mo") == 90
+    assert period_to_days("1wk") == 7
+    assert period_to_days("max") == float("inf")
+    with pytest.raises(ValueError):
+        period_to_days("10x")
+
+
+def test_to_ticker_leaves_indices_and_suffixed_symbols():
+    assert to_ticker("RELIANCE") == "RELIANCE.NS"
+    assert to_ticker("RELIANCE.NS") == "RELIANCE.NS"
+    assert to_ticker("^NSEI") == "^NSEI"
+
+
+def test_trim_to_period_counts_sessions():
+    df = make_bars(30)
+    trimmed = trim_to_period(df, "10d")
+    assert len(trimmed) == 10
+    assert trimmed.index[-1] == df.index[-1]
+    assert len(trim_to_period(df, "60d")) == 30
+    assert trim_to_period(df, "max") is df
+
+
+def test_trim_to_period_keeps_every_intraday_bar_of_a_session():
+    index = pd.date_range("2025-01-06 09:15", periods=75, freq="5min").append(
+        pd.date_range("2025-01-07 09:15", periods=75, freq="5min"))
+    df = pd.DataFrame({"Close": np.arange(150.0)}, index=index)
+    trimmed = trim_to_period(df, "1d")
+    assert len(trimmed) == 75
+    assert (trimmed.index.normalize() == pd.Timestamp("2025-01-07")).all()
+
+
+def test_covers_period():
+    df = make_bars(30)
+    assert covers_period(df, "30d")
+    assert not covers_period(df, "31d")
+    assert not covers_period(df, "max")
+    assert not covers_period(None, "5d")
+
+
+def test_split_frame_grouped_and_missing_tickers(bars):
+    client = MarketDataClient(provider=FakeProvider(bars))
+    raw = pd.concat({"AAA.NS": bars["AAA.NS"], "CCC.NS": bars["CCC.NS"]}, axis=1)
+
+    frames = client.split_frame(raw, ["AAA", "CCC", "ZZZ"])
+    assert set(frames) == {"AAA", "CCC"}
+    # Rows added by the union index for the shorter history are dropped again
+    pd.testing.assert_frame_equal(frames["CCC"], bars["CCC.NS"], check_freq=False)
+    pd.testing.assert_frame_equal(frames["AAA"], bars["AAA.NS"], check_freq=False)
+
+
+def test_split_frame_single_ticker_flat_columns(bars):
+    client = MarketDataClient(provider=FakeProvider(bars))
+    frames = client.split_frame(bars["AAA.NS"], ["AAA"])
+    assert list(frames) == ["AAA"]
+    # A flat frame is ambiguous once more than one symbol was requested
+    assert client.split_frame(bars["AAA.NS"], ["AAA", "BBB"]) == {}
+    assert client.split_frame(pd.DataFrame(), ["AAA"]) == {}
+
+
+def test_download_frames_chunks_tickers(bars):
+    provider = FakeProvider(bars)
+    client = MarketDataClient(provider=provider, chunk_size=2)
+
+    frames = client.download_frames(["AAA", "BBB", "CCC", "^NSEI"], period="60d")
+    assert [call["tickers"] for call in provider.calls] == [["AAA.NS", "BBB.NS"], ["CCC.NS", "^NSEI"]]
+    assert set(frames) == {"AAA", "BBB", "CCC", "^NSEI"}
+    assert len(frames["AAA"]) == 60
+    assert len(frames["CCC"]) == 40
+
+
+def test_download_frames_single_ticker(bars):
+    client = MarketDataClient(provider=FakeProvider(bars, flat_single=True))
+    frames = client.download_frames(["BBB"], period="10d")
+    assert list(frames) == ["BBB"]
+    assert list(frames["BBB"].columns) == FIELDS
+    assert len(frames["BBB"]) == 10
+
+
+def test_download_frames_missing_ticker_and_failed_chunk(bars):
+    provider = FakeProvider(bars, fail_on=["BBB.NS"])
+    client = MarketDataClient(provider=provider, chunk_size=1)
+
+    frames = client.download_frames(["AAA", "BBB", "NOPE"], period="5d")
+    assert set(frames) == {"AAA"}
+    assert len(provider.calls) == 3
+
+
+def test_fetch_deduplicates_symbols(bars):
+    provider = FakeProvider(bars)
+    client = MarketDataClient(provider=provider)
+    frames = client.fetch(["AAA", "AAA", "BBB"], period="5d")
+    assert set(frames) == {"AAA", "BBB"}
+    assert provider.calls[0]["tickers"] == ["AAA.NS", "BBB.NS"]
+
+
+def test_fetch_frames_merges_periods_per_interval(bars):
+    provider = FakeProvider(bars)
+    client = MarketDataClient(provider=provider)
+
+    results = client.fetch_frames(["AAA", "CCC"], [("60d", "1d"), ("10d", "1d"), ("2d", "1d"), ("5d", "1h")])
+    # One round trip per interval, the daily one for the widest period
+    assert sorted((call["interval"], call["period"]) for call in provider.calls) == [("1d", "60d"), ("1h", "5d")]
+    assert set(results) == {("60d", "1d"), ("10d", "1d"), ("2d", "1d"), ("5d", "1h")}
+
+    for period, sessions in [("60d", 60), ("10d", 10), ("2d", 2)]:
+        frames = results[(period, "1d")]
+        assert len(frames["AAA"]) == sessions
+        assert frames["AAA"].index[-1] == bars["AAA.NS"].index[-1]
+    assert len(results[("60d", "1d")]["CCC"]) == 40
+
+
+def test_download_frames_reports_symbols_answered_without_bars(bars):
+    provider = FakeProvider(bars, fail_on=["BBB.NS"])
+    client = MarketDataClient(provider=provider, chunk_size=2)
+
+    empty = set()
+    client.download_frames(["AAA", "NOPE", "BBB", "CCC", "GONE1", "GONE2", "LONE"], period="5d", empty=empty)
+    # BBB's chunk raised and the GONE chunk returned nothing at all: both say nothing about their symbols
+    assert empty == {"NOPE", "LONE"}
+
+
+def test_fetch_incremental_replaces_readjusted_history(bars, tmp_path):
+    from barstore import BarStore
+    provider = FakeProvider(dict(bars))
+    client = MarketDataClient(provider=provider, store=BarStore(str(tmp_path / "bars.db")))
+    client.fetch(["AAA", "BBB"], period="60d")
+
+    # A 2:1 split in AAA: the provider now serves its whole history on the new basis
+    split = bars["AAA.NS"].copy()
+    split[["Open", "High", "Low", "Close"]] *= 0.5
+    provider.frames["AAA.NS"] = split
+    provider.calls.clear()
+
+    frames = client.fetch(["AAA", "BBB"], period="60d")
+    assert [call["period"] for call in provider.calls] == [None, "60d"]
+    assert provider.calls[-1]["tickers"] == ["AAA.NS"]
+    np.testing.assert_allclose(frames["AAA"]["Close"], split["Close"].iloc[-60:])
+    np.testing.assert_allclose(frames["BBB"]["Close"], bars["BBB.NS"]["Close"].iloc[-60:])
@@ -0,0 +1,64 @@
+# Tests for the portfolio backtester
+# Runs backtest_portfolio on hand-built daily bars and setups, so every trade's result is known up front
+
+import numpy as np
+import pandas as pd
+import pytest
+from patterns import SETUP_COLUMNS
+from portfolio import backtest_portfolio
+
+# Each setup risks 1% of equity with a 1% stop and closes 0.25R up: +0.25% of equity
+LIMITS = {"risk_per_trade": 0.01, "max_position_pct": 1.0, "cost_pct": 0.0}
+
+
+def flat_bars(start, end):
+    """Daily bars that trade through 100 and close at 100.25 every session"""
+    index = pd.bdate_range(start, end)
+    return pd.DataFrame({"Open": 100.0, "High": 101.0, "Low": 99.5, "Close": 100.25, "Volume": 1e5}, index=index)
+
+
+def make_setups(dates, symbol="AAA"):
+    """Long setups with entry 100, stop 99 and targets out of reach, one per date"""
+    setups = pd.DataFrame({column: [None] * len(dates) for column in SETUP_COLUMNS})
+    return setups.assign(
+        Symbol=symbol, Date=dates, Setup_Type="Bullish", Signal="BUY", Confidence="High", Entry=100.0,
+        Stop_Loss=99.0, Target1=103.0, Target2=105.0, Risk_Reward=3.0, Volume_Ratio=1.0, RSI=50.0,
+        Risk_Factor=1.0, Trend_Strength="Strong", MACD_Signal="Bullish"
+    )
+
+
+def test_sparse_trades_are_annualized_over_every_session():
+    frames = {"AAA": flat_bars("2024-01-01", "2024-12-31")}
+    setups = make_setups(["2024-01-01", "2024-04-01", "2024-07-01", "2024-12-27"])
+
+    stats, equity, drawdown, trades = backtest_portfolio(setups, frames, **LIMITS)
+    assert stats["trades"] == 4
+    assert stats["total_return"] == pytest.approx(1.0, abs=0.01)
+
+    # Every session from the first trade to the last is on the curve, flat without a trade
+    sessions = pd.bdate_range("2024-01-02", "2024-12-30")
+    assert list(equity.index) == list(sessions)
+    assert stats["sessions"] == len(sessions)
+    assert int((equity.pct_change().fillna(0) != 0).sum()) == 3
+
+    # Close to a year of sessions, so the annual rate is close to the total return
+    assert stats["cagr"] == pytest.approx(stats["total_return"], abs=0.05)
+    assert stats["max_drawdown"] == 0.0
+    assert len(drawdown) == len(sessions)
+
+
+def test_consecutive_trades_keep_their_sessions():
+    frames = {"AAA": flat_bars("2024-01-01", "2024-01-31")}
+    setups = make_setups(["2024-01-01", "2024-01-02", "2024-01-03"])
+
+    stats, equity, _, _ = backtest_portfolio(setups, frames, **LIMITS)
+    assert list(equity.index) == list(pd.bdate_range("2024-01-02", "2024-01-04"))
+    np.testing.assert_allclose(equity.to_numpy(), 1_000_000.0 * 1.0025 ** np.arange(1, 4))
+
+
+def test_no_following_session():
+    frames = {"AAA": flat_bars("2024-01-01", "2024-01-05")}
+    stats, equity, _, _ = backtest_portfolio(make_setups(["2024-01-05"]), frames, **LIMITS)
+    assert equity.empty
+    assert stats["trades"] == 0
+    assert stats["final_equity"] == 1_000_000.0
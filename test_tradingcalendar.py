@@ -0,0 +1,89 @@
+# Tests for the NSE trading calendar
+# Session navigation across holidays, weekends and the special Saturday sessions
+
+from datetime import date, datetime
+import pytest
+from tradingcalendar import TradingCalendar, session_label
+
+
+@pytest.fixture(scope="module")
+def calendar():
+    return TradingCalendar(start="2023-01-01", end="2026-12-31")
+
+
+@pytest.mark.parametrize("day,next_session", [
+    ("2024-03-22", "2024-03-26"),  # Friday before the Holi Monday
+    ("2024-03-28", "2024-04-01"),  # Good Friday and the weekend after it
+    ("2025-03-07", "2025-03-10"),  # plain weekend
+    ("2025-03-08", "2025-03-10"),  # from a Saturday
+    ("2024-01-19", "2024-01-20"),  # into the special Saturday session
+    ("2024-01-20", "2024-01-23"),  # out of it, over the Sunday and the 22 January holiday
+    ("2025-01-31", "2025-02-01"),  # Budget day Saturday session
+    ("2025-02-01", "2025-02-03"),
+])
+def test_next_session(calendar, day, next_session):
+    assert calendar.next_session(day) == date.fromisoformat(next_session)
+
+
+@pytest.mark.parametrize("day,prev_session", [
+    ("2024-03-26", "2024-03-22"),
+    ("2024-03-25", "2024-03-22"),  # from the holiday itself
+    ("2024-04-01", "2024-03-28"),
+    ("2025-03-10", "2025-03-07"),
+    ("2025-03-09", "2025-03-07"),  # from a Sunday
+    ("2024-01-22", "2024-01-20"),
+    ("2025-02-03", "2025-02-01"),
+])
+def test_prev_session(calendar, day, prev_session):
+    assert calendar.prev_session(day) == date.fromisoformat(prev_session)
+
+
+def test_special_saturday_sessions(calendar):
+    assert calendar.is_session("2024-01-20")
+    assert calendar.is_session("2025-02-01")
+    assert not calendar.is_session("2024-01-21")
+    assert not calendar.is_session("2025-02-08")
+    assert not calendar.is_session("2024-01-22")
+    assert calendar.sessions_between("2024-01-19", "2024-01-23") == [
+        date(2024, 1, 19), date(2024, 1, 20), date(2024, 1, 23)]
+    assert calendar.sessions_before("2025-02-03", 2) == [date(2025, 1, 31), date(2025, 2, 1)]
+
+
+@pytest.mark.parametrize("now,session", [
+    (datetime(2025, 3, 10, 9, 0), "2025-03-07"),    # before the open
+    (datetime(2025, 3, 10, 15, 29), "2025-03-07"),  # still trading
+    (datetime(2025, 3, 10, 15, 30), "2025-03-10"),  # at the close
+    (datetime(2025, 3, 10, 20, 0), "2025-03-10"),
+    (datetime(2025, 3, 8, 12, 0), "2025-03-07"),    # weekend
+    (datetime(2024, 3, 25, 16, 0), "2024-03-22"),   # holiday
+    (datetime(2024, 1, 20, 16, 0), "2024-01-20"),   # after the special Saturday session closed
+    (datetime(2024, 1, 20, 11, 0), "2024-01-19"),   # during it
+])
+def test_last_closed_session(calendar, now, session):
+    assert calendar.last_closed_session(now) == date.fromisoformat(session)
+
+
+def test_latest_and_next_trading_session(calendar):
+    before_open = datetime(2025, 3, 10, 8, 0)
+    assert calendar.latest_session(before_open) == date(2025, 3, 7)
+    assert calendar.next_trading_session(before_open) == date(2025, 3, 10)
+    during = datetime(2025, 3, 10, 11, 0)
+    assert calendar.latest_session(during) == date(2025, 3, 10)
+    assert calendar.next_trading_session(during) == date(2025, 3, 11)
+    assert calendar.is_market_open(during)
+    assert not calendar.is_market_open(datetime(2025, 3, 8, 11, 0))
+
+
+def test_dates_outside_the_calendar(calendar):
+    with pytest.raises(ValueError):
+        calendar.next_session("2027-01-05")
+    with pytest.raises(ValueError):
+        calendar.prev_session("2023-01-02")
+
+
+def test_session_label():
+    today = date(2025, 3, 10)
+    assert session_label("2025-03-10", today) == "today"
+    assert session_label("2025-03-11", today) == "tomorrow"
+    assert session_label("2025-03-07", today, possessive=True) == "Friday's"
+    assert session_label("2025-02-01", today) == "01 Feb 2025"
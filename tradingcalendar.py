@@ -0,0 +1,167 @@
+# NSE trading calendar shared by the screeners, the backtester and the bar store
+# Precomputes the session table once so next/previous session lookups are index reads instead of weekday arithmetic
+
+import threading
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, time as dtime
+
+# Regular NSE equity session hours, exchange local time
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+# Weekday exchange holidays from the NSE trading holiday circulars; years before the first
+# listed one only skip weekends
+NSE_HOLIDAYS = frozenset([
+    # 2023
+    "2023-01-26", "2023-03-07", "2023-03-30", "2023-04-04", "2023-04-07", "2023-04-14", "2023-05-01",
+    "2023-06-29", "2023-08-15", "2023-09-19", "2023-10-02", "2023-10-24", "2023-11-14", "2023-11-27",
+    "2023-12-25",
+    # 2024
+    "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29", "2024-04-11", "2024-04-17",
+    "2024-05-01", "2024-05-20", "2024-06-17", "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-01",
+    "2024-11-15", "2024-11-20", "2024-12-25",
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18", "2025-05-01",
+    "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03", "2026-04-14", "2026-05-01",
+    "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24",
+    "2026-12-25",
+])
+
+# Full trading sessions the exchange held on a weekend
+NSE_SPECIAL_SESSIONS = frozenset(["2024-01-20", "2025-02-01"])
+
+# First day covered by the session table
+CALENDAR_START = "2000-01-01"
+
+
+def _to_date(value):
+    """datetime.date for a date, datetime, Timestamp or 'YYYY-MM-DD' string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class TradingCalendar:
+    """Table of exchange sessions with constant-time navigation between them
+
+    Sessions are every weekday from start to end except holidays, plus special weekend
+    sessions. For every calendar day the table stores the index of the first session on
+    or after it, so next_session/prev_session/sessions_between are array lookups for
+    any date, whether or not it is a session.
+    """
+
+    def __init__(self, start=CALENDAR_START, end=None, holidays=NSE_HOLIDAYS, special_sessions=NSE_SPECIAL_SESSIONS):
+        self.start = _to_date(start)
+        self.end = _to_date(end) if end is not None else date(datetime.now().year + 1, 12, 31)
+        days = pd.date_range(self.start, self.end, freq="D")
+        keys = days.strftime("%Y-%m-%d")
+        is_session = (days.weekday < 5) & ~keys.isin(list(holidays)) | keys.isin(list(special_sessions))
+
+        self.sessions = [day.date() for day in days[is_session]]
+        # Index of the first session on or after each calendar day
+        self._ceiling = np.cumsum(np.concatenate([[0], is_session[:-1]])).astype(np.int64)
+        self._is_session = np.asarray(is_session)
+
+    def _offset(self, value):
+        day = _to_date(value)
+        offset = (day - self.start).days
+        if offset < 0 or offset >= len(self._ceiling):
+            raise ValueError(f"{day} is outside the trading calendar ({self.start} to {self.end})")
+        return offset
+
+    def is_session(self, value):
+        """True if the exchange trades on this date"""
+        return bool(self._is_session[self._offset(value)])
+
+    def next_session(self, value):
+        """First session strictly after a date"""
+        offset = self._offset(value)
+        index = self._ceiling[offset] + self._is_session[offset]
+        if index >= len(self.sessions):
+            raise ValueError(f"No session after {value} in the trading calendar")
+        return self.sessions[index]
+
+    def prev_session(self, value):
+        """Last session strictly before a date"""
+        index = self._ceiling[self._offset(value)] - 1
+        if index < 0:
+            raise ValueError(f"No session before {value} in the trading calendar")
+        return self.sessions[index]
+
+    def session_on_or_before(self, value):
+        """The date itself if it is a session, otherwise the previous session"""
+        return _to_date(value) if self.is_session(value) else self.prev_session(value)
+
+    def sessions_between(self, start, end):
+        """Sessions from start to end, both inclusive"""
+        first = self._ceiling[self._offset(start)]
+        last = self._ceiling[self._offset(end)] + self._is_session[self._offset(end)]
+        return self.sessions[first:last]
+
+    def sessions_before(self, value, count):
+        """The last count sessions strictly before a date, oldest first"""
+        index = self._ceiling[self._offset(value)]
+        return self.sessions[max(index - count, 0):index]
+
+    def latest_session(self, now=None):
+        """Session whose data is the most recent available: today once the market has opened"""
+        now = now or datetime.now()
+        if self.is_session(now) and now.time() >= MARKET_OPEN:
+            return now.date()
+        return self.prev_session(now)
+
+    def last_closed_session(self, now=None):
+        """Most recent session whose bars are final: today only after the close"""
+        now = now or datetime.now()
+        if self.is_session(now) and now.time() >= MARKET_CLOSE:
+            return now.date()
+        return self.prev_session(now)
+
+    def next_trading_session(self, now=None):
+        """Session the screener's setups are for: today before the open, otherwise the next one"""
+        now = now or datetime.now()
+        if self.is_session(now) and now.time() < MARKET_OPEN:
+            return now.date()
+        return self.next_session(now)
+
+    def is_market_open(self, now=None):
+        """True during regular trading hours of a session"""
+        now = now or datetime.now()
+        return self.is_session(now) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def session_label(session, today=None, possessive=False):
+    """How reports name a session relative to today: 'today', 'tomorrow', 'Friday', ..."""
+    today = _to_date(today or datetime.now())
+    session = _to_date(session)
+    days = (session - today).days
+    if days == 0:
+        label = "today"
+    elif days == 1:
+        label = "tomorrow"
+    elif days == -1:
+        label = "yesterday"
+    elif abs(days) < 7:
+        label = session.strftime("%A")
+    else:
+        label = session.strftime("%d %b %Y")
+    return f"{label}'s" if possessive else label
+
+
+_calendars = {}
+_calendar_lock = threading.Lock()
+
+
+def get_calendar(exchange="NSE"):
+    """Return the process-wide trading calendar, building its session table on first use"""
+    with _calendar_lock:
+        if exchange not in _calendars:
+            if exchange != "NSE":
+                raise ValueError(f"Unsupported exchange calendar: {exchange}")
+            _calendars[exchange] = TradingCalendar()
+        return _calendars[exchange]
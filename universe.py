@@ -0,0 +1,163 @@
+# Symbol universe loading for the NSE screeners
+# Reads index / F&O constituent lists from CSV or JSON and skips symbols recently found to be bad
+
+import os
+import csv
+import json
+import logging
+from datetime import datetime, timedelta
+from screenerdb import get_db
+
+# Column names that hold the trading symbol in NSE constituent and F&O CSV downloads
+SYMBOL_COLUMNS = ("symbol", "ticker", "tradingsymbol", "underlying")
+
+# How long a symbol that returned no data is skipped before it is tried again
+BAD_SYMBOL_TTL_DAYS = 7
+
+
+def normalize_symbol(symbol):
+    """Clean a symbol from a list file: trim, upper-case and drop the Yahoo .NS suffix"""
+    symbol = str(symbol).strip().upper()
+    return symbol[:-3] if symbol.endswith(".NS") else symbol
+
+
+def _unique(symbols):
+    """Normalized symbols in file order without blanks or duplicates"""
+    return list(dict.fromkeys(s for s in (normalize_symbol(symbol) for symbol in symbols) if s))
+
+
+def read_symbol_file(path):
+    """Read a universe file as {group name: [symbols]}
+
+    CSV files use the first column named like a symbol column (NSE index and F&O
+    downloads work as-is) and form one group named after the file. JSON files may hold
+    a list of symbols, {"symbols": [...]}, or {group name: [symbols]}.
+    """
+    name = os.path.splitext(os.path.basename(path))[0].upper()
+
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return {name: _unique(data)}
+        if isinstance(data, dict) and isinstance(data.get("symbols"), list):
+            return {name: _unique(data["symbols"])}
+        if isinstance(data, dict):
+            return {group: _unique(symbols) for group, symbols in data.items()}
+        raise ValueError(f"Unsupported universe JSON layout in {path}")
+
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {column.strip().lower(): column for column in reader.fieldnames or []}
+        column = next((columns[c] for c in SYMBOL_COLUMNS if c in columns), None)
+        if column is None:
+            raise ValueError(f"No symbol column in {path}, expected one of {', '.join(SYMBOL_COLUMNS)}")
+        return {name: _unique(row[column] for row in reader if row.get(column))}
+
+
+def filter_liquidity(frames, min_avg_volume=None, min_avg_turnover=None, window=20):
+    """Drop symbols whose recent average volume or traded value is below the thresholds
+
+    Works on the daily bars already fetched, so illiquid names never reach indicator work.
+    Returns (kept frames, dropped symbols).
+    """
+    if not min_avg_volume and not min_avg_turnover:
+        return frames, []
+
+    kept, dropped = {}, []
+    for symbol, df in frames.items():
+        recent = df.iloc[-window:]
+        avg_volume = recent["Volume"].mean()
+        avg_turnover = (recent["Close"] * recent["Volume"]).mean()
+        if (min_avg_volume and not avg_volume >= min_avg_volume) or \
+                (min_avg_turnover and not avg_turnover >= min_avg_turnover):
+            dropped.append(symbol)
+        else:
+            kept[symbol] = df
+    return kept, dropped
+
+
+class UniverseLoader:
+    """Loads symbol universes and remembers symbols that returned no data, with a TTL"""
+
+    def __init__(self, db_path="intraday_data.db", ttl_days=BAD_SYMBOL_TTL_DAYS):
+        self.db = get_db(db_path)
+        self.ttl_days = ttl_days
+        self.init_database()
+
+    def init_database(self):
+        """Create the bad symbol table if it does not exist"""
+        try:
+            self.db.execute('''
+            CREATE TABLE IF NOT EXISTS bad_symbols (
+                Symbol TEXT PRIMARY KEY,
+                Reason TEXT,
+                Failures INTEGER,
+                Marked_At TEXT,
+                Expires_At TEXT
+            )
+            ''')
+        except Exception as e:
+            logging.error(f"Universe database initialization error: {e}")
+
+    def bad_symbols(self):
+        """Symbols whose bad mark has not expired yet"""
+        try:
+            _, rows = self.db.query('''
+            SELECT Symbol FROM bad_symbols WHERE Expires_At > ?
+            ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+            return {row[0] for row in rows}
+        except Exception as e:
+            logging.error(f"Error reading bad symbols: {e}")
+            return set()
+
+    def mark_bad(self, symbols, reason="No data returned"):
+        """Skip symbols until the TTL runs out; repeat failures extend the mark"""
+        now = datetime.now()
+        expires = (now + timedelta(days=self.ttl_days)).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self.db.executemany('''
+            INSERT INTO bad_symbols (Symbol, Reason, Failures, Marked_At, Expires_At)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(Symbol) DO UPDATE SET
+                Reason = excluded.Reason,
+                Failures = Failures + 1,
+                Marked_At = excluded.Marked_At,
+                Expires_At = excluded.Expires_At
+            ''', [(symbol, reason, now.strftime("%Y-%m-%d %H:%M:%S"), expires) for symbol in symbols])
+        except Exception as e:
+            logging.error(f"Error marking bad symbols: {e}")
+
+    def clear_bad(self, symbols):
+        """Forget bad marks for symbols that returned data again"""
+        try:
+            self.db.executemany('DELETE FROM bad_symbols WHERE Symbol = ?', [(symbol,) for symbol in symbols])
+        except Exception as e:
+            logging.error(f"Error clearing bad symbols: {e}")
+
+    def record_fetch(self, requested, frames, empty):
+        """Mark requested symbols the provider answered without bars, clear the ones with data
+
+        The decision comes from the download, not from frames, which may be served from
+        the bar store. empty is the set MarketDataClient.fetch fills; symbols of a failed
+        chunk are never in it, since an outage or throttling says nothing about them.
+        """
+        missing = [symbol for symbol in requested if symbol in empty]
+        if missing:
+            self.mark_bad(missing)
+            logging.info(f"Marked {len(missing)} symbols as bad for {self.ttl_days} days: {', '.join(missing)}")
+        self.clear_bad([symbol for symbol in requested if symbol in frames and symbol not in empty])
+
+    def load_groups(self, path=None, default=None):
+        """Load {group name: [symbols]} from a file or the default, without known-bad symbols"""
+        groups = read_symbol_file(path) if path else {name: _unique(symbols) for name, symbols in (default or {}).items()}
+        bad = self.bad_symbols()
+        skipped = sorted({symbol for symbols in groups.values() for symbol in symbols} & bad)
+        if skipped:
+            logging.info(f"Skipping {len(skipped)} known-bad symbols: {', '.join(skipped)}")
+        return {name: [symbol for symbol in symbols if symbol not in bad] for name, symbols in groups.items()}
+
+    def load(self, path=None, default=None):
+        """Load a flat symbol list from a file or the default, without known-bad symbols"""
+        groups = self.load_groups(path, {"DEFAULT": default or []})
+        return _unique(symbol for symbols in groups.values() for symbol in symbols)
@@ -0,0 +1,151 @@
+# Walk-forward optimization of the pattern thresholds
+# Tunes on rolling train windows with the parameter sweep and scores the chosen set on the unseen window that follows
+
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import as_completed
+from pipeline import make_executor
+from sweep import (expand_grid, detection_key, detected_setups, evaluate_point, rank_results, share_indicators,
+                   init_worker, worker_dates, SWEEP_STATS)
+
+# Default window lengths in sessions: one year of training, one quarter out of sample
+TRAIN_SESSIONS = 250
+TEST_SESSIONS = 60
+
+
+def session_dates(frames):
+    """Sorted 'YYYY-MM-DD' dates on which any symbol has a bar"""
+    index = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values() if df is not None))))
+    return list(index.strftime("%Y-%m-%d"))
+
+
+def walk_forward_windows(dates, train_sessions=TRAIN_SESSIONS, test_sessions=TEST_SESSIONS):
+    """Rolling train/test windows; test windows are back to back and each follows its training window"""
+    windows = []
+    for start in range(0, len(dates) - train_sessions - test_sessions + 1, test_sessions):
+        split = start + train_sessions
+        windows.append({
+            "Window": len(windows) + 1,
+            "Train_Start": dates[start],
+            "Train_End": dates[split - 1],
+            "Test_Start": dates[split],
+            "Test_End": dates[split + test_sessions - 1],
+        })
+    return windows
+
+
+def window_setups(setups, dates, start, end):
+    """Setups whose trade session (the date after the setup) falls within start..end"""
+    first = int(np.searchsorted(dates, start))
+    last = int(np.searchsorted(dates, end, side="right"))
+    if last < 2:
+        return setups.iloc[0:0]
+    setup_dates = setups["Date"]
+    return setups[(setup_dates >= dates[max(first - 1, 0)]) & (setup_dates <= dates[last - 2])]
+
+
+def _run_window(window, points, names, top_n, sort_by, limits):
+    """Optimize on a window's training sessions, then score the winner and the defaults out of sample
+
+    Detection over the full history is cached per worker, so overlapping windows handled
+    by the same worker slice the same setups instead of screening again.
+    """
+    dates = worker_dates()
+
+    def evaluate(point, start, end):
+        setups = window_setups(detected_setups(detection_key(point)), dates, start, end)
+        return evaluate_point(point, setups, top_n, limits)
+
+    rows = [evaluate(point, window["Train_Start"], window["Train_End"]) for point in points]
+    table = rank_results([row for row in rows if row is not None], names, sort_by)
+    if table.empty:
+        return None
+
+    best = {name: table[name].tolist()[0] for name in names}
+    test = evaluate(best, window["Test_Start"], window["Test_End"])
+    baseline = evaluate({}, window["Test_Start"], window["Test_End"])
+    if test is None or baseline is None:
+        return None
+    return {
+        **window,
+        "params": best,
+        "train": {name: table[name].tolist()[0] for name in SWEEP_STATS},
+        "test": {name: test[name] for name in SWEEP_STATS},
+        "baseline": {name: baseline[name] for name in SWEEP_STATS},
+    }
+
+
+def _compounded(returns):
+    """Total return in % of back-to-back periods with the given % returns"""
+    return round(float((np.prod(1 + np.asarray(returns, dtype=float) / 100) - 1) * 100), 2)
+
+
+def summarize_windows(results):
+    """Aggregate out-of-sample statistics over all walk-forward windows"""
+    if not results:
+        return {"windows": 0}
+    train = pd.DataFrame([result["train"] for result in results])
+    test = pd.DataFrame([result["test"] for result in results])
+    baseline = pd.DataFrame([result["baseline"] for result in results])
+    trades = int(test["trades"].sum())
+    train_cagr = train["cagr"].mean()
+
+    return {
+        "windows": len(results),
+        "oos_return": _compounded(test["total_return"]),
+        "baseline_return": _compounded(baseline["total_return"]),
+        "oos_sharpe": round(float(test["sharpe"].mean()), 2),
+        "train_sharpe": round(float(train["sharpe"].mean()), 2),
+        "baseline_sharpe": round(float(baseline["sharpe"].mean()), 2),
+        "worst_drawdown": round(float(test["max_drawdown"].min()), 2),
+        "oos_trades": trades,
+        "oos_win_rate": round(float((test["win_rate"] * test["trades"]).sum() / trades), 2) if trades else 0.0,
+        "beat_baseline": int((test["total_return"] > baseline["total_return"]).sum()),
+        # Out-of-sample over in-sample annualized return; near 1 means the tuning generalizes
+        "efficiency": round(float(test["cagr"].mean() / train_cagr), 2) if train_cagr > 0 else None,
+    }
+
+
+def run_walk_forward(frames, grid, market_sentiment=None, train_sessions=TRAIN_SESSIONS, test_sessions=TEST_SESSIONS,
+                     top_n=5, workers=None, executor="process", sort_by="sharpe", **limits):
+    """Walk-forward optimization of a parameter grid over daily bars
+
+    Every window reruns the sweep on its training sessions, picks the best set by sort_by
+    and backtests it on the following test sessions next to the default thresholds.
+    Windows run in parallel on workers sharing one indicator panel. limits go to
+    backtest_portfolio. Returns (per-window results in order, aggregate summary).
+    """
+    start_time = time.time()
+    points = expand_grid(grid)
+    windows = walk_forward_windows(session_dates(frames), train_sessions, test_sessions)
+    if not points or not windows:
+        logging.info("Walk-forward: no parameter sets or not enough history for one train/test window")
+        return [], summarize_windows([])
+
+    bars = share_indicators(frames)
+    workers = min(workers or os.cpu_count() or 1, len(windows))
+    logging.info(f"Walk-forward over {len(windows)} windows of {len(points)} parameter sets on {workers} workers")
+    results = []
+    try:
+        with make_executor(executor, workers, initializer=init_worker,
+                           initargs=(bars, market_sentiment)) as pool:
+            futures = [pool.submit(_run_window, window, points, list(grid), top_n, sort_by, limits)
+                       for window in windows]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Walk-forward window failed: {e}")
+                    continue
+                if result is not None:
+                    results.append(result)
+    finally:
+        bars.release()
+
+    results.sort(key=lambda result: result["Window"])
+    summary = summarize_windows(results)
+    logging.info(f"Walk-forward finished {len(results)} of {len(windows)} windows in {time.time() - start_time:.1f}s")
+    return results, summary